@@ -0,0 +1,109 @@
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+import discord
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from helpers.cache_policy import PROFILES, apply_policy, resolve_policy  # noqa: E402
+
+GUILD_ID = 1000
+CHANNEL_ID = 2000
+
+
+def member_payload(user_id: int) -> dict:
+    return {
+        "user": {
+            "id": str(user_id),
+            "username": f"user{user_id}",
+            "global_name": f"User {user_id}",
+            "discriminator": "0",
+            "avatar": None,
+        },
+        "nick": None,
+        "roles": [],
+        "joined_at": "2022-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def guild_payload(members: int) -> dict:
+    return {
+        "id": str(GUILD_ID),
+        "name": "Benchmark",
+        "owner_id": "1",
+        "member_count": members,
+        "large": members > 250,
+        "roles": [{"id": str(GUILD_ID), "name": "@everyone", "permissions": "0",
+                   "position": 0, "color": 0, "hoist": False, "managed": False,
+                   "mentionable": False, "flags": 0}],
+        "channels": [{"id": str(CHANNEL_ID), "type": 0, "name": "general",
+                      "position": 0, "permission_overwrites": []}],
+        "members": [member_payload(10_000 + index) for index in range(members)],
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+    }
+
+
+def message_payload(message_id: int) -> dict:
+    return {
+        "id": str(message_id),
+        "channel_id": str(CHANNEL_ID),
+        "guild_id": str(GUILD_ID),
+        "author": member_payload(10_000 + message_id % 100)["user"],
+        "content": "x" * 80,
+        "timestamp": "2022-01-01T00:00:00+00:00",
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+
+def measure(profile: str, members: int, messages: int) -> int:
+    """
+    Feeds a synthetic guild and message stream into a client configured with
+    the given cache profile, and returns the memory retained by its caches.
+    """
+
+    intents = discord.Intents.default()
+    options = apply_policy(resolve_policy({"profile": profile}), intents)
+    client = discord.Client(intents=intents, **options)
+    state = client._connection
+    payload = guild_payload(members)
+    messages_payload = [message_payload(index) for index in range(messages)]
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    state._add_guild_from_data(payload)
+    for data in messages_payload:
+        state.parse_message_create(data)
+    del payload, messages_payload
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the memory of each cache profile.")
+    parser.add_argument("--members", type=int, default=50_000)
+    parser.add_argument("--messages", type=int, default=5_000)
+    arguments = parser.parse_args()
+
+    print(f"{arguments.members} members, {arguments.messages} messages")
+    for name in PROFILES:
+        retained = measure(name, arguments.members, arguments.messages)
+        print(f"{name:<10} {retained / 1024:10.1f} KiB")
@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import discord
+from discord.ext import commands
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from helpers import metrics  # noqa: E402
+from helpers.prefilter import MessagePrefilter  # noqa: E402
+from helpers.settings import GuildSettings, SettingsStore  # noqa: E402
+
+from cache_profiles import CHANNEL_ID, GUILD_ID, guild_payload, message_payload  # noqa: E402
+
+BOT_ID = 1
+PREFIX = "!"
+
+
+async def get_prefix(bot, message: discord.Message) -> list:
+    # Same as the prefix resolver of bot.py, which can't be imported.
+    prefix = (await bot.settings.get(message.guild.id)).prefix
+    return commands.when_mentioned_or(prefix)(bot, message)
+
+
+def build_bot() -> commands.Bot:
+    bot = commands.Bot(command_prefix=get_prefix, intents=discord.Intents.default(), help_command=None)
+    bot.settings = SettingsStore(PREFIX)
+    # Warm the cache, the bot runs with the settings of active servers cached.
+    bot.settings._cache[GUILD_ID] = GuildSettings(PREFIX, frozenset(), None)
+    bot.prefilter = MessagePrefilter(bot.settings, PREFIX)
+    bot.prefilter.set_user(BOT_ID)
+
+    @bot.command(name="ping")
+    async def ping(context: commands.Context) -> None:
+        pass
+
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data={
+        "id": str(BOT_ID), "username": "bot", "discriminator": "0", "avatar": None, "bot": True,
+    })
+    state._add_guild_from_data(guild_payload(100))
+    return bot
+
+
+def build_messages(bot: commands.Bot, count: int, command_ratio: float) -> list:
+    state = bot._connection
+    channel = state._get_guild(GUILD_ID).get_channel(CHANNEL_ID)
+    randomizer = random.Random(0)
+    messages = []
+    for index in range(count):
+        data = message_payload(index)
+        if randomizer.random() < command_ratio:
+            data["content"] = f"{PREFIX}ping"
+        else:
+            data["content"] = " ".join(randomizer.choice(("hello", "lol", "what", "ok", "gg"))
+                                       for _ in range(randomizer.randint(1, 12)))
+        messages.append(discord.Message(state=state, channel=channel, data=data))
+    return messages
+
+
+async def full_path(bot: commands.Bot, messages: list) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        await bot.process_commands(message)
+    return time.perf_counter() - start
+
+
+async def filtered_path(bot: commands.Bot, messages: list) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        if bot.prefilter.should_process(message):
+            await bot.process_commands(message)
+    return time.perf_counter() - start
+
+
+async def main(arguments) -> None:
+    bot = build_bot()
+    messages = build_messages(bot, arguments.messages, arguments.command_ratio)
+    print(f"{arguments.messages} messages, {arguments.command_ratio:.0%} commands")
+    for name, path in (("full", full_path), ("prefilter", filtered_path)):
+        elapsed = min([await path(bot, messages) for _ in range(arguments.repeat)])
+        per_message = elapsed / arguments.messages
+        # The share of one core needed to keep up with 10k messages per second.
+        print(f"{name:<10} {per_message * 1e6:8.2f} µs/message {per_message * 10_000:8.1%} of a core at 10k/s")
+    print(f"skipped {metrics.snapshot().get('messages.skipped', 0)}, "
+          f"processed {metrics.snapshot().get('messages.processed', 0)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cost of the message path.")
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--command-ratio", type=float, default=0.02)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), "..")))
+
+from helpers.models import CovidStatus, Fact  # noqa: E402
+
+
+def covid_payload(locations: int) -> str:
+    # Same shape as the apify payload, the fields we render come first.
+    return json.dumps({
+        "infected": 11526994,
+        "treated": 9931,
+        "recovered": 10640470,
+        "died": 43206,
+        "infectedToday": 1041,
+        "treatedToday": 12,
+        "recoveredToday": 7,
+        "diedToday": 0,
+        "overview": [
+            {"date": f"2023-01-{day % 28 + 1:02}", "infected": day, "recovered": day,
+             "died": day, "treating": day, "avg7day": day}
+            for day in range(locations // 10)
+        ],
+        "locations": [
+            {"name": f"Province {index}", "death": index, "treating": index,
+             "cases": index * 10, "recovered": index * 9, "casesToday": index % 7}
+            for index in range(locations)
+        ],
+        "sourceUrl": "https://covid19.gov.vn/",
+        "lastUpdatedAtApify": "2023-01-01T00:00:00.000Z",
+        "readMe": "https://apify.com/dtrungtin/covid-vi",
+    })
+
+
+FACT_PAYLOAD = json.dumps({
+    "id": "8a2c1f0e",
+    "text": "Bananas are berries, but strawberries are not.",
+    "source": "djtech.net",
+    "source_url": "https://www.djtech.net/",
+    "language": "en",
+    "permalink": "https://uselessfacts.jsph.pl/api/v2/facts/8a2c1f0e",
+})
+
+
+def old_covid(text: str):
+    # What the covid command used to do on every call.
+    @dataclass
+    class Status:
+        infected: str = None
+        recovered: str = None
+        treated: str = None
+        died: str = None
+        infectedToday: str = None
+        recoveredToday: str = None
+        treatedToday: str = None
+        diedToday: str = None
+        overview: str = None
+        locations: str = None
+        sourceUrl: str = None
+        lastUpdatedAtApify: str = None
+        readMe: str = None
+
+    return Status(**json.loads(text))
+
+
+def old_fact(text: str):
+    @dataclass
+    class Text:
+        id: str = None
+        text: str = None
+        source: str = None
+        source_url: str = None
+        language: str = None
+        permalink: str = None
+
+    return Text(**json.loads(text))
+
+
+def peak_memory(function, text: str) -> int:
+    tracemalloc.start()
+    function(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def report(name: str, old, new, text: str, number: int) -> None:
+    for label, function in (("dataclass", old), ("slotted", new)):
+        seconds = timeit.timeit(lambda: function(text), number=number)
+        print(
+            f"{name:<6} {label:<10} {seconds / number * 1_000_000:10.1f} us/call "
+            f"{peak_memory(function, text) / 1024:10.1f} KiB peak"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the response models of the commands.")
+    parser.add_argument("--locations", type=int, default=5000)
+    parser.add_argument("--number", type=int, default=200)
+    arguments = parser.parse_args()
+
+    report("fact", old_fact, Fact.from_json, FACT_PAYLOAD, arguments.number * 10)
+    report(
+        "covid",
+        old_covid,
+        CovidStatus.from_json,
+        covid_payload(arguments.locations),
+        arguments.number,
+    )
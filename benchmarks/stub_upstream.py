@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+
+from aiohttp import web
+
+PAYLOADS = os.path.join(os.path.realpath(os.path.dirname(__file__)), "payloads")
+
+# The path of every upstream endpoint and the recorded payload it replays.
+# Point every entry of "upstreams" in config.json to this server to use it.
+ROUTES = {
+    "/random.json": "fact.json",
+    "/api/breeds/image/random": "dog.json",
+    "/v1/bpi/currentprice/BTC.json": "bitcoin.json",
+    "/v2/key-value-stores/EaCBL1JNntjR3EakU/records/LATEST": "covid.json",
+}
+
+
+def parse_latency(spec: str):
+    """
+    This function will parse a latency distribution, in milliseconds.
+
+    :param spec: One of `fixed:MS`, `uniform:LOW,HIGH`, `normal:MEAN,STDDEV` or `exponential:MEAN`.
+    :return: A function returning a latency in seconds.
+    """
+
+    kind, _, values = spec.partition(":")
+    numbers = [float(value) for value in values.split(",")] if values else []
+
+    if kind == "fixed":
+        return lambda rng: numbers[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(numbers[0], numbers[1]) / 1000
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(numbers[0], numbers[1])) / 1000
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1 / numbers[0]) / 1000
+    raise ValueError(f"Unknown latency distribution '{spec}'.")
+
+
+def resize(payload: dict, size: int) -> bytes:
+    """
+    This function will grow a payload to roughly the given size in bytes.
+    List fields are repeated, other payloads get an unknown padding field.
+
+    :param payload: The recorded payload.
+    :param size: The size the encoded payload should reach.
+    :return: The encoded payload.
+    """
+
+    body = json.dumps(payload).encode("utf-8")
+    lists = [key for key, value in payload.items() if isinstance(value, list) and value]
+    if size <= len(body):
+        return body
+
+    payload = dict(payload)
+    if lists:
+        items = payload[lists[-1]]
+        item_size = len(json.dumps(items[0]).encode("utf-8")) + 2
+        count = len(items) + (size - len(body)) // item_size + 1
+        payload[lists[-1]] = [items[index % len(items)] for index in range(count)]
+    else:
+        payload["padding"] = "x" * (size - len(body))
+    return json.dumps(payload).encode("utf-8")
+
+
+class StubUpstream:
+    """
+    Replays the recorded payloads of the upstream APIs with a configurable
+    latency distribution, error rate and payload size.
+    """
+
+    def __init__(self, latency: str, error_rate: float, payload_size: int, seed: int):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.bodies = {}
+        self.requests = 0
+        self.errors = 0
+        for path, filename in ROUTES.items():
+            with open(os.path.join(PAYLOADS, filename), encoding="utf-8") as file:
+                self.bodies[path] = resize(json.load(file), payload_size)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        # Compare with the number of commands run to see how many requests were cached or coalesced.
+        return web.json_response({"requests": self.requests, "errors": self.errors})
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = self.bodies.get(request.path)
+        if body is None:
+            return web.Response(status=404)
+
+        self.requests += 1
+        await asyncio.sleep(self.latency(self.rng))
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=self.rng.choice((500, 502, 503)), text="Stub error")
+        return web.Response(body=body, content_type="application/json")
+
+    def application(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/_stats", self.stats)
+        app.router.add_get("/{path:.*}", self.handle)
+        return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded upstream payloads locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--latency",
+        default="fixed:0",
+        help="fixed:MS, uniform:LOW,HIGH, normal:MEAN,STDDEV or exponential:MEAN",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--payload-size", type=int, default=0, help="Minimum payload size in bytes.")
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    stub = StubUpstream(
+        arguments.latency, arguments.error_rate, arguments.payload_size, arguments.seed
+    )
+    web.run_app(stub.application(), host=arguments.host, port=arguments.port)
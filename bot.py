@@ -4,13 +4,34 @@ import logging
 import os
 import platform
 import random
+import sqlite3
 import sys
-import aiosqlite
 import discord
 
 from discord.ext import commands, tasks
-from discord.ext.commands import Bot, Context
+from discord.ext.commands import AutoShardedBot, Bot, Context
 import exceptions
+from helpers import db_manager
+from helpers.admission import AdmissionController
+from helpers.backup import BackupManager, BackupSet
+from helpers.blacklist import Blacklist
+from helpers.cache_policy import apply_policy, resolve_policy
+from helpers.case_log import CaseLog
+from helpers.cluster import HealthReporter, cluster_from_environment
+from helpers.deferral import AutoDefer, DeferringContext
+from helpers.expiry import expire_warnings
+from helpers.lifecycle import Lifecycle
+from helpers.memory import MemoryTracer
+from helpers.prefilter import MessagePrefilter
+from helpers.profiler import SamplingProfiler
+from helpers.ratelimit import BUCKET_TYPES, RateLimiter
+from helpers.resolver import Resolver
+from helpers.scheduler import Scheduler
+from helpers.settings import SettingsStore
+from helpers.storage import create_backend, partitions_directory
+from helpers.storage.partitioned import load_map, partition_path
+from helpers.views import ViewRegistry
+from helpers.watchdog import LoopWatchdog
 
 RED_COLOR = 0xb01d1f  # Used to be 0xE02B2B
 
@@ -32,11 +53,73 @@ intents = discord.Intents.default()
 # But it is still recommended to use slash commands!
 # intents.message_content = True
 
-bot = Bot(
-    command_prefix=commands.when_mentioned_or(config["prefix"]),
-    intents=intents,
-    help_command=None,
-)
+# The member and message caches are sized by the cache policy of the config.
+cache_policy = resolve_policy(config["cache"])
+
+
+async def get_prefix(bot, message: discord.Message) -> list:
+    """
+    Resolves the prefixes of a message, using the cached settings of its server.
+
+    :param bot: The bot.
+    :param message: The message that could be a command.
+    """
+
+    if message.guild is None:
+        prefix = config["prefix"]
+    else:
+        prefix = (await bot.settings.get(message.guild.id)).prefix
+    return commands.when_mentioned_or(prefix)(bot, message)
+
+
+bot_options = {
+    "command_prefix": get_prefix,
+    "intents": intents,
+    "help_command": None,
+}
+bot_options.update(apply_policy(cache_policy, intents))
+
+# When started by the cluster launcher, this process only owns a range of the shards.
+cluster = cluster_from_environment()
+# The work on the shared files, like syncing the commands or backing up, is done by one cluster.
+primary_cluster = cluster is None or cluster["cluster_id"] == 0
+
+
+def owns_server(server_id: int) -> bool:
+    """
+    Tells if a server is on the shards of this cluster, its background work is only done here.
+    """
+
+    return cluster is None or (server_id >> 22) % cluster["shard_count"] in cluster["shard_ids"]
+
+
+if cluster is not None:
+    bot = AutoShardedBot(
+        **bot_options,
+        shard_ids=cluster["shard_ids"],
+        shard_count=cluster["shard_count"],
+    )
+
+elif config["sharding"]["enabled"]:
+    bot = AutoShardedBot(**bot_options, shard_count=config["sharding"]["shard_count"])
+
+else:
+    bot = Bot(**bot_options)
+
+
+async def get_context(origin, /, *, cls=DeferringContext) -> Context:
+    """
+    Builds the context of a message or an interaction. Hybrid commands build theirs with
+    this method too, so it is overridden to make every context a `DeferringContext`.
+
+    :param origin: The message or the interaction.
+    :param cls: The class of the context.
+    """
+
+    return await type(bot).get_context(bot, origin, cls=cls)
+
+
+bot.get_context = get_context
 
 # Setup both of the loggers
 
@@ -82,7 +165,8 @@ console_handler.setFormatter(LoggingFormatter())
 
 # File handler
 file_handler = logging.FileHandler(
-    filename="discord.log", encoding="utf-8", mode="w")
+    filename="discord.log" if cluster is None else f"discord-cluster-{cluster['cluster_id']}.log",
+    encoding="utf-8", mode="w")
 file_handler_formatter = logging.Formatter(
     "[{asctime}] [{levelname:<8}] {name}: {message}", "%Y-%m-%d %H:%M:%S", style="{"
 )
@@ -94,17 +178,154 @@ logger.addHandler(file_handler)
 bot.logger = logger
 
 
+def create_backups():
+    """
+    Create the backup manager of the storage engine, only the SQLite engines persist to files.
+    """
+
+    database_path = f"{os.path.realpath(os.path.dirname(__file__))}/database/database.database"
+    directory = f"{os.path.realpath(os.path.dirname(__file__))}/{config['backup']['directory']}"
+    options = {key: config["backup"][key] for key in ("keep", "pages", "sleep")}
+    if config["storage"]["engine"] == "sqlite":
+        return BackupManager(database_path, directory, **options, logger=logger)
+    if config["storage"]["engine"] == "partitioned":
+        partitions = partitions_directory(config["storage"], database_path)
+        count = max(load_map(partitions, config["storage"]["partitions"])) + 1
+        return BackupSet([BackupManager(database_path, directory, **options, logger=logger)] + [
+            BackupManager(
+                partition_path(partitions, partition),
+                f"{directory}/partition-{partition}",
+                **options,
+                logger=logger,
+            )
+            for partition in range(count)
+        ])
+    return None
+
+
+bot.backups = create_backups()
+
+
 async def init_database():
-    async with aiosqlite.connect(
-        f"{os.path.realpath(os.path.dirname(__file__))}/database/database.database"
-    ) as database:
-        with open(
-            f"{os.path.realpath(os.path.dirname(__file__))}/database/schema.sql", encoding="utf-8"
-        ) as sqlite_file:
-            await database.executescript(sqlite_file.read())
-        await database.commit()
+    db_manager.use_backend(create_backend(
+        config["storage"],
+        f"{os.path.realpath(os.path.dirname(__file__))}/database/database.database",
+        f"{os.path.realpath(os.path.dirname(__file__))}/database/schema.sql",
+    ))
+    await db_manager.initialize()
+    await bot.blacklist.load()
+    bot.logger.info("Loaded %s scheduled actions", await bot.scheduler.load())
 
 bot.config = config
+bot.cache_policy = cache_policy
+bot.settings = SettingsStore(config["prefix"], config["settings"]["cache_size"])
+bot.prefilter = MessagePrefilter(bot.settings, config["prefix"])
+bot.resolver = Resolver(bot, **config["resolver"])
+bot.views = ViewRegistry(**config["views"])
+bot.blacklist = Blacklist(logger=logger)
+bot.ratelimits = RateLimiter(config["ratelimits"]["defaults"], config["ratelimits"]["guilds"])
+bot.admission = AdmissionController(config["admission"]["classes"], config["admission"]["commands"])
+bot.deferral = AutoDefer(**config["deferral"])
+bot.watchdog = LoopWatchdog(**config["watchdog"], logger=logger)
+bot.profiler = SamplingProfiler(**config["profiler"])
+bot.memory_tracer = MemoryTracer(config["tracemalloc_frames"])
+bot.case_log = CaseLog(**config["case_log"], logger=logger)
+bot.scheduler = Scheduler(**config["scheduler"], owns=owns_server, logger=logger)
+bot.lifecycle = Lifecycle(
+    bot.close,
+    drain_timeout=config["lifecycle"]["drain_timeout"],
+    hook_timeout=config["lifecycle"]["hook_timeout"],
+    logger=logger,
+)
+
+# Each cluster warms the servers it cached, they are on its own shards.
+WARM_CACHE_PATH = f"{os.path.realpath(os.path.dirname(__file__))}/database/" + (
+    "warm_cache.json" if cluster is None else f"warm_cache-cluster-{cluster['cluster_id']}.json"
+)
+
+
+async def warm_caches() -> None:
+    """
+    Loads the settings of the servers that were cached when the bot last shut down.
+    """
+
+    if not os.path.isfile(WARM_CACHE_PATH):
+        return
+    try:
+        with open(WARM_CACHE_PATH, encoding="utf-8") as file:
+            guild_ids = json.load(file)["settings"]
+    except (OSError, ValueError, KeyError) as error:
+        bot.logger.warning("Could not read the warm cache: %s", error)
+        return
+    await bot.settings.warm(guild_ids)
+    bot.logger.info("Warmed the settings of %s servers", len(guild_ids))
+
+
+def persist_caches() -> None:
+    with open(WARM_CACHE_PATH, "w", encoding="utf-8") as file:
+        json.dump({"settings": bot.settings.cached_ids()}, file)
+
+
+def stop_background_work() -> None:
+    status_task.cancel()
+    cleanup_task.cancel()
+    expiry_task.cancel()
+    bot.blacklist.stop()
+    bot.scheduler.stop()
+    backup_task.cancel()
+    bot.watchdog.stop()
+    if bot.profiler.is_running():
+        bot.profiler.stop()
+    if cluster is not None:
+        bot.cluster.stop()
+
+
+def flush_logs() -> None:
+    for handler in bot.logger.handlers:
+        handler.flush()
+
+
+bot.lifecycle.add_hook("background work", stop_background_work)
+bot.lifecycle.add_hook("warm caches", persist_caches)
+bot.lifecycle.add_hook("case log", bot.case_log.close)
+bot.lifecycle.add_hook("logs", flush_logs)
+
+
+def cluster_health() -> dict:
+    """
+    Collects the health of this cluster, reported to the cluster launcher.
+    """
+
+    return {
+        "ready": bot.is_ready(),
+        "guilds": len(bot.guilds),
+        "loop_lag": bot.watchdog.lag,
+        "shards": {
+            str(shard_id): latency for shard_id, latency in bot.latencies
+        } if isinstance(bot, AutoShardedBot) else {"0": bot.latency},
+    }
+
+
+async def cluster_shutdown() -> None:
+    await bot.lifecycle.request_shutdown("cluster launcher")
+
+
+def cluster_message(message: dict) -> None:
+    if message.get("type") == "blacklist":
+        bot.blacklist.apply(message)
+
+
+if cluster is not None:
+    bot.cluster = HealthReporter(
+        cluster,
+        cluster_health,
+        cluster_shutdown,
+        interval=config["sharding"]["health_interval"],
+        logger=logger,
+        on_message=cluster_message,
+    )
+    # The blacklist is kept in memory, the other clusters apply the changes made here.
+    bot.blacklist.publish = lambda change: bot.cluster.broadcast({"type": "blacklist", **change})
 
 
 @bot.event
@@ -114,14 +335,35 @@ async def on_ready() -> None:
     """
 
     bot.logger.info("Logged in as %s", bot.user.name)
+    bot.prefilter.set_user(bot.user.id)
     bot.logger.info("discord.py API version: %s", discord.__version__)
     bot.logger.info("Python version: %s", platform.python_version())
     bot.logger.info("Running on: %s %s (%s)", platform.system(),
                     platform.release(), os.name)
+    bot.logger.info("Cache profile: %s (member cache: %s, max messages: %s)",
+                    cache_policy["profile"], cache_policy["member_cache"],
+                    cache_policy["max_messages"])
+    if cluster is not None:
+        bot.logger.info("Cluster %s running shards %s of %s", cluster["cluster_id"],
+                        cluster["shard_ids"], cluster["shard_count"])
+        bot.cluster.start()
+    else:
+        bot.lifecycle.install_signal_handlers()
     bot.logger.info("-------------------")
-    status_task.start()
-
-    if config["sync_commands_globally"]:
+    if not bot.watchdog.is_running():
+        bot.watchdog.start()
+    bot.case_log.start()
+    bot.blacklist.start()
+    bot.scheduler.start()
+    if not status_task.is_running():
+        status_task.start()
+        cleanup_task.start()
+        expiry_task.start()
+        if bot.backups is not None and primary_cluster:
+            backup_task.start()
+
+    # Only the first cluster syncs, the command tree is the same for all of them.
+    if config["sync_commands_globally"] and primary_cluster:
         bot.logger.info("Syncing commands globally...")
         await bot.tree.sync()
 
@@ -136,6 +378,95 @@ async def status_task() -> None:
     await bot.change_presence(activity=discord.Game(random.choice(status)))
 
 
+@tasks.loop(minutes=1.0)
+async def cleanup_task() -> None:
+    """
+    Stop tracking the interactive views that have expired and drop the idle rate limit buckets.
+    """
+
+    bot.views.cleanup()
+    bot.ratelimits.evict_idle()
+
+
+@tasks.loop(minutes=config["warn_expiry"]["interval"])
+async def expiry_task() -> None:
+    """
+    Expire the warnings of the servers that have an expiry policy, and compact the database.
+    """
+
+    await expire_warnings(
+        config["warn_expiry"]["batch_size"],
+        config["warn_expiry"]["max_batches"],
+        config["warn_expiry"]["vacuum_pages"],
+        bot.logger,
+        owns_server,
+    )
+
+
+@tasks.loop(hours=config["backup"]["interval"])
+async def backup_task() -> None:
+    """
+    Back up the database without stopping the bot.
+    """
+
+    try:
+        await bot.backups.backup()
+    except (OSError, sqlite3.Error) as error:
+        bot.logger.error("Could not back up the database: %s", error)
+
+
+@bot.check
+async def accepting_commands(context: Context) -> bool:
+    """
+    Refuses new commands once the bot started shutting down.
+
+    :param context: The context of the command that is about to run.
+    """
+
+    if not bot.lifecycle.accepting:
+        raise exceptions.ShuttingDown
+    return True
+
+
+@bot.check
+async def command_enabled(context: Context) -> bool:
+    """
+    Prevents the commands that have been disabled in a server from running there.
+
+    :param context: The context of the command that is about to run.
+    """
+
+    if context.guild is None:
+        return True
+
+    name = (context.command.root_parent or context.command).name
+    # The settings commands can't be disabled, or they could never be enabled again.
+    if name == "settings":
+        return True
+
+    settings = await bot.settings.get(context.guild.id)
+    if name in settings.disabled_commands:
+        raise commands.DisabledCommand(f"{name} command is disabled.")
+    return True
+
+
+@bot.check
+async def rate_limit(context: Context) -> bool:
+    """
+    Rate limits the commands that have rules in the "ratelimits" section of the config.
+
+    :param context: The context of the command that is about to run.
+    """
+
+    limited = bot.ratelimits.hit(context)
+    if limited is not None:
+        rule, retry_after = limited
+        raise commands.CommandOnCooldown(
+            commands.Cooldown(rule.rate, rule.per), retry_after, BUCKET_TYPES[rule.scope]
+        )
+    return True
+
+
 @bot.event
 async def on_message(message: discord.Message) -> None:
     """
@@ -147,9 +478,39 @@ async def on_message(message: discord.Message) -> None:
 
     if message.author == bot.user or message.author.bot:
         return
+    # Most messages are ordinary chat, don't build a context for them.
+    if not bot.prefilter.should_process(message):
+        return
     await bot.process_commands(message)
 
 
+@bot.before_invoke
+async def before_invoke(context: Context) -> None:
+    """
+    The code in this hook is executed right before a command runs, after its checks passed.
+
+    :param context: The context of the command that is about to run.
+    """
+
+    bot.lifecycle.begin(context)
+    # Armed before admission, waiting in the queue counts towards the interaction deadline.
+    bot.deferral.arm(context)
+    await bot.admission.acquire(context)
+
+
+@bot.after_invoke
+async def after_invoke(context: Context) -> None:
+    """
+    The code in this hook is executed right after a command ran.
+
+    :param context: The context of the command that ran.
+    """
+
+    bot.deferral.disarm(context)
+    bot.admission.release(context)
+    bot.lifecycle.end(context)
+
+
 @bot.event
 async def on_command_completion(context: Context) -> None:
     """
@@ -185,6 +546,11 @@ async def on_command_error(context: Context, error) -> None:
     :param error: The error that has been faced.
     """
 
+    # The after invoke hook is not called when a slash command fails.
+    bot.deferral.disarm(context)
+    bot.admission.release(context)
+    bot.lifecycle.end(context)
+
     if isinstance(error, commands.CommandOnCooldown):
         minutes, seconds = divmod(error.retry_after, 60)
         hours, minutes = divmod(minutes, 60)
@@ -243,6 +609,32 @@ async def on_command_error(context: Context, error) -> None:
                         but the user is not an owner of the bot."
             )
 
+    elif isinstance(error, commands.DisabledCommand):
+        embed = discord.Embed(
+            description="This command has been disabled in this server.", color=RED_COLOR
+        )
+        await context.send(embed=embed)
+
+    elif isinstance(error, exceptions.CommandShed):
+        embed = discord.Embed(
+            title="I'm a bit overwhelmed!",
+            description="Too many people are using this command right now, \
+                please try again in a few seconds.",
+            color=RED_COLOR,
+        )
+        await context.send(embed=embed)
+
+    elif isinstance(error, exceptions.ShuttingDown):
+        embed = discord.Embed(
+            description="The bot is restarting, please try again in a minute.",
+            color=RED_COLOR,
+        )
+        await context.send(embed=embed)
+
+    elif isinstance(error, exceptions.TooManyViews):
+        embed = discord.Embed(description=error.message, color=RED_COLOR)
+        await context.send(embed=embed)
+
     elif isinstance(error, commands.MissingPermissions):
         embed = discord.Embed(
             description="You are missing the permission(s) `"
@@ -261,6 +653,10 @@ async def on_command_error(context: Context, error) -> None:
         )
         await context.send(embed=embed)
 
+    elif isinstance(error, commands.BadArgument):
+        embed = discord.Embed(title="Error!", description=str(error), color=RED_COLOR)
+        await context.send(embed=embed)
+
     elif isinstance(error, commands.MissingRequiredArgument):
         embed = discord.Embed(
             title="Error!",
@@ -290,6 +686,10 @@ async def load_cogs() -> None:
                     "Failed to load extension %s\n%s", extension, exception)
 
 
+# The other clusters must not replace the database while it is opened by the first one.
+if bot.backups is not None and primary_cluster:
+    asyncio.run(bot.backups.restore_if_corrupt())
 asyncio.run(init_database())
+asyncio.run(warm_caches())
 asyncio.run(load_cogs())
 bot.run(config["token"])
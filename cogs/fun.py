@@ -1,6 +1,7 @@
+import asyncio
 import random
+import time
 from typing import Final
-from dataclasses import dataclass
 import discord
 
 from discord import app_commands
@@ -8,31 +9,84 @@ from discord.ext import commands
 from discord.ext.commands import Context
 from requests_cache import CachedSession
 from helpers import checks
+from helpers.models import DogPicture, Fact
 
 GREEN_COLOR = 0x72b01d  # Used to be 0x9C84EF
 RED_COLOR = 0xb01d1f  # Used to be 0xE02B2B
 
 
-class Choice(discord.ui.View):
-    def __init__(self):
-        super().__init__()
-        self.value = None
+async def check_game(interaction: discord.Interaction, user_id: int, created_at: int) -> bool:
+    """
+    Checks that a game interaction comes from the user who started the game, and that
+    the game has not expired. The game state lives in the custom ID of the component,
+    so this works for every game message, even those sent before a restart.
 
-    @discord.ui.button(label="Heads", style=discord.ButtonStyle.blurple)
-    async def confirm(
-        self, button: discord.ui.Button, interaction: discord.Interaction
+    :param interaction: The interaction with the game message.
+    :param user_id: The ID of the user who started the game.
+    :param created_at: The UNIX timestamp at which the game was started.
+    """
+
+    if interaction.user.id != user_id:
+        await interaction.response.send_message("This is not your game!", ephemeral=True)
+        return False
+
+    if time.time() - created_at > interaction.client.config["views"]["timeout"]:
+        await interaction.response.edit_message(
+            content="This game has expired.", embed=None, view=None
+        )
+        return False
+    return True
+
+
+class CoinflipButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"coinflip:(?P<user_id>[0-9]+):(?P<created_at>[0-9]+):(?P<bet>heads|tails)",
+):
+    def __init__(self, user_id: int, created_at: int, bet: str):
+        super().__init__(
+            discord.ui.Button(
+                label=bet.capitalize(),
+                style=discord.ButtonStyle.blurple,
+                custom_id=f"coinflip:{user_id}:{created_at}:{bet}",
+            )
+        )
+        self.user_id = user_id
+        self.created_at = created_at
+        self.bet = bet
+
+    @classmethod
+    async def from_custom_id(
+        cls, interaction: discord.Interaction, item: discord.ui.Button, match
     ):
-        self.value = "heads"
-        self.stop()
+        return cls(int(match["user_id"]), int(match["created_at"]), match["bet"])
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await check_game(interaction, self.user_id, self.created_at)
 
-    @discord.ui.button(label="Tails", style=discord.ButtonStyle.blurple)
-    async def cancel(self, button: discord.ui.Button, interaction: discord.Interaction):
-        self.value = "tails"
-        self.stop()
+    async def callback(self, interaction: discord.Interaction):
+        result = random.choice(["heads", "tails"])
+
+        if self.bet == result:
+            embed = discord.Embed(
+                description=f"Correct! You guessed `{self.bet}` and \
+                    I flipped the coin to `{result}`.",
+                color=GREEN_COLOR,
+            )
+
+        else:
+            embed = discord.Embed(
+                description=f"Woops! You guessed `{self.bet}` and \
+                    I flipped the coin to `{result}`, better luck next time!",
+                color=RED_COLOR,
+            )
+        await interaction.response.edit_message(embed=embed, view=None, content=None)
 
 
-class RockPaperScissors(discord.ui.Select):
-    def __init__(self):
+class RockPaperScissors(
+    discord.ui.DynamicItem[discord.ui.Select],
+    template=r"rps:(?P<user_id>[0-9]+):(?P<created_at>[0-9]+)",
+):
+    def __init__(self, user_id: int, created_at: int):
         options = [
             discord.SelectOption(
                 label="Scissors", description="You choose scissors.", emoji="✂"
@@ -45,11 +99,25 @@ class RockPaperScissors(discord.ui.Select):
             ),
         ]
         super().__init__(
-            placeholder="Choose...",
-            min_values=1,
-            max_values=1,
-            options=options,
+            discord.ui.Select(
+                custom_id=f"rps:{user_id}:{created_at}",
+                placeholder="Choose...",
+                min_values=1,
+                max_values=1,
+                options=options,
+            )
         )
+        self.user_id = user_id
+        self.created_at = created_at
+
+    @classmethod
+    async def from_custom_id(
+        cls, interaction: discord.Interaction, item: discord.ui.Select, match
+    ):
+        return cls(int(match["user_id"]), int(match["created_at"]))
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await check_game(interaction, self.user_id, self.created_at)
 
     async def callback(self, interaction: discord.Interaction):
         choices = {
@@ -57,7 +125,7 @@ class RockPaperScissors(discord.ui.Select):
             "paper": 1,
             "scissors": 2,
         }
-        user_choice = self.values[0].lower()
+        user_choice = self.item.values[0].lower()
         user_choice_index = choices[user_choice]
 
         bot_choice = random.choice(list(choices.keys()))
@@ -65,7 +133,7 @@ class RockPaperScissors(discord.ui.Select):
 
         result_embed = discord.Embed(color=GREEN_COLOR)
         result_embed.set_author(
-            name=interaction.user, icon_url=interaction.user.avatar.url
+            name=interaction.user, icon_url=interaction.user.display_avatar.url
         )
 
         if user_choice_index == bot_choice_index:
@@ -98,16 +166,17 @@ class RockPaperScissors(discord.ui.Select):
         )
 
 
-class RockPaperScissorsView(discord.ui.View):
-    def __init__(self):
-        super().__init__()
-        self.add_item(RockPaperScissors())
-
-
 class Fun(commands.Cog, name="fun"):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self) -> None:
+        # One handler serves the components of every game message.
+        self.bot.add_dynamic_items(CoinflipButton, RockPaperScissors)
+
+    async def cog_unload(self) -> None:
+        self.bot.remove_dynamic_items(CoinflipButton, RockPaperScissors)
+
     @commands.hybrid_command(name="randomfact", description="Get a random fact.")
     @checks.not_blacklisted()
     async def randomfact(self, context: Context) -> None:
@@ -117,33 +186,24 @@ class Fun(commands.Cog, name="fun"):
         :param context: The hybrid command context.
         """
 
-        url: Final = 'https://uselessfacts.jsph.pl/random.json?language=en'
+        url: Final = f"{self.bot.config['upstreams']['uselessfacts']}/random.json?language=en"
 
         session = CachedSession(
             cache_name='cache/fact_cache',
             expire_after=1
         )
 
-        @dataclass
-        class Text:
-            id: str = None
-            text: str = None
-            source: str = None
-            source_url: str = None
-            language: str = None
-            permalink: str = None
-
-        response = session.get(url)
+        # The session is synchronous, the request must not block the event loop.
+        response = await asyncio.to_thread(session.get, url)
 
         try:
-            json: dict = response.json()
-            text = Text(**json)
+            text = Fact.from_json(response.text)
 
             embed = discord.Embed(
                 description=text.text, color=GREEN_COLOR)
             await context.send(embed=embed)
 
-        except ImportError as error:
+        except ValueError as error:
             embed = discord.Embed(
                 title="Error!",
                 description=f"{response.status_code} - {error}",
@@ -160,29 +220,24 @@ class Fun(commands.Cog, name="fun"):
         :param context: The hybrid command context.
         """
 
-        url: Final = 'https://dog.ceo/api/breeds/image/random'
+        url: Final = f"{self.bot.config['upstreams']['dog']}/api/breeds/image/random"
 
         session = CachedSession(
             cache_name='cache/dog_cache',
             expire_after=1
         )
 
-        @dataclass
-        class Picture:
-            message: str = None
-            status: str = None
-
-        response = session.get(url)
+        # The session is synchronous, the request must not block the event loop.
+        response = await asyncio.to_thread(session.get, url)
 
         try:
-            json: dict = response.json()
-            message = Picture(**json)
+            picture = DogPicture.from_json(response.text)
 
             embed = discord.Embed(title="Woof Woof!", color=GREEN_COLOR)
-            embed.set_image(url=message.message)
+            embed.set_image(url=picture.url)
             await context.send(embed=embed)
 
-        except ImportError as error:
+        except ValueError as error:
             embed = discord.Embed(
                 title="Error!",
                 description=f"{response.status_code} - {error}",
@@ -217,27 +272,14 @@ class Fun(commands.Cog, name="fun"):
         :param context: The hybrid command context.
         """
 
-        buttons = Choice()
+        created_at = int(time.time())
+        buttons = discord.ui.View(timeout=None)
+        buttons.add_item(CoinflipButton(context.author.id, created_at, "heads"))
+        buttons.add_item(CoinflipButton(context.author.id, created_at, "tails"))
         embed = discord.Embed(
             description="What is your bet?", color=GREEN_COLOR)
-        message = await context.send(embed=embed, view=buttons)
-        await buttons.wait()  # We wait for the user to click a button.
-        result = random.choice(["heads", "tails"])
-
-        if buttons.value == result:
-            embed = discord.Embed(
-                description=f"Correct! You guessed `{buttons.value}` and \
-                    I flipped the coin to `{result}`.",
-                color=GREEN_COLOR,
-            )
-
-        else:
-            embed = discord.Embed(
-                description=f"Woops! You guessed `{buttons.value}` and \
-                    I flipped the coin to `{result}`, better luck next time!",
-                color=RED_COLOR,
-            )
-        await message.edit(embed=embed, view=None, content=None)
+        # The result is sent by the button once the user clicks on it.
+        await context.send(embed=embed, view=buttons)
 
     @commands.hybrid_command(
         name="rps", description="Play the rock paper scissors game against the bot."
@@ -250,7 +292,8 @@ class Fun(commands.Cog, name="fun"):
         :param context: The hybrid command context.
         """
 
-        view = RockPaperScissorsView()
+        view = discord.ui.View(timeout=None)
+        view.add_item(RockPaperScissors(context.author.id, int(time.time())))
         await context.send("Please make your choice", view=view)
 
 
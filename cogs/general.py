@@ -1,8 +1,8 @@
+import asyncio
 import platform
 import random
 from datetime import datetime
 from typing import Final
-from dataclasses import dataclass
 from requests_cache import CachedSession
 from discord import app_commands
 from discord.ext import commands
@@ -10,6 +10,7 @@ from discord.ext.commands import Context
 
 import discord
 from helpers import checks
+from helpers.models import BitcoinPrice, CovidStatus
 
 GREEN_COLOR = 0x72b01d  # Used to be 0x9C84EF
 RED_COLOR = 0xb01d1f  # Used to be 0xE02B2B
@@ -20,12 +21,23 @@ class General(commands.Cog, name="general"):
     def __init__(self, bot):
         self.bot = bot
 
+    async def get_prefix(self, context: Context) -> str:
+        """
+        Gets the prefix of the server the command was used in.
+
+        :param context: The hybrid command context.
+        """
+
+        if context.guild is None:
+            return self.bot.config["prefix"]
+        return (await self.bot.settings.get(context.guild.id)).prefix
+
     @commands.hybrid_command(
         name="help", description="List all commands the bot has loaded."
     )
     @checks.not_blacklisted()
     async def help(self, context: Context) -> None:
-        prefix = self.bot.config["prefix"]
+        prefix = await self.get_prefix(context)
         embed = discord.Embed(
             title="Help", description="List of available commands:", color=GREEN_COLOR
         )
@@ -104,7 +116,7 @@ class General(commands.Cog, name="general"):
 
         embed.add_field(
             name="Prefix:",
-            value=f"/ (Slash Commands) or {self.bot.config['prefix']} for normal commands",
+            value=f"/ (Slash Commands) or {await self.get_prefix(context)} for normal commands",
             inline=False,
         )
 
@@ -123,11 +135,20 @@ class General(commands.Cog, name="general"):
         :param ctx: The hybrid command context.
         """
 
-        count = 0
-        for member in ctx.guild.members:
-            if member.status != discord.Status.offline:
-                count += 1
-        percentage = round(float(count / ctx.guild.member_count * 100), 2)
+        if ctx.guild.chunked and self.bot.intents.presences:
+            count = 0
+            for member in ctx.guild.members:
+                if member.status != discord.Status.offline:
+                    count += 1
+            member_count = ctx.guild.member_count
+
+        else:
+            # The member cache is not complete under lean cache policies,
+            # so we ask Discord for the approximate counts instead.
+            guild = await self.bot.fetch_guild(ctx.guild.id, with_counts=True)
+            count = guild.approximate_presence_count
+            member_count = guild.approximate_member_count
+        percentage = round(float(count / member_count * 100), 2)
 
         embed = discord.Embed(
             title="trqngdk's Shelter",
@@ -139,7 +160,7 @@ class General(commands.Cog, name="general"):
         embed.add_field(name="Created",
                         value=ctx.guild.created_at.strftime("%a, %d %b %Y"), inline=False)
         embed.add_field(name="Members",
-                        value=f"{count} online out of {ctx.guild.member_count}\
+                        value=f"{count} online out of {member_count}\
                              ({percentage}%)", inline=False)
 
         embed.add_field(name="Booster",
@@ -273,32 +294,25 @@ class General(commands.Cog, name="general"):
         :param context: The hybrid command context.
         """
 
-        url: Final = 'https://api.coindesk.com/v1/bpi/currentprice/BTC.json'
+        url: Final = f"{self.bot.config['upstreams']['coindesk']}/v1/bpi/currentprice/BTC.json"
 
         session = CachedSession(
             cache_name='cache/bitcoin_cache',
             expire_after=1
         )
 
-        @dataclass
-        class Price:
-            time: str = None
-            disclaimer: str = None
-            bpi: str = None
-            BTC: str = None
-
-        response = session.get(url)
+        # The session is synchronous, the request must not block the event loop.
+        response = await asyncio.to_thread(session.get, url)
 
         try:
-            json: dict = response.json()
-            bpi = Price(**json)
+            price = BitcoinPrice.from_json(response.text)
 
             embed = discord.Embed(
                 description=f"The current price is \
-                    {bpi.bpi['USD']['rate']} dollar", color=GREEN_COLOR)
+                    {price.rate} dollar", color=GREEN_COLOR)
             await context.send(embed=embed)
 
-        except ImportError as error:
+        except ValueError as error:
             embed = discord.Embed(
                 title="Error!",
                 description=f"{response.status_code} - {error}",
@@ -318,34 +332,21 @@ class General(commands.Cog, name="general"):
         :param context: The hybrid command context.
         """
 
-        url: Final = 'https://api.apify.com/v2/key-value-stores/EaCBL1JNntjR3EakU/records/LATEST?disableRedirect=true'
+        url: Final = (
+            f"{self.bot.config['upstreams']['apify']}"
+            "/v2/key-value-stores/EaCBL1JNntjR3EakU/records/LATEST?disableRedirect=true"
+        )
 
         session = CachedSession(
             cache_name='cache/covid_cache',
             expire_after=1
         )
 
-        @dataclass
-        class Status:
-            infected: str = None
-            recovered: str = None
-            treated: str = None
-            died: str = None
-            infectedToday: str = None
-            recoveredToday: str = None
-            treatedToday: str = None
-            diedToday: str = None
-            overview: str = None
-            locations: str = None
-            sourceUrl: str = None
-            lastUpdatedAtApify: str = None
-            readMe: str = None
-
-        response = session.get(url)
+        # The session is synchronous, the request must not block the event loop.
+        response = await asyncio.to_thread(session.get, url)
 
         try:
-            json: dict = response.json()
-            status = Status(**json)
+            status = CovidStatus.from_json(response.text)
 
             embed = discord.Embed(
                 title="Vietnam's Covid-19 Status", color=GREEN_COLOR)
@@ -354,14 +355,14 @@ class General(commands.Cog, name="general"):
             embed.add_field(name="Recovered",
                             value=status.recovered)
             embed.add_field(name="Died", value=status.died)
-            embed.add_field(name="Infected Today", value=status.infectedToday)
+            embed.add_field(name="Infected Today", value=status.infected_today)
             embed.add_field(name="Recovered Today",
-                            value=status.recoveredToday)
-            embed.add_field(name="Died Today", value=status.diedToday)
+                            value=status.recovered_today)
+            embed.add_field(name="Died Today", value=status.died_today)
             embed.timestamp = datetime.now()
             await context.send(embed=embed)
 
-        except ImportError as error:
+        except ValueError as error:
             embed = discord.Embed(
                 title="Error!",
                 description=f"{response.status_code} - {error}",
@@ -1,9 +1,17 @@
+import tempfile
+import time
+from typing import Optional
+
 import discord
 
 from discord import app_commands
 from discord.ext import commands
 from discord.ext.commands import Context
 from helpers import checks, db_manager
+from helpers.case_log import export_cases
+from helpers.scheduler import ScheduledAction
+from helpers.timeparse import Duration, format_duration
+from helpers.views import PaginatedView
 
 GREEN_COLOR = 0x72b01d  # Used to be 0x9C84EF
 RED_COLOR = 0xb01d1f  # Used to be 0xE02B2B
@@ -12,6 +20,133 @@ RED_COLOR = 0xb01d1f  # Used to be 0xE02B2B
 class Moderation(commands.Cog, name="moderation"):
     def __init__(self, bot):
         self.bot = bot
+        bot.scheduler.register("unban", self.scheduled_unban)
+        bot.scheduler.register("nick", self.scheduled_nick)
+
+    async def get_member(self, guild: discord.Guild, user: discord.User):
+        """
+        Gets the member of a user in a server, without relying on the member cache.
+        Lookups go through the resolver of the bot, which caches the fetched members.
+
+        :param guild: The server the member should be in.
+        :param user: The user that should be looked up.
+        :return: The member, or None if the user is not in the server.
+        """
+
+        if isinstance(user, discord.Member) and user.guild.id == guild.id:
+            # Slash commands already resolve the member for us.
+            return user
+
+        return await self.bot.resolver.member(guild, user.id)
+
+    async def log_case(
+        self, context: Context, action: str, target=None, reason: str = None
+    ) -> None:
+        """
+        Records a moderation action in the case log, and posts it in the log channel of the server.
+
+        :param context: The context of the command that took the action.
+        :param action: The name of the action.
+        :param target: The user the action was taken against, if any.
+        :param reason: The reason of the action, if any.
+        """
+
+        await self.record_case(context.guild, context.author, action, target, reason)
+
+    async def record_case(
+        self, guild: discord.Guild, actor, action: str, target=None, reason: str = None
+    ) -> None:
+        """
+        Records a moderation action in the case log, and posts it in the log channel of the server.
+
+        :param guild: The server the action was taken in.
+        :param actor: The user who took the action, the bot for scheduled actions.
+        :param action: The name of the action.
+        :param target: The user the action was taken against, if any.
+        :param reason: The reason of the action, if any.
+        """
+
+        if target is not None:
+            # The action may have changed the member, the next lookup fetches it again.
+            self.bot.resolver.invalidate(guild.id, target.id)
+        self.bot.case_log.record(
+            guild.id,
+            action,
+            actor.id,
+            target.id if target is not None else None,
+            reason,
+        )
+
+        settings = await self.bot.settings.get(guild.id)
+        if settings.log_channel_id is None:
+            return
+        channel = guild.get_channel(settings.log_channel_id)
+        if channel is None:
+            return
+        embed = discord.Embed(title=action.capitalize(), color=GREEN_COLOR)
+        embed.add_field(name="Moderator", value=f"{actor} (ID: {actor.id})")
+        if target is not None:
+            embed.add_field(
+                name="User",
+                value=f"{target} (ID: {target.id})"
+                if isinstance(target, discord.abc.User)
+                else f"<@{target.id}> (ID: {target.id})",
+            )
+        if reason:
+            embed.add_field(name="Reason", value=reason[:1024], inline=False)
+        try:
+            await channel.send(embed=embed)
+        except discord.HTTPException:
+            # The log channel is not essential, the case is recorded anyway.
+            pass
+
+    async def scheduled_unban(self, scheduled: ScheduledAction) -> None:
+        """
+        Lifts a temporary ban, this is run by the scheduler.
+
+        :param scheduled: The scheduled unban.
+        """
+
+        guild = self.bot.get_guild(scheduled.server_id)
+        if guild is None:
+            # The bot is not in the server anymore, there is nothing to undo.
+            return
+        reason = scheduled.payload.get("reason", "Scheduled unban")
+        try:
+            await guild.unban(discord.Object(scheduled.target_id), reason=reason)
+        except discord.NotFound:
+            # The user was unbanned by hand meanwhile.
+            return
+        target = await self.bot.resolver.user(scheduled.target_id) or discord.Object(
+            scheduled.target_id
+        )
+        await self.record_case(guild, self.bot.user, "unban", target, reason)
+
+    async def scheduled_nick(self, scheduled: ScheduledAction) -> None:
+        """
+        Restores the nickname a member had before a timed nickname, this is run by the scheduler.
+
+        :param scheduled: The scheduled nickname change.
+        """
+
+        guild = self.bot.get_guild(scheduled.server_id)
+        if guild is None:
+            return
+        member = await self.get_member(guild, discord.Object(scheduled.target_id))
+        if member is None:
+            # The member left, the nickname went with them.
+            return
+        nickname = scheduled.payload.get("nick")
+        await member.edit(nick=nickname, reason="Timed nickname ended")
+        await self.record_case(
+            guild, self.bot.user, "nick", member,
+            f"Nickname restored to {nickname}" if nickname else "Nickname reset",
+        )
+
+    async def cancel_unban(self, guild_id: int, user_id: int) -> None:
+        pending = self.bot.scheduler.pending(guild_id, "unban", user_id)
+        if pending is not None:
+            await self.bot.scheduler.cancel(pending)
 
     @commands.hybrid_command(
         name="kick",
@@ -34,9 +169,13 @@ class Moderation(commands.Cog, name="moderation"):
         :param user: The user that should be kicked from the server.
         :param reason: The reason for the kick. Default is "Not specified".
         """
-        member = context.guild.get_member(user.id) or await context.guild.fetch_member(
-            user.id
-        )
+        member = await self.get_member(context.guild, user)
+        if member is None:
+            embed = discord.Embed(
+                description=f"**{user}** is not in this server.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
 
         if member.guild_permissions.administrator:
             embed = discord.Embed(
@@ -63,6 +202,7 @@ class Moderation(commands.Cog, name="moderation"):
                     # Couldn't send a message in the private messages of the user
                     pass
                 await member.kick(reason=reason)
+                await self.log_case(context, "kick", member, reason)
 
             except ImportError:
                 embed = discord.Embed(
@@ -81,28 +221,55 @@ class Moderation(commands.Cog, name="moderation"):
     @checks.not_blacklisted()
     @app_commands.describe(
         user="The user that should have a new nickname.",
+        duration="How long the nickname is kept, for example 1h. Forever if empty.",
         nickname="The new nickname that should be set.",
     )
     async def nick(
-        self, context: Context, user: discord.User, *, nickname: str = None
+        self,
+        context: Context,
+        user: discord.User,
+        duration: Optional[Duration] = None,
+        *,
+        nickname: str = None,
     ) -> None:
         """
         Change the nickname of a user on a server.
 
         :param context: The hybrid command context.
         :param user: The user that should have its nickname changed.
+        :param duration: After how many seconds the previous nickname is restored.
+        Default is None, which keeps the new nickname.
         :param nickname: The new nickname of the user.
         Default is None, which will reset the nickname.
         """
 
-        member = context.guild.get_member(user.id) or await context.guild.fetch_member(
-            user.id
-        )
+        member = await self.get_member(context.guild, user)
+        if member is None:
+            embed = discord.Embed(
+                description=f"**{user}** is not in this server.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
 
         try:
+            pending = self.bot.scheduler.pending(context.guild.id, "nick", member.id)
+            # A timed nickname replacing another one still restores the original nickname.
+            previous = pending.payload.get("nick") if pending is not None else member.nick
             await member.edit(nick=nickname)
+            if duration is not None:
+                await self.bot.scheduler.schedule(
+                    context.guild.id, "nick", member.id, duration, {"nick": previous}
+                )
+            elif pending is not None:
+                await self.bot.scheduler.cancel(pending)
+            await self.log_case(
+                context, "nick", member,
+                (f"Nickname set to {nickname}" if nickname else "Nickname reset")
+                + (f" for {format_duration(duration)}" if duration is not None else ""),
+            )
             embed = discord.Embed(
-                description=f"**{member}'s** new nickname is **{nickname}**!",
+                description=f"**{member}'s** new nickname is **{nickname}**"
+                + (f" for {format_duration(duration)}!" if duration is not None else "!"),
                 color=GREEN_COLOR,
             )
             await context.send(embed=embed)
@@ -138,12 +305,10 @@ class Moderation(commands.Cog, name="moderation"):
         :param reason: The reason for the ban. Default is "Not specified".
         """
 
-        member = context.guild.get_member(user.id) or await context.guild.fetch_member(
-            user.id
-        )
+        member = await self.get_member(context.guild, user)
 
         try:
-            if member.guild_permissions.administrator:
+            if member is not None and member.guild_permissions.administrator:
                 embed = discord.Embed(
                     description="User has administrator permissions.", color=RED_COLOR
                 )
@@ -151,22 +316,26 @@ class Moderation(commands.Cog, name="moderation"):
 
             else:
                 embed = discord.Embed(
-                    description=f"**{member}** was banned by **{context.author}**!",
+                    description=f"**{user}** was banned by **{context.author}**!",
                     color=GREEN_COLOR,
                 )
                 embed.add_field(name="Reason:", value=reason)
                 await context.send(embed=embed)
 
-                try:
-                    await member.send(
-                        f"You were banned by **{context.author}** from \
-                            **{context.guild.name}**!\nReason: {reason}"
-                    )
+                if member is not None:
+                    try:
+                        await member.send(
+                            f"You were banned by **{context.author}** from \
+                                **{context.guild.name}**!\nReason: {reason}"
+                        )
 
-                except ImportError:
-                    # Couldn't send a message in the private messages of the user
-                    pass
-                await member.ban(reason=reason)
+                    except ImportError:
+                        # Couldn't send a message in the private messages of the user
+                        pass
+                await context.guild.ban(user, reason=reason)
+                # The ban is permanent now, a pending unban must not lift it.
+                await self.cancel_unban(context.guild.id, user.id)
+                await self.log_case(context, "ban", user, reason)
 
         except ImportError:
             embed = discord.Embed(
@@ -177,6 +346,206 @@ class Moderation(commands.Cog, name="moderation"):
             )
             await context.send(embed=embed)
 
+    @commands.hybrid_command(
+        name="tempban",
+        description="Bans a user from the server for some time.",
+    )
+    @commands.has_permissions(ban_members=True)
+    @commands.bot_has_permissions(ban_members=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(
+        user="The user that should be banned.",
+        duration="How long the user stays banned, for example 12h or 1w2d.",
+        reason="The reason why the user should be banned.",
+    )
+    async def tempban(
+        self,
+        context: Context,
+        user: discord.User,
+        duration: Duration,
+        *,
+        reason: str = "Not specified",
+    ) -> None:
+        """
+        Bans a user from the server, the ban is lifted after the duration.
+
+        :param context: The hybrid command context.
+        :param user: The user that should be banned from the server.
+        :param duration: After how many seconds the ban is lifted.
+        :param reason: The reason for the ban. Default is "Not specified".
+        """
+
+        member = await self.get_member(context.guild, user)
+        if member is not None and member.guild_permissions.administrator:
+            embed = discord.Embed(
+                description="User has administrator permissions.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
+
+        try:
+            await context.guild.ban(user, reason=reason)
+        except discord.HTTPException:
+            embed = discord.Embed(
+                title="Error!",
+                description="An error occurred while trying to ban the user. \
+                    Make sure my role is above the role of the user you want to ban.",
+                color=RED_COLOR,
+            )
+            await context.send(embed=embed)
+            return
+
+        await self.bot.scheduler.schedule(
+            context.guild.id, "unban", user.id, duration,
+            {"reason": f"Temporary ban of {format_duration(duration)} ended"},
+        )
+        await self.log_case(
+            context, "tempban", user, f"{reason} ({format_duration(duration)})"
+        )
+        embed = discord.Embed(
+            description=f"**{user}** was banned by **{context.author}** \
+                until <t:{int(time.time()) + duration}>!",
+            color=GREEN_COLOR,
+        )
+        embed.add_field(name="Reason:", value=reason)
+        await context.send(embed=embed)
+
+    @commands.hybrid_command(
+        name="unban",
+        description="Unbans a user from the server, now or after a delay.",
+    )
+    @commands.has_permissions(ban_members=True)
+    @commands.bot_has_permissions(ban_members=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(
+        user="The user that should be unbanned.",
+        delay="In how long the user is unbanned, for example 3d. Right away if empty.",
+        reason="The reason why the user should be unbanned.",
+    )
+    async def unban(
+        self,
+        context: Context,
+        user: discord.User,
+        delay: Optional[Duration] = None,
+        *,
+        reason: str = "Not specified",
+    ) -> None:
+        """
+        Unbans a user from the server, right away or after a delay.
+
+        :param context: The hybrid command context.
+        :param user: The user that should be unbanned.
+        :param delay: After how many seconds the user is unbanned. Default is None, right away.
+        :param reason: The reason for the unban. Default is "Not specified".
+        """
+
+        if delay is not None:
+            await self.bot.scheduler.schedule(
+                context.guild.id, "unban", user.id, delay, {"reason": reason}
+            )
+            embed = discord.Embed(
+                description=f"**{user}** will be unbanned <t:{int(time.time()) + delay}:R>.",
+                color=GREEN_COLOR,
+            )
+            await context.send(embed=embed)
+            return
+
+        try:
+            await context.guild.unban(user, reason=reason)
+        except discord.NotFound:
+            embed = discord.Embed(
+                description=f"**{user}** is not banned from this server.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
+
+        await self.cancel_unban(context.guild.id, user.id)
+        await self.log_case(context, "unban", user, reason)
+        embed = discord.Embed(
+            description=f"**{user}** was unbanned by **{context.author}**!",
+            color=GREEN_COLOR,
+        )
+        embed.add_field(name="Reason:", value=reason)
+        await context.send(embed=embed)
+
+    @commands.hybrid_group(
+        name="scheduled",
+        description="Manage the timed moderation actions of the server.",
+    )
+    @commands.guild_only()
+    @commands.has_guild_permissions(ban_members=True)
+    @checks.not_blacklisted()
+    async def scheduled(self, context: Context) -> None:
+        """
+        Manage the timed moderation actions of the server.
+
+        :param context: The hybrid command context.
+        """
+
+        if context.invoked_subcommand is None:
+            embed = discord.Embed(
+                description="Please specify a subcommand.\n\n**Subcommands:**\n`list` - \
+                    List the upcoming actions.\n`cancel` - Cancel an action.",
+                color=RED_COLOR,
+            )
+            await context.send(embed=embed)
+
+    @scheduled.command(
+        name="list",
+        description="Lists the upcoming timed moderation actions of the server.",
+    )
+    @commands.guild_only()
+    @commands.has_guild_permissions(ban_members=True)
+    @checks.not_blacklisted()
+    async def scheduled_list(self, context: Context) -> None:
+        """
+        Lists the upcoming timed moderation actions of the server.
+
+        :param context: The hybrid command context.
+        """
+
+        actions = await db_manager.get_scheduled_actions(context.guild.id)
+        embed = discord.Embed(title="Scheduled actions", color=GREEN_COLOR)
+        if len(actions) == 0:
+            embed.description = "There are no scheduled actions in this server."
+        else:
+            embed.description = "\n".join(
+                f"**#{action_id}** {action} <@{target_id}> <t:{due_at}:R>"
+                for action_id, action, target_id, due_at, _ in actions
+            )
+        await context.send(embed=embed)
+
+    @scheduled.command(
+        name="cancel",
+        description="Cancels a timed moderation action of the server.",
+    )
+    @commands.guild_only()
+    @commands.has_guild_permissions(ban_members=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(action_id="The ID of the action, as shown by the list.")
+    async def scheduled_cancel(self, context: Context, action_id: int) -> None:
+        """
+        Cancels a timed moderation action of the server.
+
+        :param context: The hybrid command context.
+        :param action_id: The ID of the action.
+        """
+
+        scheduled = self.bot.scheduler.get(context.guild.id, action_id)
+        if scheduled is None:
+            embed = discord.Embed(
+                description=f"There is no scheduled action #{action_id}.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
+
+        await self.bot.scheduler.cancel(scheduled)
+        embed = discord.Embed(
+            description=f"The {scheduled.action} of <@{scheduled.target_id}> was cancelled.",
+            color=GREEN_COLOR,
+        )
+        await context.send(embed=embed)
+
     @commands.hybrid_group(
         name="warning",
         description="Manage warnings of a user on a server.",
@@ -194,7 +563,10 @@ class Moderation(commands.Cog, name="moderation"):
             embed = discord.Embed(
                 description="Please specify a subcommand.\n\n**Subcommands:**\n`add` - \
                     Add a warning to a user.\n`remove` - \
-                        Remove a warning from a user.\n`list` - List all warnings of a user.",
+                        Remove a warning from a user.\n`list` - List all warnings of a user.\n\
+                            `top` - Show the most warned users.\n`stats` - Show warning statistics.\n\
+                                `search` - Search the reasons of the warnings.\n\
+                                    `expiry` - Set when warnings expire.",
                 color=RED_COLOR,
             )
             await context.send(embed=embed)
@@ -220,9 +592,8 @@ class Moderation(commands.Cog, name="moderation"):
         :param reason: The reason for the warn. Default is "Not specified".
         """
 
-        member = context.guild.get_member(user.id) or await context.guild.fetch_member(
-            user.id
-        )
+        # The user can still be warned after leaving the server.
+        member = await self.get_member(context.guild, user) or user
 
         total = await db_manager.add_warn(
             user.id, context.guild.id, context.author.id, reason
@@ -270,14 +641,10 @@ class Moderation(commands.Cog, name="moderation"):
         :param warn_id: The ID of the warning that should be removed.
         """
 
-        member = context.guild.get_member(user.id) or await context.guild.fetch_member(
-            user.id
-        )
-
         total = await db_manager.remove_warn(warn_id, user.id, context.guild.id)
         embed = discord.Embed(
             description=f"I've removed the warning **#{warn_id}** from \
-                **{member}**!\nTotal warns for this user: {total}",
+                **{user}**!\nTotal warns for this user: {total}",
             color=GREEN_COLOR,
         )
         await context.send(embed=embed)
@@ -311,6 +678,163 @@ class Moderation(commands.Cog, name="moderation"):
         embed.description = description
         await context.send(embed=embed)
 
+    @warning.command(
+        name="top",
+        description="Shows the most warned users of the server.",
+    )
+    @commands.has_guild_permissions(manage_messages=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(limit="The number of users to show, at most 25.")
+    async def warning_top(self, context: Context, limit: int = 10) -> None:
+        """
+        Shows the most warned users of the server.
+
+        :param context: The hybrid command context.
+        :param limit: The number of users to show. Default is 10.
+        """
+
+        leaderboard = await db_manager.get_warn_leaderboard(
+            context.guild.id, max(1, min(limit, 25))
+        )
+        embed = discord.Embed(title="Most warned users", color=GREEN_COLOR)
+        if len(leaderboard) == 0:
+            embed.description = "Nobody has been warned in this server."
+        else:
+            embed.description = "\n".join(
+                f"**{rank}.** <@{user_id}> - {count} warning{'s' if count != 1 else ''} \
+                    (last <t:{last_warned_at}:R>)"
+                for rank, (user_id, count, last_warned_at) in enumerate(leaderboard, start=1)
+            )
+        await context.send(embed=embed)
+
+    @warning.command(
+        name="stats",
+        description="Shows the warning statistics of the server or of a user.",
+    )
+    @commands.has_guild_permissions(manage_messages=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(user="The user to get the statistics of, the whole server if empty.")
+    async def warning_stats(self, context: Context, user: discord.User = None) -> None:
+        """
+        Shows the warning statistics of the server or of a user.
+
+        :param context: The hybrid command context.
+        :param user: The user to get the statistics of. Default is None, the whole server.
+        """
+
+        stats = await db_manager.get_warn_stats(
+            context.guild.id, user.id if user is not None else None
+        )
+        embed = discord.Embed(
+            title=f"Warning statistics of {user if user is not None else context.guild.name}",
+            color=GREEN_COLOR,
+        )
+        if stats is None:
+            embed.description = "No warnings."
+        else:
+            count, warned_users, last_warned_at = stats
+            embed.add_field(name="Warnings", value=count)
+            if user is None:
+                embed.add_field(name="Warned users", value=warned_users)
+            embed.add_field(name="Last warning", value=f"<t:{last_warned_at}:R>")
+        await context.send(embed=embed)
+
+    @warning.command(
+        name="search",
+        description="Searches the reasons of the warnings of the server.",
+    )
+    @commands.has_guild_permissions(manage_messages=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(
+        query="The words to search for, end a word with * to search words starting with it.",
+        user="The user to search the warnings of, every user if empty.",
+    )
+    async def warning_search(
+        self, context: Context, query: str, user: discord.User = None
+    ) -> None:
+        """
+        Searches the reasons of the warnings of the server, the best matches first.
+
+        :param context: The hybrid command context.
+        :param query: The words to search for.
+        :param user: The user to search the warnings of. Default is None, every user.
+        """
+
+        async def fetch(limit: int, offset: int) -> tuple:
+            return await db_manager.search_warns(
+                context.guild.id, query, user.id if user is not None else None, limit, offset
+            )
+
+        def render(rows: list, page: int, pages: int, total: int) -> discord.Embed:
+            embed = discord.Embed(title=f"Warnings matching \"{query}\"", color=GREEN_COLOR)
+            if total == 0:
+                embed.description = "No warning matches your search."
+            else:
+                embed.description = "\n".join(
+                    f"• <@{user_id}> warned by <@{moderator_id}>: **{reason}** \
+                        (<t:{created_at}>) - Warn ID #{warn_id}"
+                    for user_id, moderator_id, reason, created_at, warn_id in rows
+                )
+                embed.set_footer(text=f"Page {page + 1}/{pages} - {total} warnings")
+            return embed
+
+        view = PaginatedView(self.bot.views, context.author.id, fetch, render)
+        view.message = await context.send(embed=await view.load(), view=view)
+
+    @warning.command(
+        name="expiry",
+        description="Shows or sets after how many days warnings expire in the server.",
+    )
+    @commands.has_guild_permissions(manage_guild=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(
+        days="The number of days after which warnings expire, 0 to never expire them.",
+        action="What happens to expired warnings. Can be `delete` or `archive`.",
+    )
+    async def warning_expiry(
+        self, context: Context, days: int = None, action: str = "delete"
+    ) -> None:
+        """
+        Shows or sets after how many days warnings expire in the server.
+
+        :param context: The hybrid command context.
+        :param days: The number of days after which warnings expire. Default is None, which shows the policy.
+        :param action: What happens to expired warnings. Default is "delete".
+        """
+
+        if days is None:
+            policy = await db_manager.get_warn_expiry_policy(context.guild.id)
+            embed = discord.Embed(
+                description=f"Warnings expire after {policy[0] // 86400} days and are then \
+                    {'archived' if policy[1] == 'archive' else 'deleted'}."
+                if policy is not None
+                else "Warnings never expire in this server.",
+                color=GREEN_COLOR,
+            )
+            await context.send(embed=embed)
+            return
+
+        if days < 0 or action not in ("delete", "archive"):
+            embed = discord.Embed(
+                description="The number of days can't be negative and the action must be \
+                    `delete` or `archive`.",
+                color=RED_COLOR,
+            )
+            await context.send(embed=embed)
+            return
+
+        await db_manager.set_warn_expiry_policy(
+            context.guild.id, days * 86400 if days > 0 else None, action
+        )
+        embed = discord.Embed(
+            description=f"Warnings now expire after {days} days and are then \
+                {'archived' if action == 'archive' else 'deleted'}."
+            if days > 0
+            else "Warnings will not expire anymore.",
+            color=GREEN_COLOR,
+        )
+        await context.send(embed=embed)
+
     @commands.hybrid_command(
         name="purge",
         description="Delete a number of messages.",
@@ -327,17 +851,21 @@ class Moderation(commands.Cog, name="moderation"):
         :param amount: The number of messages that should be deleted.
         """
 
-        # Bit of a hacky way to make sure the bot responds to the
-        # interaction and doens't get a "Unknown Interaction" response
-        await context.send(
-            "Deleting messages..."
+        # An ephemeral response is not in the channel, so the purge can't delete it.
+        # It is a no-op if the interaction was deferred automatically, ephemerally too.
+        await context.defer(ephemeral=True)
+        # The message that invoked a prefix command is deleted with the others.
+        invocation = 1 if context.interaction is None else 0
+        purged_messages = await context.channel.purge(limit=amount + invocation)
+        purged = len(purged_messages) - invocation
+        await self.log_case(
+            context, "purge", reason=f"{purged} messages in #{context.channel}"
         )
-        purged_messages = await context.channel.purge(limit=amount + 1)
         embed = discord.Embed(
-            description=f"**{context.author}** cleared **{len(purged_messages)-1}** messages!",
+            description=f"**{context.author}** cleared **{purged}** messages!",
             color=GREEN_COLOR,
         )
-        await context.channel.send(embed=embed)
+        await context.send(embed=embed)
 
     @commands.hybrid_command(
         name="hackban",
@@ -363,11 +891,14 @@ class Moderation(commands.Cog, name="moderation"):
 
         try:
             await self.bot.http.ban(user_id, context.guild.id, reason=reason)
-            user = self.bot.get_user(int(user_id)) or await self.bot.fetch_user(
-                int(user_id)
+            await self.cancel_unban(context.guild.id, int(user_id))
+            user = await self.bot.resolver.user(int(user_id))
+            await self.log_case(
+                context, "hackban", user or discord.Object(int(user_id)), reason
             )
             embed = discord.Embed(
-                description=f"**{user}** (ID: {user_id}) was banned by **{context.author}**!",
+                description=f"**{user or user_id}** (ID: {user_id}) \
+                    was banned by **{context.author}**!",
                 color=GREEN_COLOR,
             )
             embed.add_field(name="Reason:", value=reason)
@@ -381,6 +912,116 @@ class Moderation(commands.Cog, name="moderation"):
             )
             await context.send(embed=embed)
 
+    @commands.hybrid_group(
+        name="cases",
+        description="Manage the moderation cases of the server.",
+    )
+    @commands.guild_only()
+    @commands.has_guild_permissions(view_audit_log=True)
+    @checks.not_blacklisted()
+    async def cases(self, context: Context) -> None:
+        """
+        Manage the moderation cases of the server.
+
+        :param context: The hybrid command context.
+        """
+
+        if context.invoked_subcommand is None:
+            embed = discord.Embed(
+                description="Please specify a subcommand.\n\n**Subcommands:**\n`export` - \
+                    Export the moderation cases of the server.\n`search` - \
+                        Search the reasons of the moderation cases.",
+                color=RED_COLOR,
+            )
+            await context.send(embed=embed)
+
+    @cases.command(
+        name="export",
+        description="Exports the moderation cases of the server as JSON lines or CSV.",
+    )
+    @commands.guild_only()
+    @commands.has_guild_permissions(view_audit_log=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(export_format="The format of the export. Can be `jsonl` or `csv`.")
+    async def cases_export(self, context: Context, export_format: str = "jsonl") -> None:
+        """
+        Exports the moderation cases of the server as a compressed JSON lines or CSV file.
+
+        :param context: The hybrid command context.
+        :param export_format: The format of the export. Default is "jsonl".
+        """
+
+        if export_format not in ("jsonl", "csv"):
+            embed = discord.Embed(
+                description="The format must be `jsonl` or `csv`.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
+
+        await context.defer()
+        # Include the cases that are still waiting to be written.
+        await self.bot.case_log.flush()
+        with tempfile.TemporaryFile() as file:
+            count = await export_cases(context.guild.id, export_format, file)
+            size = file.seek(0, 2)
+            file.seek(0)
+            if size > context.guild.filesize_limit:
+                embed = discord.Embed(
+                    description=f"The export of the {count} cases is too large to be uploaded.",
+                    color=RED_COLOR,
+                )
+                await context.send(embed=embed)
+                return
+
+            embed = discord.Embed(
+                description=f"Exported {count} cases.", color=GREEN_COLOR
+            )
+            await context.send(
+                embed=embed,
+                file=discord.File(file, filename=f"cases-{context.guild.id}.{export_format}.gz"),
+            )
+
+    @cases.command(
+        name="search",
+        description="Searches the reasons of the moderation cases of the server.",
+    )
+    @commands.guild_only()
+    @commands.has_guild_permissions(view_audit_log=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(
+        query="The words to search for, end a word with * to search words starting with it."
+    )
+    async def cases_search(self, context: Context, *, query: str) -> None:
+        """
+        Searches the reasons of the moderation cases of the server, the best matches first.
+
+        :param context: The hybrid command context.
+        :param query: The words to search for.
+        """
+
+        # Include the cases that are still waiting to be written.
+        await self.bot.case_log.flush()
+
+        async def fetch(limit: int, offset: int) -> tuple:
+            return await db_manager.search_cases(context.guild.id, query, limit, offset)
+
+        def render(rows: list, page: int, pages: int, total: int) -> discord.Embed:
+            embed = discord.Embed(title=f"Cases matching \"{query}\"", color=GREEN_COLOR)
+            if total == 0:
+                embed.description = "No case matches your search."
+            else:
+                embed.description = "\n".join(
+                    f"• Case #{case_id}: **{action}** by <@{actor_id}>"
+                    + (f" against <@{target_id}>" if target_id is not None else "")
+                    + f": {reason} ({created_at} UTC)"
+                    for case_id, action, actor_id, target_id, reason, created_at in rows
+                )
+                embed.set_footer(text=f"Page {page + 1}/{pages} - {total} cases")
+            return embed
+
+        view = PaginatedView(self.bot.views, context.author.id, fetch, render)
+        view.message = await context.send(embed=await view.load(), view=view)
+
 
 async def setup(bot):
     await bot.add_cog(Moderation(bot))
@@ -1,9 +1,20 @@
+import asyncio
+import io
+import json
+import os
+import sqlite3
+import time
+from typing import Optional
+
 import discord
 from discord import app_commands
 from discord.ext import commands
 from discord.ext.commands import Context
 
-from helpers import checks, db_manager
+from helpers import checks, db_manager, metrics
+from helpers.memory import cache_sizes, process_memory
+from helpers.ratelimit import BUCKET_TYPES, Rule
+from helpers.timeparse import Duration, format_duration
 
 GREEN_COLOR = 0x72b01d  # Used to be 0x9C84EF
 RED_COLOR = 0xb01d1f  # Used to be 0xE02B2B
@@ -190,9 +201,49 @@ class Owner(commands.Cog, name="owner"):
         """
 
         embed = discord.Embed(
-            description="Shutting down. Bye! :wave:", color=GREEN_COLOR)
+            description="Shutting down once the running commands are done. Bye! :wave:",
+            color=GREEN_COLOR,
+        )
+        await context.send(embed=embed)
+        # This command is in flight too, so the shutdown must not be awaited here.
+        self.bot.lifecycle.request_shutdown(f"requested by {context.author}")
+
+    @commands.hybrid_command(
+        name="backup",
+        description="Back up the database without stopping the bot.",
+    )
+    @checks.is_owner()
+    async def backup(self, context: Context) -> None:
+        """
+        Back up the database without stopping the bot.
+
+        :param context: The hybrid command context.
+        """
+
+        if self.bot.backups is None:
+            embed = discord.Embed(
+                description="Only the SQLite storage engines can be backed up.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
+
+        await context.defer()
+        try:
+            path, size, elapsed = await self.bot.backups.backup()
+        except (OSError, sqlite3.Error) as error:
+            embed = discord.Embed(
+                description=f"The backup failed: {error}", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
+
+        embed = discord.Embed(
+            description=f"Backed up the database to `{os.path.basename(path)}` \
+                ({size / 1024:.0f} KiB) in {elapsed:.1f} seconds. \
+                    {len(self.bot.backups.backups())} backups are kept.",
+            color=GREEN_COLOR,
+        )
         await context.send(embed=embed)
-        await self.bot.close()
 
     @commands.hybrid_command(
         name="say",
@@ -227,6 +278,366 @@ class Owner(commands.Cog, name="owner"):
         embed = discord.Embed(description=message, color=GREEN_COLOR)
         await context.send(embed=embed)
 
+    @commands.hybrid_command(
+        name="lag",
+        description="Shows the worst recent blocking calls of the event loop.",
+    )
+    @checks.is_owner()
+    async def lag(self, context: Context) -> None:
+        """
+        Shows the lag of the event loop and the sites that blocked it the most recently.
+
+        :param context: The hybrid command context.
+        """
+
+        watchdog = self.bot.watchdog
+        embed = discord.Embed(
+            title="Event loop lag",
+            description=f"Current: {watchdog.lag * 1000:.1f} ms\n"
+            f"Worst: {watchdog.max_lag * 1000:.1f} ms\n"
+            f"Recent stalls: {len(watchdog.stalls)}",
+            color=GREEN_COLOR,
+        )
+        for site, count, worst, total in watchdog.report(limit=10):
+            embed.add_field(
+                name=site[:256],
+                value=f"{count} stalls, worst {worst * 1000:.0f} ms, total {total * 1000:.0f} ms",
+                inline=False,
+            )
+        await context.send(embed=embed)
+
+    @commands.hybrid_group(
+        name="profile",
+        description="Profile the CPU usage of the bot.",
+    )
+    @checks.is_owner()
+    async def profile(self, context: Context) -> None:
+        """
+        Lets you profile the CPU usage of the bot without restarting it.
+
+        :param context: The hybrid command context.
+        """
+
+        if context.invoked_subcommand is None:
+            embed = discord.Embed(
+                description="You need to specify a subcommand.\n\n**Subcommands:**\n`\
+                    start` - Start the sampling profiler.\n\
+                        `stop` - Stop the profiler and send its results.",
+                color=RED_COLOR,
+            )
+            await context.send(embed=embed)
+
+    @profile.command(
+        base="profile",
+        name="start",
+        description="Start the sampling profiler.",
+    )
+    @checks.is_owner()
+    async def profile_start(self, context: Context) -> None:
+        """
+        Start the sampling profiler.
+
+        :param context: The hybrid command context.
+        """
+
+        if self.bot.profiler.is_running():
+            embed = discord.Embed(
+                description="The profiler is already running.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
+
+        self.bot.profiler.start()
+        embed = discord.Embed(
+            description=f"The profiler is running, it will stop by itself after \
+                {self.bot.profiler.max_duration:g} seconds.",
+            color=GREEN_COLOR,
+        )
+        await context.send(embed=embed)
+
+    @profile.command(
+        base="profile",
+        name="stop",
+        description="Stop the profiler and send its results.",
+    )
+    @app_commands.describe(
+        seconds="Keep sampling for this many seconds before stopping, starting the profiler if needed."
+    )
+    @checks.is_owner()
+    async def profile_stop(self, context: Context, seconds: float = None) -> None:
+        """
+        Stop the profiler and send the collapsed stacks and the hottest functions.
+
+        :param context: The hybrid command context.
+        :param seconds: Keep sampling for this many seconds before stopping. Default is None.
+        """
+
+        profiler = self.bot.profiler
+        if seconds is None and not profiler.is_running() and not profiler.elapsed:
+            embed = discord.Embed(
+                description="The profiler was never started.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
+
+        if seconds is not None:
+            seconds = min(seconds, profiler.max_duration)
+            if not profiler.is_running():
+                profiler.start()
+            await context.defer()
+            await asyncio.sleep(seconds)
+
+        profile = await asyncio.to_thread(profiler.stop)
+        files = [
+            discord.File(io.BytesIO(profile.collapsed().encode()), filename="profile.collapsed"),
+            discord.File(io.BytesIO(profile.top().encode()), filename="profile-top.txt"),
+        ]
+        embed = discord.Embed(
+            description=f"Took {profile.total} samples in {profile.duration:.1f} seconds.",
+            color=GREEN_COLOR,
+        )
+        await context.send(embed=embed, files=files)
+
+    @commands.hybrid_group(
+        name="stats",
+        description="Inspect the memory and the caches of the bot.",
+    )
+    @checks.is_owner()
+    async def stats(self, context: Context) -> None:
+        """
+        Lets you inspect the memory and the caches of the bot.
+
+        :param context: The hybrid command context.
+        """
+
+        if context.invoked_subcommand is None:
+            embed = discord.Embed(
+                description="You need to specify a subcommand.\n\n**Subcommands:**\n`\
+                    show` - Show the memory usage and the size of the caches.\n\
+                        `snapshot` - Take a baseline allocation snapshot.\n\
+                            `diff` - Show the allocation growth since the snapshot.",
+                color=RED_COLOR,
+            )
+            await context.send(embed=embed)
+
+    @stats.command(
+        base="stats",
+        name="show",
+        description="Show the memory usage and the size of the caches.",
+    )
+    @checks.is_owner()
+    async def stats_show(self, context: Context) -> None:
+        """
+        Show the memory usage of the process and the size of the caches.
+
+        :param context: The hybrid command context.
+        """
+
+        def mib(size) -> str:
+            return f"{size / 1024 / 1024:.1f} MiB" if size is not None else "Unknown"
+
+        memory = process_memory()
+        embed = discord.Embed(title="Stats", color=GREEN_COLOR)
+        embed.add_field(
+            name="Process",
+            value=f"RSS: {mib(memory['rss'])}\n"
+            f"Peak RSS: {mib(memory['peak_rss'])}\n"
+            f"Allocated blocks: {memory['allocated_blocks']}\n"
+            f"Traced: {mib(memory['traced']) if memory['traced'] is not None else 'Not tracing'}",
+            inline=False,
+        )
+        embed.add_field(
+            name="Garbage collector",
+            value=f"Pending: {' / '.join(map(str, memory['gc_counts']))}\n"
+            f"Collections: {' / '.join(map(str, memory['gc_collections']))}",
+            inline=False,
+        )
+        embed.add_field(
+            name="discord.py caches",
+            value="\n".join(f"{name}: {size}" for name, size in cache_sizes(self.bot).items()),
+            inline=False,
+        )
+        embed.add_field(
+            name="Bot metrics",
+            value="\n".join(
+                f"{name}: {value:g}" if isinstance(value, float) else f"{name}: {value}"
+                for name, value in metrics.snapshot().items()
+            )[:1024] or "None",
+            inline=False,
+        )
+        await context.send(embed=embed)
+
+    @stats.command(
+        base="stats",
+        name="snapshot",
+        description="Take the allocation snapshot the next diffs compare to.",
+    )
+    @checks.is_owner()
+    async def stats_snapshot(self, context: Context) -> None:
+        """
+        Take the allocation snapshot the next diffs compare to, this starts tracing allocations.
+
+        :param context: The hybrid command context.
+        """
+
+        await context.defer()
+        self.bot.memory_tracer.set_baseline(time.time())
+        embed = discord.Embed(
+            description="Took an allocation snapshot, allocations are traced until \
+                `stats diff` is used with `stop`.",
+            color=GREEN_COLOR,
+        )
+        await context.send(embed=embed)
+
+    @stats.command(
+        base="stats",
+        name="diff",
+        description="Show the allocation growth since the snapshot.",
+    )
+    @app_commands.describe(
+        limit="The number of allocation sites to show.",
+        stop="Stop tracing allocations after the diff.",
+    )
+    @checks.is_owner()
+    async def stats_diff(self, context: Context, limit: int = 10, stop: bool = False) -> None:
+        """
+        Show the allocation sites that grew the most since the snapshot.
+
+        :param context: The hybrid command context.
+        :param limit: The number of allocation sites to show. Default is 10.
+        :param stop: Stop tracing allocations after the diff. Default is False.
+        """
+
+        tracer = self.bot.memory_tracer
+        await context.defer()
+        statistics = tracer.diff(limit)
+        if statistics is None:
+            embed = discord.Embed(
+                description="There is no snapshot, use `stats snapshot` first.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
+
+        elapsed = time.time() - tracer.taken_at
+        report = "\n".join(str(statistic) for statistic in statistics) or "Nothing grew."
+        embed = discord.Embed(
+            title=f"Allocation growth over {elapsed / 60:.1f} minutes",
+            description="\n".join(
+                f"`+{statistic.size_diff / 1024:.1f} KiB` {statistic.traceback[0]}"
+                for statistic in statistics[:5]
+            ) or "Nothing grew.",
+            color=GREEN_COLOR,
+        )
+        if stop:
+            tracer.stop()
+            embed.set_footer(text="Allocations are not traced anymore.")
+        await context.send(
+            embed=embed,
+            file=discord.File(io.BytesIO(report.encode()), filename="memory-diff.txt"),
+        )
+
+    @commands.hybrid_group(
+        name="ratelimit",
+        description="Manage the rate limits of the commands.",
+    )
+    @checks.is_owner()
+    async def ratelimit(self, context: Context) -> None:
+        """
+        Lets you change the rate limits of the commands without restarting the bot.
+
+        :param context: The hybrid command context.
+        """
+
+        if context.invoked_subcommand is None:
+            embed = discord.Embed(
+                description="You need to specify a subcommand.\n\n**Subcommands:**\n`\
+                    set` - Set the rate limit of a command.\n\
+                        `reload` - Reload the rate limits from the config.",
+                color=RED_COLOR,
+            )
+            await context.send(embed=embed)
+
+    @ratelimit.command(
+        base="ratelimit",
+        name="set",
+        description="Set the rate limit of a command, globally or for a server.",
+    )
+    @app_commands.describe(
+        command="The name of the command.",
+        rate="How many times the command can be used, 0 removes the rate limit.",
+        per="The number of seconds the rate applies to.",
+        scope="What the rate limit is keyed by. Can be `user`, `channel` or `guild`.",
+        guild_id="The ID of the server the rate limit applies to, all servers if empty.",
+    )
+    @checks.is_owner()
+    async def ratelimit_set(
+        self,
+        context: Context,
+        command: str,
+        rate: int,
+        per: float = 60.0,
+        scope: str = "user",
+        guild_id: str = None,
+    ) -> None:
+        """
+        Set the rate limit of a command, globally or for a server.
+
+        :param context: The hybrid command context.
+        :param command: The name of the command.
+        :param rate: How many times the command can be used, 0 removes the rate limit.
+        :param per: The number of seconds the rate applies to.
+        :param scope: What the rate limit is keyed by.
+        :param guild_id: The ID of the server the rate limit applies to, all servers if empty.
+        """
+
+        if self.bot.get_command(command) is None or scope not in BUCKET_TYPES:
+            embed = discord.Embed(
+                description="The command must exist and the scope must be `user`, `channel` or `guild`.",
+                color=RED_COLOR,
+            )
+            await context.send(embed=embed)
+            return
+
+        rules = [Rule(rate, per, scope)] if rate > 0 else []
+        self.bot.ratelimits.set_rules(
+            self.bot.get_command(command).qualified_name,
+            rules,
+            int(guild_id) if guild_id else None,
+        )
+        where = f"in the server {guild_id}" if guild_id else "globally"
+        embed = discord.Embed(
+            description=f"The `{command}` command can now be used {rate} times \
+                every {per} seconds per {scope} {where}."
+            if rules
+            else f"The `{command}` command is not rate limited {where} anymore.",
+            color=GREEN_COLOR,
+        )
+        await context.send(embed=embed)
+
+    @ratelimit.command(
+        base="ratelimit",
+        name="reload",
+        description="Reload the rate limits from the config.",
+    )
+    @checks.is_owner()
+    async def ratelimit_reload(self, context: Context) -> None:
+        """
+        Reload the rate limits from the config.
+
+        :param context: The hybrid command context.
+        """
+
+        with open(
+            f"{os.path.realpath(os.path.dirname(__file__))}/../config.json", encoding="utf-8"
+        ) as file:
+            ratelimits = json.load(file)["ratelimits"]
+        self.bot.ratelimits.configure(ratelimits["defaults"], ratelimits["guilds"])
+        self.bot.config["ratelimits"] = ratelimits
+        embed = discord.Embed(
+            description="The rate limits have been reloaded.", color=GREEN_COLOR
+        )
+        await context.send(embed=embed)
+
     @commands.hybrid_group(
         name="blacklist",
         description="Get the list of all blacklisted users.",
@@ -273,12 +684,18 @@ class Owner(commands.Cog, name="owner"):
         embed = discord.Embed(title="Blacklisted Users", color=GREEN_COLOR)
         users = []
 
-        for bluser in blacklisted_users:
-            user = self.bot.get_user(int(bluser[0])) or await self.bot.fetch_user(
-                int(bluser[0])
-            )
-            users.append(
-                f"• {user.mention} ({user}) - Blacklisted <t:{bluser[1]}>")
+        resolved = await asyncio.gather(
+            *(self.bot.resolver.user(int(bluser[0])) for bluser in blacklisted_users)
+        )
+        for bluser, user in zip(blacklisted_users, resolved):
+            scope = ""
+            if bluser[2] is not None:
+                guild = self.bot.get_guild(int(bluser[2]))
+                scope += f" in **{guild.name if guild is not None else bluser[2]}**"
+            if bluser[3] is not None:
+                scope += f" until <t:{bluser[3]}>"
+            name = f"{user.mention} ({user})" if user is not None else f"<@{bluser[0]}>"
+            users.append(f"• {name} - Blacklisted <t:{bluser[1]}>{scope}")
 
         embed.description = "\n".join(users)
         await context.send(embed=embed)
@@ -288,18 +705,41 @@ class Owner(commands.Cog, name="owner"):
         name="add",
         description="Lets you add a user from not being able to use the bot.",
     )
-    @app_commands.describe(user="The user that should be added to the blacklist")
+    @app_commands.describe(
+        user="The user that should be added to the blacklist",
+        duration="How long the user stays blacklisted, for example 12h or 1w2d, forever if empty.",
+        here="Only blacklist the user in this server.",
+    )
     @checks.is_owner()
-    async def blacklist_add(self, context: Context, user: discord.User) -> None:
+    async def blacklist_add(
+        self,
+        context: Context,
+        user: discord.User,
+        duration: Optional[Duration] = None,
+        here: bool = False,
+    ) -> None:
         """
         Lets you add a user from not being able to use the bot.
 
         :param context: The hybrid command context.
         :param user: The user that should be added to the blacklist.
+        :param duration: How long the user stays blacklisted, in seconds. Default is None, forever.
+        :param here: True to only blacklist the user in this server. Default is False.
         """
 
-        user_id = user.id
-        if await db_manager.is_blacklisted(user_id):
+        if here and context.guild is None:
+            embed = discord.Embed(
+                description="Server entries can only be added in a server.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
+        server_id = context.guild.id if here else None
+        # An expiring entry can be made permanent, only a permanent one is left as is.
+        if (
+            duration is None
+            and self.bot.blacklist.has_entry(user.id, server_id)
+            and self.bot.blacklist.expires_at(user.id, server_id) is None
+        ):
             embed = discord.Embed(
                 description=f"**{user.name}** is already in the blacklist.",
                 color=RED_COLOR,
@@ -307,9 +747,11 @@ class Owner(commands.Cog, name="owner"):
             await context.send(embed=embed)
             return
 
-        total = await db_manager.add_user_to_blacklist(user_id)
+        total = await self.bot.blacklist.add(user.id, server_id, duration)
         embed = discord.Embed(
-            description=f"**{user.name}** has been successfully added to the blacklist",
+            description=f"**{user.name}** has been successfully added to the blacklist"
+            + (" of this server" if server_id is not None else "")
+            + (f" for {format_duration(duration)}" if duration is not None else ""),
             color=GREEN_COLOR,
         )
 
@@ -324,25 +766,37 @@ class Owner(commands.Cog, name="owner"):
         name="remove",
         description="Lets you remove a user from not being able to use the bot.",
     )
-    @app_commands.describe(user="The user that should be removed from the blacklist.")
+    @app_commands.describe(
+        user="The user that should be removed from the blacklist.",
+        here="Remove the entry of this server instead of the global one.",
+    )
     @checks.is_owner()
-    async def blacklist_remove(self, context: Context, user: discord.User) -> None:
+    async def blacklist_remove(
+        self, context: Context, user: discord.User, here: bool = False
+    ) -> None:
         """
         Lets you remove a user from not being able to use the bot.
 
         :param context: The hybrid command context.
         :param user: The user that should be removed from the blacklist.
+        :param here: True to remove the entry of this server. Default is False.
         """
 
-        user_id = user.id
-        if not await db_manager.is_blacklisted(user_id):
+        if here and context.guild is None:
+            embed = discord.Embed(
+                description="Server entries can only be removed in a server.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
+        server_id = context.guild.id if here else None
+        if not self.bot.blacklist.has_entry(user.id, server_id):
             embed = discord.Embed(
                 description=f"**{user.name}** is not in the blacklist.", color=RED_COLOR
             )
             await context.send(embed=embed)
             return
 
-        total = await db_manager.remove_user_from_blacklist(user_id)
+        total = await self.bot.blacklist.remove(user.id, server_id)
         embed = discord.Embed(
             description=f"**{user.name}** has been successfully removed from the blacklist",
             color=GREEN_COLOR,
@@ -0,0 +1,206 @@
+import discord
+
+from discord import app_commands
+from discord.ext import commands
+from discord.ext.commands import Context
+from helpers import checks
+
+GREEN_COLOR = 0x72b01d  # Used to be 0x9C84EF
+RED_COLOR = 0xb01d1f  # Used to be 0xE02B2B
+
+
+class Settings(commands.Cog, name="settings"):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.hybrid_group(
+        name="settings",
+        description="Manage the settings of the bot in this server.",
+    )
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @checks.not_blacklisted()
+    async def settings(self, context: Context) -> None:
+        """
+        Manage the settings of the bot in this server.
+
+        :param context: The hybrid command context.
+        """
+
+        if context.invoked_subcommand is None:
+            embed = discord.Embed(
+                description="Please specify a subcommand.\n\n**Subcommands:**\n`show` - \
+                    Show the settings of the server.\n`prefix` - Change the prefix.\n`disable` - \
+                        Disable a command.\n`enable` - Enable a command.\n`logchannel` - \
+                            Set the log channel.",
+                color=RED_COLOR,
+            )
+            await context.send(embed=embed)
+
+    @settings.command(
+        name="show",
+        description="Shows the settings of the bot in this server.",
+    )
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @checks.not_blacklisted()
+    async def settings_show(self, context: Context) -> None:
+        """
+        Shows the settings of the bot in this server.
+
+        :param context: The hybrid command context.
+        """
+
+        settings = await self.bot.settings.get(context.guild.id)
+        embed = discord.Embed(title=f"Settings of {context.guild.name}", color=GREEN_COLOR)
+        embed.add_field(name="Prefix", value=f"`{settings.prefix}`", inline=False)
+        embed.add_field(
+            name="Disabled commands",
+            value=", ".join(f"`{name}`" for name in sorted(settings.disabled_commands))
+            or "None",
+            inline=False,
+        )
+        embed.add_field(
+            name="Log channel",
+            value=f"<#{settings.log_channel_id}>" if settings.log_channel_id else "None",
+            inline=False,
+        )
+        await context.send(embed=embed)
+
+    @settings.command(
+        name="prefix",
+        description="Changes the prefix of the bot in this server.",
+    )
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(prefix="The new prefix, leave empty to use the default prefix.")
+    async def settings_prefix(self, context: Context, prefix: str = None) -> None:
+        """
+        Changes the prefix of the bot in this server.
+
+        :param context: The hybrid command context.
+        :param prefix: The new prefix. Default is None, which will reset the prefix.
+        """
+
+        if prefix is not None and (len(prefix) > 32 or prefix.strip() != prefix):
+            embed = discord.Embed(
+                description="The prefix must be at most 32 characters long \
+                    and can't start or end with a space.",
+                color=RED_COLOR,
+            )
+            await context.send(embed=embed)
+            return
+
+        settings = await self.bot.settings.update(
+            context.guild.id, prefix=prefix or self.bot.config["prefix"]
+        )
+        embed = discord.Embed(
+            description=f"The prefix is now `{settings.prefix}`.", color=GREEN_COLOR
+        )
+        await context.send(embed=embed)
+
+    @settings.command(
+        name="disable",
+        description="Disables a command in this server.",
+    )
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(command="The name of the command that should be disabled.")
+    async def settings_disable(self, context: Context, command: str) -> None:
+        """
+        Disables a command in this server.
+
+        :param context: The hybrid command context.
+        :param command: The name of the command that should be disabled.
+        """
+
+        found = self.bot.get_command(command)
+        # Commands are disabled as a whole, with all their subcommands.
+        name = (found.root_parent or found).name if found is not None else None
+        if name is None or name == "settings":
+            embed = discord.Embed(
+                description=f"There is no command named `{command}` that can be disabled.",
+                color=RED_COLOR,
+            )
+            await context.send(embed=embed)
+            return
+
+        await self.bot.settings.update(
+            context.guild.id,
+            disabled_commands=lambda disabled_commands: disabled_commands | {name},
+        )
+        embed = discord.Embed(
+            description=f"The `{name}` command has been disabled.", color=GREEN_COLOR
+        )
+        await context.send(embed=embed)
+
+    @settings.command(
+        name="enable",
+        description="Enables a command in this server.",
+    )
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(command="The name of the command that should be enabled.")
+    async def settings_enable(self, context: Context, command: str) -> None:
+        """
+        Enables a command in this server.
+
+        :param context: The hybrid command context.
+        :param command: The name of the command that should be enabled.
+        """
+
+        found = self.bot.get_command(command)
+        # Resolved like when it was disabled, the name of a removed command is taken as is.
+        name = (found.root_parent or found).name if found is not None else command
+        settings = await self.bot.settings.get(context.guild.id)
+        if name not in settings.disabled_commands:
+            embed = discord.Embed(
+                description=f"The `{name}` command is not disabled.", color=RED_COLOR
+            )
+            await context.send(embed=embed)
+            return
+
+        await self.bot.settings.update(
+            context.guild.id,
+            disabled_commands=lambda disabled_commands: disabled_commands - {name},
+        )
+        embed = discord.Embed(
+            description=f"The `{name}` command has been enabled.", color=GREEN_COLOR
+        )
+        await context.send(embed=embed)
+
+    @settings.command(
+        name="logchannel",
+        description="Sets the channel the bot sends its logs to in this server.",
+    )
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    @checks.not_blacklisted()
+    @app_commands.describe(channel="The log channel, leave empty to disable logging.")
+    async def settings_logchannel(
+        self, context: Context, channel: discord.TextChannel = None
+    ) -> None:
+        """
+        Sets the channel the bot sends its logs to in this server.
+
+        :param context: The hybrid command context.
+        :param channel: The log channel. Default is None, which will disable logging.
+        """
+
+        await self.bot.settings.update(
+            context.guild.id, log_channel_id=channel.id if channel else None
+        )
+        embed = discord.Embed(
+            description=f"Logs will now be sent in {channel.mention}."
+            if channel
+            else "Logs will not be sent anymore.",
+            color=GREEN_COLOR,
+        )
+        await context.send(embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(Settings(bot))
@@ -1,7 +1,13 @@
+-- A NULL server is a global entry, and a NULL expiry never expires.
 CREATE TABLE IF NOT EXISTS `blacklist` (
   `user_id` varchar(20) NOT NULL,
-  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `server_id` varchar(20) DEFAULT NULL,
+  `expires_at` int(11) DEFAULT NULL
 );
+CREATE INDEX IF NOT EXISTS `blacklist_user` ON `blacklist` (`user_id`, `server_id`);
+CREATE INDEX IF NOT EXISTS `blacklist_expires` ON `blacklist` (`expires_at`)
+  WHERE `expires_at` IS NOT NULL;
 
 CREATE TABLE IF NOT EXISTS `warns` (
   `id` int(11) NOT NULL,
@@ -10,4 +16,182 @@ CREATE TABLE IF NOT EXISTS `warns` (
   `moderator_id` varchar(20) NOT NULL,
   `reason` varchar(255) NOT NULL,
   `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+CREATE TABLE IF NOT EXISTS `guild_settings` (
+  `server_id` varchar(20) NOT NULL PRIMARY KEY,
+  `prefix` varchar(32) DEFAULT NULL,
+  `disabled_commands` text NOT NULL DEFAULT '',
+  `log_channel_id` varchar(20) DEFAULT NULL,
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS `warns_server_user` ON `warns` (`server_id`, `user_id`, `id`);
+CREATE INDEX IF NOT EXISTS `warns_server_created` ON `warns` (`server_id`, `created_at`);
+
+-- Warning counts per user and per server, kept up to date by the triggers below.
+CREATE TABLE IF NOT EXISTS `warn_stats` (
+  `server_id` varchar(20) NOT NULL,
+  `user_id` varchar(20) NOT NULL,
+  `warn_count` int(11) NOT NULL DEFAULT 0,
+  `last_warned_at` timestamp DEFAULT NULL,
+  PRIMARY KEY (`server_id`, `user_id`)
+);
+CREATE INDEX IF NOT EXISTS `warn_stats_top` ON `warn_stats` (`server_id`, `warn_count` DESC, `last_warned_at` DESC);
+
+CREATE TABLE IF NOT EXISTS `warn_guild_stats` (
+  `server_id` varchar(20) NOT NULL PRIMARY KEY,
+  `warn_count` int(11) NOT NULL DEFAULT 0,
+  `warned_users` int(11) NOT NULL DEFAULT 0,
+  `last_warned_at` timestamp DEFAULT NULL
+);
+
+-- Backfill the statistics of the warnings that existed before the tables did.
+INSERT INTO `warn_stats` (`server_id`, `user_id`, `warn_count`, `last_warned_at`)
+  SELECT `server_id`, `user_id`, COUNT(*), MAX(`created_at`) FROM `warns`
+  WHERE NOT EXISTS (SELECT 1 FROM `warn_stats`)
+  GROUP BY `server_id`, `user_id`;
+INSERT INTO `warn_guild_stats` (`server_id`, `warn_count`, `warned_users`, `last_warned_at`)
+  SELECT `server_id`, SUM(`warn_count`), COUNT(*), MAX(`last_warned_at`) FROM `warn_stats`
+  WHERE NOT EXISTS (SELECT 1 FROM `warn_guild_stats`)
+  GROUP BY `server_id`;
+
+CREATE TRIGGER IF NOT EXISTS `warns_stats_insert` AFTER INSERT ON `warns`
+BEGIN
+  INSERT INTO `warn_stats` (`server_id`, `user_id`, `warn_count`, `last_warned_at`)
+    VALUES (NEW.`server_id`, NEW.`user_id`, 1, NEW.`created_at`)
+    ON CONFLICT (`server_id`, `user_id`) DO UPDATE SET
+      `warn_count` = `warn_count` + 1,
+      `last_warned_at` = MAX(COALESCE(`last_warned_at`, ''), excluded.`last_warned_at`);
+  INSERT INTO `warn_guild_stats` (`server_id`, `warn_count`, `warned_users`, `last_warned_at`)
+    VALUES (NEW.`server_id`, 1, 1, NEW.`created_at`)
+    ON CONFLICT (`server_id`) DO UPDATE SET
+      `warn_count` = `warn_count` + 1,
+      `warned_users` = `warned_users` + (
+        SELECT `warn_count` = 1 FROM `warn_stats`
+        WHERE `server_id` = NEW.`server_id` AND `user_id` = NEW.`user_id`
+      ),
+      `last_warned_at` = MAX(COALESCE(`last_warned_at`, ''), excluded.`last_warned_at`);
+END;
+
+CREATE TRIGGER IF NOT EXISTS `warns_stats_delete` AFTER DELETE ON `warns`
+BEGIN
+  UPDATE `warn_stats` SET
+    `warn_count` = `warn_count` - 1,
+    `last_warned_at` = (
+      SELECT MAX(`created_at`) FROM `warns`
+      WHERE `server_id` = OLD.`server_id` AND `user_id` = OLD.`user_id`
+    )
+    WHERE `server_id` = OLD.`server_id` AND `user_id` = OLD.`user_id`;
+  UPDATE `warn_guild_stats` SET
+    `warn_count` = `warn_count` - 1,
+    `warned_users` = `warned_users` - (
+      SELECT `warn_count` = 0 FROM `warn_stats`
+      WHERE `server_id` = OLD.`server_id` AND `user_id` = OLD.`user_id`
+    ),
+    `last_warned_at` = (SELECT MAX(`created_at`) FROM `warns` WHERE `server_id` = OLD.`server_id`)
+    WHERE `server_id` = OLD.`server_id`;
+  DELETE FROM `warn_stats`
+    WHERE `server_id` = OLD.`server_id` AND `user_id` = OLD.`user_id` AND `warn_count` <= 0;
+  DELETE FROM `warn_guild_stats` WHERE `server_id` = OLD.`server_id` AND `warn_count` <= 0;
+END;
+
+CREATE TABLE IF NOT EXISTS `warn_expiry_policies` (
+  `server_id` varchar(20) NOT NULL PRIMARY KEY,
+  `expire_after` int(11) NOT NULL,
+  `action` varchar(10) NOT NULL DEFAULT 'delete',
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Expired warnings of the servers that archive them instead of deleting them.
+CREATE TABLE IF NOT EXISTS `warns_archive` (
+  `id` int(11) NOT NULL,
+  `user_id` varchar(20) NOT NULL,
+  `server_id` varchar(20) NOT NULL,
+  `moderator_id` varchar(20) NOT NULL,
+  `reason` varchar(255) NOT NULL,
+  `created_at` timestamp NOT NULL,
+  `archived_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS `warns_archive_server_user` ON `warns_archive` (`server_id`, `user_id`);
+
+-- Every moderation action, rows can only be added.
+CREATE TABLE IF NOT EXISTS `cases` (
+  `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+  `server_id` varchar(20) NOT NULL,
+  `action` varchar(20) NOT NULL,
+  `actor_id` varchar(20) NOT NULL,
+  `target_id` varchar(20) DEFAULT NULL,
+  `reason` varchar(512) DEFAULT NULL,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS `cases_server` ON `cases` (`server_id`, `id`);
+
+CREATE TRIGGER IF NOT EXISTS `cases_no_update` BEFORE UPDATE ON `cases`
+BEGIN
+  SELECT RAISE(ABORT, 'cases are append-only');
+END;
+
+CREATE TRIGGER IF NOT EXISTS `cases_no_delete` BEFORE DELETE ON `cases`
+BEGIN
+  SELECT RAISE(ABORT, 'cases are append-only');
+END;
+
+-- Full-text indexes over the reasons, the rows themselves stay in their tables.
+-- The server and the user are indexed too so a search only reads the postings of one server.
+CREATE VIRTUAL TABLE IF NOT EXISTS `warns_fts` USING fts5(
+  `reason`, `server_id`, `user_id`, content='warns', content_rowid='rowid'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS `cases_fts` USING fts5(
+  `reason`, `server_id`, `target_id`, content='cases', content_rowid='id'
+);
+
+-- Index the rows that existed before the indexes did.
+INSERT INTO `warns_fts` (`warns_fts`) SELECT 'rebuild'
+  WHERE NOT EXISTS (SELECT 1 FROM `warns_fts_docsize`) AND EXISTS (SELECT 1 FROM `warns`);
+INSERT INTO `cases_fts` (`cases_fts`) SELECT 'rebuild'
+  WHERE NOT EXISTS (SELECT 1 FROM `cases_fts_docsize`) AND EXISTS (SELECT 1 FROM `cases`);
+
+CREATE TRIGGER IF NOT EXISTS `warns_fts_insert` AFTER INSERT ON `warns`
+BEGIN
+  INSERT INTO `warns_fts` (`rowid`, `reason`, `server_id`, `user_id`)
+    VALUES (NEW.`rowid`, NEW.`reason`, NEW.`server_id`, NEW.`user_id`);
+END;
+
+CREATE TRIGGER IF NOT EXISTS `warns_fts_delete` AFTER DELETE ON `warns`
+BEGIN
+  INSERT INTO `warns_fts` (`warns_fts`, `rowid`, `reason`, `server_id`, `user_id`)
+    VALUES ('delete', OLD.`rowid`, OLD.`reason`, OLD.`server_id`, OLD.`user_id`);
+END;
+
+CREATE TRIGGER IF NOT EXISTS `warns_fts_update` AFTER UPDATE ON `warns`
+BEGIN
+  INSERT INTO `warns_fts` (`warns_fts`, `rowid`, `reason`, `server_id`, `user_id`)
+    VALUES ('delete', OLD.`rowid`, OLD.`reason`, OLD.`server_id`, OLD.`user_id`);
+  INSERT INTO `warns_fts` (`rowid`, `reason`, `server_id`, `user_id`)
+    VALUES (NEW.`rowid`, NEW.`reason`, NEW.`server_id`, NEW.`user_id`);
+END;
+
+CREATE TRIGGER IF NOT EXISTS `cases_fts_insert` AFTER INSERT ON `cases`
+BEGIN
+  INSERT INTO `cases_fts` (`rowid`, `reason`, `server_id`, `target_id`)
+    VALUES (NEW.`id`, NEW.`reason`, NEW.`server_id`, NEW.`target_id`);
+END;
+
+-- Cases are only deleted when a server moves to another partition.
+CREATE TRIGGER IF NOT EXISTS `cases_fts_delete` AFTER DELETE ON `cases`
+BEGIN
+  INSERT INTO `cases_fts` (`cases_fts`, `rowid`, `reason`, `server_id`, `target_id`)
+    VALUES ('delete', OLD.`id`, OLD.`reason`, OLD.`server_id`, OLD.`target_id`);
+END;
+
+-- Timed moderation actions, like lifting a temporary ban. A row is deleted once its action ran.
+CREATE TABLE IF NOT EXISTS `scheduled_actions` (
+  `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+  `server_id` varchar(20) NOT NULL,
+  `action` varchar(20) NOT NULL,
+  `target_id` varchar(20) NOT NULL,
+  `due_at` int(11) NOT NULL,
+  `payload` text NOT NULL DEFAULT '{}',
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS `scheduled_actions_server` ON `scheduled_actions` (`server_id`, `due_at`);
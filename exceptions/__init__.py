@@ -19,3 +19,33 @@ class UserNotOwner(commands.CheckFailure):
     def __init__(self, message="User is not an owner of the bot!"):
         self.message = message
         super().__init__(self.message)
+
+
+class TooManyViews(commands.CommandError):
+    """
+    Thrown when a user is attempting to open an interactive view, but too many are already open.
+    """
+
+    def __init__(self, message="Too many interactive views are open!"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class CommandShed(commands.CommandError):
+    """
+    Thrown when a command is not run because the bot is too busy to run it in time.
+    """
+
+    def __init__(self, message="The bot is too busy to run this command right now!"):
+        self.message = message
+        super().__init__(self.message)
+
+
+class ShuttingDown(commands.CheckFailure):
+    """
+    Thrown when a command is used while the bot is shutting down.
+    """
+
+    def __init__(self, message="The bot is shutting down!"):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,123 @@
+import asyncio
+from collections import deque
+from typing import Optional
+
+from discord.ext.commands import Context
+
+from exceptions import CommandShed
+from helpers import metrics
+
+
+class CommandClass:
+    """
+    Caps how many commands of a class run at once. Commands over the cap wait in a
+    bounded queue, and are shed when the queue is full or their deadline passes.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue: int, deadline: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.deadline = deadline
+        self.running = 0
+        self.waiters = deque()
+        metrics.register_gauge(f"admission.{name}.running", lambda: self.running)
+        metrics.register_gauge(f"admission.{name}.queued", lambda: len(self.waiters))
+
+    async def acquire(self) -> None:
+        if self.running < self.concurrency and not self.waiters:
+            self.running += 1
+            return
+
+        if len(self.waiters) >= self.queue:
+            metrics.increment(f"admission.{self.name}.shed")
+            raise CommandShed
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        metrics.increment(f"admission.{self.name}.queued_total")
+        try:
+            # The slot is handed over by release(), running is not decremented in between.
+            await asyncio.wait_for(waiter, self.deadline)
+
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over right as the deadline passed.
+                return
+            metrics.increment(f"admission.{self.name}.shed")
+            raise CommandShed
+
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Pass on the slot we were handed, nobody will release it otherwise.
+                self.release()
+            raise
+
+        finally:
+            try:
+                self.waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self) -> None:
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+
+class AdmissionController:
+    """
+    Sits in front of command dispatch and admits commands per class:
+    database-bound, upstream-bound and REST-heavy moderation commands.
+    """
+
+    def __init__(self, classes: dict, commands: dict):
+        self.classes = {name: CommandClass(name, **options) for name, options in classes.items()}
+        self.commands = commands
+
+    def classify(self, context: Context) -> Optional[CommandClass]:
+        """
+        Finds the class of a command, by its qualified name first and then by its root parent.
+
+        :param context: The context of the command.
+        :return: The class of the command, or None if it is not admission controlled.
+        """
+
+        command = context.command
+        name = self.commands.get(command.qualified_name)
+        if name is None and command.root_parent is not None:
+            name = self.commands.get(command.root_parent.name)
+        return self.classes.get(name)
+
+    async def acquire(self, context: Context) -> None:
+        """
+        Waits until the command can run, this is a no-op if it was already admitted.
+
+        :param context: The context of the command.
+        """
+
+        if getattr(context, "admission", None) is not None:
+            return
+
+        command_class = self.classify(context)
+        if command_class is None:
+            return
+
+        await command_class.acquire()
+        context.admission = command_class
+        metrics.increment(f"admission.{command_class.name}.admitted")
+
+    def release(self, context: Context) -> None:
+        """
+        Releases the slot of a command, this is a no-op if it was never admitted or already released.
+
+        :param context: The context of the command.
+        """
+
+        command_class = getattr(context, "admission", None)
+        if command_class is not None:
+            context.admission = None
+            command_class.release()
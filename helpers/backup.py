@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from typing import Optional
+
+import aiosqlite
+
+from helpers import metrics
+
+
+async def check_integrity(path: str, quick: bool = False) -> bool:
+    """
+    This function will check that a database file is a valid and consistent SQLite database.
+
+    :param path: The path of the database file.
+    :param quick: True to skip the slower checks of the indexes.
+    :return: True if the database passed the check.
+    """
+
+    try:
+        async with aiosqlite.connect(path) as database:
+            rows = await database.execute("PRAGMA quick_check" if quick else "PRAGMA integrity_check")
+            async with rows as cursor:
+                result = await cursor.fetchall()
+    except sqlite3.DatabaseError:
+        return False
+    return result == [("ok",)]
+
+
+class BackupManager:
+    """
+    Takes consistent copies of the database while the bot runs, with SQLite's online
+    backup API. The copy is made a few pages at a time on the database thread, and
+    the locks are released between steps so queries are only delayed by one step.
+    """
+
+    def __init__(
+        self,
+        database_path: str,
+        directory: str,
+        keep: int = 7,
+        pages: int = 256,
+        sleep: float = 0.05,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.database_path = database_path
+        self.directory = directory
+        self.keep = keep
+        self.pages = pages
+        self.sleep = sleep
+        self.logger = logger or logging.getLogger("discord_bot")
+        self._lock = asyncio.Lock()
+
+    def backups(self) -> list:
+        """
+        Lists the backups, the most recent first.
+
+        :return: The paths of the backup files.
+        """
+
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(
+            (name for name in os.listdir(self.directory) if name.endswith(".database")),
+            reverse=True,
+        )
+        return [os.path.join(self.directory, name) for name in names]
+
+    async def backup(self) -> tuple:
+        """
+        Copies the database to a new backup file, checks the copy and prunes the oldest backups.
+
+        :return: The path and the size of the backup, and how long it took in seconds.
+        """
+
+        async with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(
+                self.directory, time.strftime("database-%Y%m%d-%H%M%S.database", time.gmtime())
+            )
+            partial = f"{path}.partial"
+            started_at = time.monotonic()
+            try:
+                async with aiosqlite.connect(self.database_path) as source, \
+                        aiosqlite.connect(partial) as target:
+                    await source.backup(target, pages=self.pages, sleep=self.sleep)
+                if not await check_integrity(partial):
+                    raise sqlite3.DatabaseError("The backup failed its integrity check.")
+                os.replace(partial, path)
+            finally:
+                if os.path.exists(partial):
+                    os.remove(partial)
+
+            elapsed = time.monotonic() - started_at
+            size = os.path.getsize(path)
+            metrics.increment("backups.created")
+            self.logger.info("Backed up the database to %s (%s bytes) in %.1fs", path, size, elapsed)
+            self.prune()
+            return path, size, elapsed
+
+    def prune(self) -> None:
+        for path in self.backups()[self.keep:]:
+            os.remove(path)
+
+    async def restore_if_corrupt(self) -> Optional[str]:
+        """
+        Checks the database, and replaces it with the most recent valid backup if it is corrupt.
+        The corrupt database is kept next to it. This must run before the database is used.
+
+        :return: The path of the restored backup, or None if nothing was restored.
+        """
+
+        if not os.path.exists(self.database_path) or await check_integrity(
+            self.database_path, quick=True
+        ):
+            return None
+
+        self.logger.error("The database at %s is corrupt", self.database_path)
+        for backup in self.backups():
+            if not await check_integrity(backup):
+                self.logger.warning("Skipping the backup %s, it is corrupt too", backup)
+                continue
+
+            suffix = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+            # The rollback journal of the corrupt database must not be applied to the backup.
+            for extension in ("", "-journal", "-wal", "-shm"):
+                if os.path.exists(self.database_path + extension):
+                    os.replace(
+                        self.database_path + extension,
+                        f"{self.database_path}.corrupt-{suffix}{extension}",
+                    )
+            shutil.copyfile(backup, self.database_path)
+            self.logger.warning("Restored the database from %s", backup)
+            return backup
+
+        self.logger.error("No valid backup to restore the database from")
+        return None
+
+
+class BackupSet:
+    """
+    Backs up the main database and the partitions of the partitioned storage engine
+    together, each database keeps its own backups in its own directory.
+    """
+
+    def __init__(self, managers: list):
+        self.managers = managers
+
+    def backups(self) -> list:
+        return self.managers[0].backups()
+
+    async def backup(self) -> tuple:
+        """
+        Backs up every database, one after the other.
+
+        :return: The path of the backup of the main database, the size of all the backups,
+        and how long they took in seconds.
+        """
+
+        results = [await manager.backup() for manager in self.managers]
+        return (
+            results[0][0],
+            sum(size for _, size, _ in results),
+            sum(elapsed for _, _, elapsed in results),
+        )
+
+    async def restore_if_corrupt(self) -> Optional[str]:
+        restored = [await manager.restore_if_corrupt() for manager in self.managers]
+        return next((backup for backup in restored if backup is not None), None)
@@ -0,0 +1,208 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Callable, Optional
+
+from helpers import db_manager, metrics
+
+
+class Blacklist:
+    """
+    Keeps the blacklist in memory so checking a user costs two set lookups. Entries are
+    either global or scoped to a server, and can expire. Expirations are kept in a heap,
+    a single timer removes the entries when the earliest one expires.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger("discord_bot")
+        self._global = set()
+        # (user ID, server ID)
+        self._scoped = set()
+        # (user ID, server ID or None) -> expires at, for the entries that expire.
+        self._expiries = {}
+        # [(expires at, sequence, user ID, server ID or None)], the sequence breaks the ties
+        # so a global and a server entry expiring together are never compared by server ID.
+        # Entries that were removed or re-added with another expiry stay in the heap and are
+        # skipped when they come up.
+        self._heap = []
+        self._sequence = itertools.count()
+        self._timer = None
+        self._started = False
+        self._cleanup = None
+        # Called with every change made here, so the other clusters can apply it too.
+        self.publish: Optional[Callable[[dict], None]] = None
+        metrics.register_gauge("blacklist.entries", self.__len__)
+
+    def __len__(self) -> int:
+        return len(self._global) + len(self._scoped)
+
+    def is_blacklisted(self, user_id: int, server_id: Optional[int] = None) -> bool:
+        """
+        Checks if a user is blacklisted, globally or in a server.
+
+        :param user_id: The ID of the user.
+        :param server_id: The ID of the server the user is in, None outside of servers.
+        :return: True if the user must be ignored.
+        """
+
+        return user_id in self._global or (user_id, server_id) in self._scoped
+
+    def has_entry(self, user_id: int, server_id: Optional[int] = None) -> bool:
+        """
+        Checks if a user has an entry of exactly this scope.
+
+        :param user_id: The ID of the user.
+        :param server_id: The ID of the server of the entry, None for a global entry.
+        """
+
+        if server_id is None:
+            return user_id in self._global
+        return (user_id, server_id) in self._scoped
+
+    def expires_at(self, user_id: int, server_id: Optional[int] = None) -> Optional[int]:
+        """
+        Gets when the entry of exactly this scope expires.
+
+        :param user_id: The ID of the user.
+        :param server_id: The ID of the server of the entry, None for a global entry.
+        :return: The UNIX timestamp of the expiry, None if the entry never expires or there is none.
+        """
+
+        return self._expiries.get((user_id, server_id))
+
+    async def load(self) -> None:
+        """
+        Reads the blacklist from the database, the entries that expired meanwhile are deleted.
+        """
+
+        await db_manager.expire_blacklist(int(time.time()))
+        for user_id, _, server_id, expires_at in await db_manager.get_blacklisted_users():
+            self._set(
+                int(user_id),
+                int(server_id) if server_id is not None else None,
+                int(expires_at) if expires_at is not None else None,
+            )
+
+    def start(self) -> None:
+        """
+        Starts removing the entries when they expire, this must run on the loop of the bot.
+        """
+
+        self._started = True
+        self._schedule()
+
+    def stop(self) -> None:
+        self._started = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def add(
+        self, user_id: int, server_id: Optional[int] = None, duration: Optional[int] = None
+    ) -> int:
+        """
+        Blacklists a user, replacing the entry of the same scope if there is one.
+
+        :param user_id: The ID of the user.
+        :param server_id: The ID of the server to blacklist the user in, None for everywhere.
+        :param duration: After how many seconds the entry expires, None to never expire it.
+        :return: The number of entries in the blacklist.
+        """
+
+        expires_at = int(time.time()) + duration if duration is not None else None
+        total = await db_manager.add_user_to_blacklist(user_id, server_id, expires_at)
+        self._set(user_id, server_id, expires_at)
+        self._schedule()
+        self._publish({"user_id": user_id, "server_id": server_id, "expires_at": expires_at})
+        return total
+
+    async def remove(self, user_id: int, server_id: Optional[int] = None) -> int:
+        """
+        Removes the entry of a user.
+
+        :param user_id: The ID of the user.
+        :param server_id: The ID of the server of the entry, None for the global entry.
+        :return: The number of entries in the blacklist.
+        """
+
+        total = await db_manager.remove_user_from_blacklist(user_id, server_id)
+        self._discard(user_id, server_id)
+        self._publish({"user_id": user_id, "server_id": server_id, "removed": True})
+        return total
+
+    def apply(self, change: dict) -> None:
+        """
+        Applies a change another cluster made, it is already in the database.
+
+        :param change: The change, as published by the cluster that made it.
+        """
+
+        if change.get("removed"):
+            self._discard(change["user_id"], change["server_id"])
+        else:
+            self._set(change["user_id"], change["server_id"], change["expires_at"])
+            self._schedule()
+
+    def _publish(self, change: dict) -> None:
+        if self.publish is None:
+            return
+        try:
+            self.publish(change)
+        except Exception:
+            # The other clusters pick the change up from the database when they restart.
+            self.logger.exception("Could not publish a blacklist change")
+
+    def _set(self, user_id: int, server_id: Optional[int], expires_at: Optional[int]) -> None:
+        if server_id is None:
+            self._global.add(user_id)
+        else:
+            self._scoped.add((user_id, server_id))
+        if expires_at is None:
+            self._expiries.pop((user_id, server_id), None)
+        else:
+            self._expiries[(user_id, server_id)] = expires_at
+            heapq.heappush(self._heap, (expires_at, next(self._sequence), user_id, server_id))
+
+    def _discard(self, user_id: int, server_id: Optional[int]) -> None:
+        if server_id is None:
+            self._global.discard(user_id)
+        else:
+            self._scoped.discard((user_id, server_id))
+        self._expiries.pop((user_id, server_id), None)
+
+    def _schedule(self) -> None:
+        if not self._started:
+            return
+        while self._heap and self._expiries.get(self._heap[0][2:]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._heap:
+            return
+        loop = asyncio.get_running_loop()
+        delay = max(0.0, self._heap[0][0] - time.time())
+        self._timer = loop.call_at(loop.time() + delay, self._expire)
+
+    def _expire(self) -> None:
+        self._timer = None
+        now = time.time()
+        expired = 0
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, _, user_id, server_id = heapq.heappop(self._heap)
+            if self._expiries.get((user_id, server_id)) == expires_at:
+                self._discard(user_id, server_id)
+                expired += 1
+        if expired:
+            metrics.increment("blacklist.expired", expired)
+            self._cleanup = asyncio.create_task(self._delete_expired(int(now)))
+        self._schedule()
+
+    async def _delete_expired(self, now: int) -> None:
+        try:
+            await db_manager.expire_blacklist(now)
+        except Exception:
+            # The rows are deleted on the next expiry or startup, they are ignored meanwhile.
+            self.logger.exception("Could not delete the expired blacklist entries")
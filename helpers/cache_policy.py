@@ -0,0 +1,87 @@
+import discord
+
+# Built-in cache profiles, every key can be overridden in the "cache" section of the config.
+PROFILES = {
+    # Keeps every member and chunks every guild, needs the privileged members intent.
+    "full": {
+        "member_cache": "all",
+        "chunk_guilds_at_startup": True,
+        "max_messages": 1000,
+    },
+    # What discord.py does out of the box.
+    "default": {
+        "member_cache": "default",
+        "chunk_guilds_at_startup": True,
+        "max_messages": 1000,
+    },
+    # Only caches the bot's own member and never chunks, members are fetched on demand.
+    "lean": {
+        "member_cache": "none",
+        "chunk_guilds_at_startup": False,
+        "max_messages": None,
+    },
+}
+
+
+def resolve_policy(config: dict) -> dict:
+    """
+    This function will resolve the cache policy from the configuration.
+
+    :param config: The "cache" section of the configuration.
+    :return: The cache policy, the selected profile with the overrides applied.
+    """
+
+    profile = config.get("profile", "default")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown cache profile '{profile}'.")
+
+    policy = dict(PROFILES[profile])
+    for key in policy:
+        if key in config:
+            policy[key] = config[key]
+    policy["profile"] = profile
+    return policy
+
+
+def member_cache_flags(policy: dict, intents: discord.Intents) -> discord.MemberCacheFlags:
+    """
+    This function will build the member cache flags of a cache policy.
+
+    :param policy: The cache policy.
+    :param intents: The intents of the bot.
+    :return: The member cache flags.
+    """
+
+    member_cache = policy["member_cache"]
+    if member_cache == "default":
+        return discord.MemberCacheFlags.from_intents(intents)
+    if member_cache == "all":
+        return discord.MemberCacheFlags.all()
+    if member_cache == "none":
+        return discord.MemberCacheFlags.none()
+    if member_cache == "voice":
+        return discord.MemberCacheFlags(voice=True, joined=False)
+    if member_cache == "joined":
+        return discord.MemberCacheFlags(voice=False, joined=True)
+    raise ValueError(f"Unknown member cache '{member_cache}'.")
+
+
+def apply_policy(policy: dict, intents: discord.Intents) -> dict:
+    """
+    This function will turn a cache policy into keyword arguments for the bot.
+    The members intent is enabled when the policy needs it.
+
+    :param policy: The cache policy.
+    :param intents: The intents of the bot, modified in place when needed.
+    :return: The keyword arguments that should be passed to the bot.
+    """
+
+    if policy["member_cache"] in ("all", "joined"):
+        # Make sure to enable this intent in Discord Developer Portal too!
+        intents.members = True
+
+    return {
+        "member_cache_flags": member_cache_flags(policy, intents),
+        "chunk_guilds_at_startup": policy["chunk_guilds_at_startup"] and intents.members,
+        "max_messages": policy["max_messages"],
+    }
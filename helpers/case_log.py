@@ -0,0 +1,128 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from helpers import db_manager, metrics
+
+FIELDS = ("id", "action", "actor_id", "target_id", "reason", "created_at")
+
+
+class CaseLog:
+    """
+    Buffers moderation cases and writes them in batches, every few seconds or as soon
+    as a batch is full, so a burst of actions costs a single transaction.
+    """
+
+    def __init__(self, flush_interval: float = 2.0, max_batch: int = 100,
+                 logger: Optional[logging.Logger] = None):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.logger = logger or logging.getLogger("discord_bot")
+        self._pending = []
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._flushes = set()
+        metrics.register_gauge("cases.pending", lambda: len(self._pending))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def record(self, server_id: int, action: str, actor_id: int,
+               target_id: Optional[int] = None, reason: Optional[str] = None) -> None:
+        """
+        Adds a case to the next batch, the time of the case is the time it is recorded at.
+
+        :param server_id: The ID of the server the action was taken in.
+        :param action: The name of the action, for example `ban`.
+        :param actor_id: The ID of the moderator who took the action.
+        :param target_id: The ID of the user the action was taken against, if any.
+        :param reason: The reason of the action, if any.
+        """
+
+        created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self._pending.append((server_id, action, actor_id, target_id, reason, created_at))
+        metrics.increment("cases.recorded")
+        if len(self._pending) >= self.max_batch:
+            flush = asyncio.create_task(self.flush())
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+
+    async def flush(self) -> None:
+        """
+        Writes the pending cases, they are kept for the next flush if the write fails.
+        """
+
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                await db_manager.add_cases(batch)
+            except Exception:
+                self._pending = batch + self._pending
+                self.logger.exception("Could not write %s moderation cases", len(batch))
+                return
+            metrics.increment("cases.flushes")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+def format_cases(chunk: list, export_format: str, header: bool = False) -> str:
+    """
+    This function will format a chunk of cases as JSON lines or CSV.
+
+    :param chunk: The cases, as returned by `db_manager.iter_cases`.
+    :param export_format: `jsonl` or `csv`.
+    :param header: True to start the CSV with the names of the columns.
+    :return: The formatted cases.
+    """
+
+    if export_format == "jsonl":
+        return "".join(json.dumps(dict(zip(FIELDS, row))) + "\n" for row in chunk)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(FIELDS)
+    writer.writerows(chunk)
+    return buffer.getvalue()
+
+
+async def export_cases(server_id: int, export_format: str, file, chunk_size: int = 1000) -> int:
+    """
+    This function will stream the cases of a server into a gzip compressed file, one
+    chunk at a time, so exporting any number of cases uses constant memory.
+
+    :param server_id: The ID of the server.
+    :param export_format: `jsonl` or `csv`.
+    :param file: The binary file to write to, it is rewound at the end.
+    :param chunk_size: The number of cases read and written at once.
+    :return: The number of cases that were exported.
+    """
+
+    count = 0
+    with gzip.GzipFile(fileobj=file, mode="wb") as archive:
+        async for chunk in db_manager.iter_cases(server_id, chunk_size):
+            data = format_cases(chunk, export_format, header=count == 0).encode("utf-8")
+            # Compressing is CPU bound, keep it off the event loop.
+            await asyncio.to_thread(archive.write, data)
+            count += len(chunk)
+        if count == 0 and export_format == "csv":
+            archive.write(format_cases([], export_format, header=True).encode("utf-8"))
+    file.seek(0)
+    return count
@@ -3,7 +3,6 @@ import os
 
 from typing import Callable, TypeVar
 from exceptions import commands, UserNotOwner, UserBlacklisted
-from helpers import db_manager
 
 T = TypeVar("T")
 
@@ -27,11 +26,13 @@ def is_owner() -> Callable[[T], T]:
 
 def not_blacklisted() -> Callable[[T], T]:
     """
-    This is a custom check to see if the user executing the command is blacklisted.
+    This is a custom check to see if the user executing the command is blacklisted,
+    globally or in the server the command is executed in.
     """
 
     async def predicate(context: commands.Context) -> bool:
-        if await db_manager.is_blacklisted(context.author.id):
+        server_id = context.guild.id if context.guild is not None else None
+        if context.bot.blacklist.is_blacklisted(context.author.id, server_id):
             raise UserBlacklisted
         return True
 
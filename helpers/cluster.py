@@ -0,0 +1,271 @@
+import asyncio
+import json
+import os
+import random
+import signal
+import time
+from typing import Awaitable, Callable, Optional
+
+# The launcher passes the cluster layout to every worker through these variables.
+ENV_CLUSTER_ID = "BOT_CLUSTER_ID"
+ENV_SHARD_IDS = "BOT_SHARD_IDS"
+ENV_SHARD_COUNT = "BOT_SHARD_COUNT"
+ENV_HEALTH_ADDRESS = "BOT_HEALTH_ADDRESS"
+
+# How many seconds a worker waits before reconnecting to the launcher, doubled on every failure.
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 60.0
+
+
+def shard_ranges(shard_count: int, clusters: int) -> list:
+    """
+    This function will split the shards into contiguous ranges, one for each cluster.
+
+    :param shard_count: The total number of shards.
+    :param clusters: The number of clusters the shards should be spread over.
+    :return: A list containing the shard IDs owned by each cluster.
+    """
+
+    if clusters < 1 or shard_count < clusters:
+        raise ValueError("Every cluster needs to own at least one shard.")
+
+    size, extra = divmod(shard_count, clusters)
+    ranges = []
+    start = 0
+    for cluster_id in range(clusters):
+        end = start + size + (1 if cluster_id < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def cluster_environment(cluster_id: int, shard_ids: list, shard_count: int, health_address: str) -> dict:
+    """
+    This function will build the environment variables describing a cluster to its worker.
+
+    :param cluster_id: The ID of the cluster.
+    :param shard_ids: The IDs of the shards owned by the cluster.
+    :param shard_count: The total number of shards.
+    :param health_address: The `host:port` address the worker should report its health to.
+    :return: The environment variables of the worker.
+    """
+
+    return {
+        ENV_CLUSTER_ID: str(cluster_id),
+        ENV_SHARD_IDS: ",".join(str(shard_id) for shard_id in shard_ids),
+        ENV_SHARD_COUNT: str(shard_count),
+        ENV_HEALTH_ADDRESS: health_address,
+    }
+
+
+def cluster_from_environment() -> Optional[dict]:
+    """
+    This function will read the cluster this process is a worker of.
+
+    :return: The cluster layout, or None if the process was not started by the launcher.
+    """
+
+    cluster_id = os.environ.get(ENV_CLUSTER_ID)
+    if cluster_id is None:
+        return None
+
+    return {
+        "cluster_id": int(cluster_id),
+        "shard_ids": [int(shard_id) for shard_id in os.environ[ENV_SHARD_IDS].split(",")],
+        "shard_count": int(os.environ[ENV_SHARD_COUNT]),
+        "health_address": os.environ.get(ENV_HEALTH_ADDRESS),
+    }
+
+
+class HealthReporter:
+    """
+    Periodically reports the health of a cluster worker to the launcher
+    and listens on the same connection for shutdown requests. Messages can be
+    broadcast to the other workers through the same connection, the launcher relays them.
+    """
+
+    def __init__(
+        self,
+        cluster: dict,
+        collect: Callable[[], dict],
+        on_shutdown: Callable[[], Awaitable[None]],
+        interval: float = 15.0,
+        logger=None,
+        on_message: Optional[Callable[[dict], None]] = None,
+    ):
+        """
+        :param on_message: Called with every message another worker broadcast.
+        """
+
+        self.cluster = cluster
+        self.collect = collect
+        self.on_shutdown = on_shutdown
+        self.interval = interval
+        self.logger = logger
+        self.on_message = on_message
+        self._task = None
+        self._writer = None
+        self._shutting_down = False
+
+    def start(self) -> None:
+        """
+        Starts reporting, this is a no-op if the reporter is already running.
+        """
+
+        if self._task is not None:
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, self._request_shutdown)
+        except NotImplementedError:
+            # Signal handlers are not available on Windows event loops.
+            pass
+
+        if self.cluster.get("health_address"):
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def broadcast(self, message: dict) -> bool:
+        """
+        Sends a message to the other workers.
+
+        :param message: The message, it must be serializable to JSON.
+        :return: False if the launcher is not connected and the message was dropped.
+        """
+
+        if self._writer is None or self._writer.is_closing():
+            return False
+        payload = {
+            "type": "broadcast",
+            "cluster_id": self.cluster["cluster_id"],
+            "message": message,
+        }
+        self._writer.write(json.dumps(payload).encode("utf-8") + b"\n")
+        return True
+
+    def _request_shutdown(self) -> None:
+        if self._shutting_down:
+            return
+        self._shutting_down = True
+        asyncio.create_task(self.on_shutdown())
+
+    async def _run(self) -> None:
+        host, port = self.cluster["health_address"].rsplit(":", 1)
+        delay = RECONNECT_DELAY
+        try:
+            # The launcher may restart or drop the connection, the worker keeps reconnecting.
+            while not self._shutting_down:
+                try:
+                    reader, writer = await asyncio.open_connection(host, int(port))
+                except OSError as error:
+                    if self.logger:
+                        self.logger.warning(
+                            "Could not reach the cluster launcher, retrying in %.0f seconds: %s",
+                            delay,
+                            error,
+                        )
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                    continue
+
+                delay = RECONNECT_DELAY
+                await self._report(reader, writer)
+
+        finally:
+            # Reporting can be started again once it stopped.
+            if self._task is asyncio.current_task():
+                self._task = None
+
+    async def _report(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writer = writer
+        listener = asyncio.create_task(self._listen(reader))
+        try:
+            while not listener.done():
+                payload = {
+                    "type": "health",
+                    "cluster_id": self.cluster["cluster_id"],
+                    "pid": os.getpid(),
+                    "time": time.time(),
+                }
+                payload.update(self.collect())
+                writer.write(json.dumps(payload).encode("utf-8") + b"\n")
+                await writer.drain()
+                await asyncio.sleep(self.interval)
+
+        except ConnectionError:
+            if self.logger:
+                self.logger.warning("Lost the connection to the cluster launcher.")
+
+        finally:
+            self._writer = None
+            listener.cancel()
+            writer.close()
+
+    async def _listen(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                message = json.loads(line)
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                if self.logger:
+                    self.logger.warning("Skipped a malformed message from the cluster launcher.")
+                continue
+            if message.get("type") == "shutdown":
+                self._request_shutdown()
+                return
+            if message.get("type") == "broadcast" and self.on_message is not None:
+                try:
+                    self.on_message(message["message"])
+                except Exception:
+                    if self.logger:
+                        self.logger.exception("Could not handle a message from another cluster")
+
+
+async def run_fake_worker(cluster: dict) -> None:
+    """
+    Runs a worker that pretends to connect its shards to the gateway, so the
+    launcher can be exercised locally without a token or network access.
+
+    :param cluster: The cluster layout of this worker.
+    """
+
+    stopped = asyncio.Event()
+    shards = {}
+
+    async def connect(shard_id: int) -> None:
+        # Mimic the identify ratelimit of the real gateway.
+        await asyncio.sleep(random.uniform(0.1, 1.0))
+        shards[shard_id] = random.randint(50, 500)
+
+    def collect() -> dict:
+        return {
+            "ready": len(shards) == len(cluster["shard_ids"]),
+            "guilds": sum(shards.values()),
+            "shards": {
+                str(shard_id): round(random.uniform(0.03, 0.12), 4) for shard_id in shards
+            },
+        }
+
+    async def on_shutdown() -> None:
+        # Give in-flight work a moment, like the real bot draining its commands.
+        await asyncio.sleep(random.uniform(0.1, 0.5))
+        stopped.set()
+
+    reporter = HealthReporter(cluster, collect, on_shutdown, interval=1.0)
+    reporter.start()
+    await asyncio.gather(*(connect(shard_id) for shard_id in cluster["shard_ids"]))
+    await stopped.wait()
+    reporter.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_fake_worker(cluster_from_environment()))
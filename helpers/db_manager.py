@@ -1,71 +1,99 @@
 import os
-import aiosqlite
+
+from helpers.storage import StorageBackend
+from helpers.storage.sqlite import SQLiteBackend
 
 DATABASE_PATH = f"{os.path.realpath(os.path.dirname(__file__))}/../database/database.database"
 
+# Every function delegates to the storage engine, which is SQLite unless configured otherwise.
+_backend = SQLiteBackend(DATABASE_PATH)
+
+
+def use_backend(backend: StorageBackend) -> None:
+    """
+    This function will replace the storage engine every function delegates to.
+
+    :param backend: The new storage engine.
+    """
+
+    global _backend
+    _backend = backend
+
+
+def get_backend() -> StorageBackend:
+    """
+    This function will return the storage engine every function delegates to.
+
+    :return: The storage engine.
+    """
+
+    return _backend
+
+
+async def initialize() -> None:
+    """
+    This function will prepare the storage engine, it must be called once on startup.
+    """
+
+    await _backend.initialize()
+
 
 async def get_blacklisted_users() -> list:
     """
     This function will return the list of all blacklisted users.
 
-    :param user_id: The ID of the user that should be checked.
-    :return: True if the user is blacklisted, False if not.
+    :return: The entries of the blacklist: user ID, creation time, server ID or None for
+    a global entry, and expiry time or None if the entry never expires.
     """
 
-    async with aiosqlite.connect(DATABASE_PATH) as database:
-        async with database.execute(
-            "SELECT user_id, strftime('%s', created_at) FROM blacklist"
-        ) as cursor:
-            result = await cursor.fetchall()
-            return result
+    return await _backend.get_blacklisted_users()
 
 
-async def is_blacklisted(user_id: int) -> bool:
+async def is_blacklisted(user_id: int, server_id: int = None) -> bool:
     """
     This function will check if a user is blacklisted.
 
     :param user_id: The ID of the user that should be checked.
+    :param server_id: The ID of the server to also check the entries of, None for only global ones.
     :return: True if the user is blacklisted, False if not.
     """
 
-    async with aiosqlite.connect(DATABASE_PATH) as database:
-        async with database.execute(
-            "SELECT * FROM blacklist WHERE user_id=?", (user_id,)
-        ) as cursor:
-            result = await cursor.fetchone()
-            return result is not None
+    return await _backend.is_blacklisted(user_id, server_id)
 
 
-async def add_user_to_blacklist(user_id: int) -> int:
+async def add_user_to_blacklist(user_id: int, server_id: int = None, expires_at: int = None) -> int:
     """
     This function will add a user based on its ID in the blacklist.
+    The entry replaces the one the user already has in the same scope.
 
     :param user_id: The ID of the user that should be added into the blacklist.
+    :param server_id: The ID of the server the user is blacklisted in, None for every server.
+    :param expires_at: The UNIX timestamp the entry expires at, None to never expire it.
     """
 
-    async with aiosqlite.connect(DATABASE_PATH) as database:
-        await database.execute("INSERT INTO blacklist(user_id) VALUES (?)", (user_id,))
-        await database.commit()
-        rows = await database.execute("SELECT COUNT(*) FROM blacklist")
-        async with rows as cursor:
-            result = await cursor.fetchone()
-            return result[0] if result is not None else 0
+    return await _backend.add_user_to_blacklist(user_id, server_id, expires_at)
 
 
-async def remove_user_from_blacklist(user_id: int) -> int:
+async def remove_user_from_blacklist(user_id: int, server_id: int = None) -> int:
     """
     This function will remove a user based on its ID from the blacklist.
 
     :param user_id: The ID of the user that should be removed from the blacklist.
+    :param server_id: The ID of the server of the entry, None for the global entry.
     """
 
-    async with aiosqlite.connect(DATABASE_PATH) as database:
-        await database.execute("DELETE FROM blacklist WHERE user_id=?", (user_id,))
-        await database.commit()
-        rows = await database.execute("SELECT COUNT(*) FROM blacklist")
-        async with rows as cursor:
-            result = await cursor.fetchone()
-            return result[0] if result is not None else 0
+    return await _backend.remove_user_from_blacklist(user_id, server_id)
+
+
+async def expire_blacklist(now: int) -> int:
+    """
+    This function will delete the blacklist entries that expired.
+
+    :param now: The current UNIX timestamp.
+    :return: The number of entries that were deleted.
+    """
+
+    return await _backend.expire_blacklist(now)
 
 
 async def add_warn(user_id: int, server_id: int, moderator_id: int, reason: str) -> int:
@@ -76,30 +104,7 @@ async def add_warn(user_id: int, server_id: int, moderator_id: int, reason: str)
     :param reason: The reason why the user should be warned.
     """
 
-    async with aiosqlite.connect(DATABASE_PATH) as database:
-        rows = await database.execute(
-            "SELECT id FROM warns WHERE user_id=? AND server_id=? ORDER BY id DESC LIMIT 1",
-            (
-                user_id,
-                server_id,
-            ),
-        )
-        async with rows as cursor:
-            result = await cursor.fetchone()
-            warn_id = result[0] + 1 if result is not None else 1
-            await database.execute(
-                "INSERT INTO warns(id, user_id, server_id, moderator_id, reason) \
-                VALUES (?, ?, ?, ?, ?)",
-                (
-                    warn_id,
-                    user_id,
-                    server_id,
-                    moderator_id,
-                    reason,
-                ),
-            )
-            await database.commit()
-            return warn_id
+    return await _backend.add_warn(user_id, server_id, moderator_id, reason)
 
 
 async def remove_warn(warn_id: int, user_id: int, server_id: int) -> int:
@@ -111,26 +116,7 @@ async def remove_warn(warn_id: int, user_id: int, server_id: int) -> int:
     :param server_id: The ID of the server where the user has been warned
     """
 
-    async with aiosqlite.connect(DATABASE_PATH) as database:
-        await database.execute(
-            "DELETE FROM warns WHERE id=? AND user_id=? AND server_id=?",
-            (
-                warn_id,
-                user_id,
-                server_id,
-            ),
-        )
-        await database.commit()
-        rows = await database.execute(
-            "SELECT COUNT(*) FROM warns WHERE user_id=? AND server_id=?",
-            (
-                user_id,
-                server_id,
-            ),
-        )
-        async with rows as cursor:
-            result = await cursor.fetchone()
-            return result[0] if result is not None else 0
+    return await _backend.remove_warn(warn_id, user_id, server_id)
 
 
 async def get_warnings(user_id: int, server_id: int) -> list:
@@ -142,18 +128,242 @@ async def get_warnings(user_id: int, server_id: int) -> list:
     :return: A list of all the warnings of the user.
     """
 
-    async with aiosqlite.connect(DATABASE_PATH) as database:
-        rows = await database.execute(
-            "SELECT user_id, server_id, moderator_id, reason, strftime('%s', created_at), \
-                id FROM warns WHERE user_id=? AND server_id=?",
-            (
-                user_id,
-                server_id,
-            ),
-        )
-        async with rows as cursor:
-            result = await cursor.fetchall()
-            result_list = []
-            for row in result:
-                result_list.append(row)
-            return result_list
+    return await _backend.get_warnings(user_id, server_id)
+
+
+async def get_warn_leaderboard(server_id: int, limit: int = 10) -> list:
+    """
+    This function will get the most warned users of a server.
+
+    :param server_id: The ID of the server.
+    :param limit: The number of users to return.
+    :return: The user ID, the number of warnings and the time of the last warning
+    of the most warned users.
+    """
+
+    return await _backend.get_warn_leaderboard(server_id, limit)
+
+
+async def get_warn_stats(server_id: int, user_id: int = None):
+    """
+    This function will get the warning statistics of a server, or of a user in a server.
+
+    :param server_id: The ID of the server.
+    :param user_id: The ID of the user, or None for the statistics of the whole server.
+    :return: The number of warnings, the number of warned users (always 1 for a user)
+    and the time of the last warning, or None if there are no warnings.
+    """
+
+    return await _backend.get_warn_stats(server_id, user_id)
+
+
+async def get_guild_settings(server_id: int):
+    """
+    This function will get the settings of a server.
+
+    :param server_id: The ID of the server.
+    :return: The prefix, the space separated disabled commands and the log channel ID
+    of the server, or None if the server has no settings.
+    """
+
+    return await _backend.get_guild_settings(server_id)
+
+
+async def get_guilds_settings(server_ids: list) -> list:
+    """
+    This function will get the settings of many servers at once.
+
+    :param server_ids: The IDs of the servers.
+    :return: The server ID, prefix, space separated disabled commands and log channel ID
+    of the servers that have settings.
+    """
+
+    return await _backend.get_guilds_settings(server_ids)
+
+
+async def update_guild_settings(
+    server_id: int, prefix, disabled_commands: str, log_channel_id
+) -> None:
+    """
+    This function will create or replace the settings of a server.
+
+    :param server_id: The ID of the server.
+    :param prefix: The prefix of the server, or None to use the default prefix.
+    :param disabled_commands: The space separated names of the disabled commands.
+    :param log_channel_id: The ID of the log channel, or None if there is none.
+    """
+
+    return await _backend.update_guild_settings(server_id, prefix, disabled_commands, log_channel_id)
+
+
+async def get_warn_expiry_policies() -> list:
+    """
+    This function will get the warning expiry policies of every server.
+
+    :return: The server ID, the number of seconds after which warnings expire and
+    the action taken on expired warnings (`delete` or `archive`) of every policy.
+    """
+
+    return await _backend.get_warn_expiry_policies()
+
+
+async def get_warn_expiry_policy(server_id: int):
+    """
+    This function will get the warning expiry policy of a server.
+
+    :param server_id: The ID of the server.
+    :return: The number of seconds after which warnings expire and the action taken
+    on expired warnings, or None if warnings never expire in the server.
+    """
+
+    return await _backend.get_warn_expiry_policy(server_id)
+
+
+async def set_warn_expiry_policy(server_id: int, expire_after, action: str = "delete") -> None:
+    """
+    This function will set or remove the warning expiry policy of a server.
+
+    :param server_id: The ID of the server.
+    :param expire_after: The number of seconds after which warnings expire, or None to never expire them.
+    :param action: What happens to expired warnings, `delete` or `archive`.
+    """
+
+    return await _backend.set_warn_expiry_policy(server_id, expire_after, action)
+
+
+async def expire_warns(server_id: int, expire_after: int, archive: bool, limit: int) -> int:
+    """
+    This function will delete, or archive, a batch of the expired warnings of a server.
+    Batches are small so the write lock is only held briefly.
+
+    :param server_id: The ID of the server.
+    :param expire_after: The number of seconds after which warnings expire.
+    :param archive: True to copy the expired warnings to the archive before deleting them.
+    :param limit: The maximum number of warnings to expire.
+    :return: The number of warnings that expired.
+    """
+
+    return await _backend.expire_warns(server_id, expire_after, archive, limit)
+
+
+async def compact(pages: int) -> int:
+    """
+    This function will return up to the given number of free pages to the file system.
+
+    :param pages: The maximum number of pages to free.
+    :return: The number of free pages left, always 0 for engines without pages.
+    """
+
+    return await _backend.compact(pages)
+
+
+async def add_cases(cases: list) -> None:
+    """
+    This function will add moderation cases to the database in a single transaction.
+
+    :param cases: The server ID, action, actor ID, target ID, reason and creation time of every case.
+    """
+
+    return await _backend.add_cases(cases)
+
+
+def iter_cases(server_id: int, chunk_size: int = 1000):
+    """
+    This function will iterate over the moderation cases of a server, oldest first.
+    Cases are read in chunks using the last case ID as the cursor, so memory does not
+    grow with the number of cases and no read lock is held between chunks.
+
+    :param server_id: The ID of the server.
+    :param chunk_size: The number of cases read per query.
+    :return: An asynchronous iterator of lists of cases: ID, action, actor ID, target ID,
+    reason and creation time.
+    """
+
+    return _backend.iter_cases(server_id, chunk_size)
+
+
+async def search_warns(
+    server_id: int, query: str, user_id: int = None, limit: int = 10, offset: int = 0
+) -> tuple:
+    """
+    This function will search the reasons of the warnings of a server with the full-text index,
+    the best matches first. Every word of the query must match, `word*` matches a prefix.
+
+    :param server_id: The ID of the server.
+    :param query: The words to search for.
+    :param user_id: The ID of the user to search the warnings of, or None for every user.
+    :param limit: The number of warnings to return.
+    :param offset: The number of best matches to skip, to read the next pages.
+    :return: The number of matching warnings, and a page of them: user ID, moderator ID,
+    reason, creation time and ID.
+    """
+
+    return await _backend.search_warns(server_id, query, user_id, limit, offset)
+
+
+async def search_cases(server_id: int, query: str, limit: int = 10, offset: int = 0) -> tuple:
+    """
+    This function will search the reasons of the moderation cases of a server with the
+    full-text index, the best matches first.
+
+    :param server_id: The ID of the server.
+    :param query: The words to search for.
+    :param limit: The number of cases to return.
+    :param offset: The number of best matches to skip, to read the next pages.
+    :return: The number of matching cases, and a page of them like `iter_cases` returns them.
+    """
+
+    return await _backend.search_cases(server_id, query, limit, offset)
+
+
+async def add_scheduled_action(
+    server_id: int, action: str, target_id: int, due_at: int, payload: str
+) -> int:
+    """
+    This function will store a timed moderation action until it runs.
+
+    :param server_id: The ID of the server the action is taken in.
+    :param action: The name of the action, for example `unban`.
+    :param target_id: The ID of the user the action is taken against.
+    :param due_at: The UNIX timestamp the action runs at.
+    :param payload: What the action needs to run, as JSON.
+    :return: The ID of the action, unique within the server.
+    """
+
+    return await _backend.add_scheduled_action(server_id, action, target_id, due_at, payload)
+
+
+async def remove_scheduled_action(server_id: int, action_id: int) -> None:
+    """
+    This function will delete a timed moderation action, once it ran or was cancelled.
+
+    :param server_id: The ID of the server of the action.
+    :param action_id: The ID of the action.
+    """
+
+    await _backend.remove_scheduled_action(server_id, action_id)
+
+
+async def get_scheduled_actions(server_id: int, limit: int = 25) -> list:
+    """
+    This function will return the next timed moderation actions of a server.
+
+    :param server_id: The ID of the server.
+    :param limit: The number of actions to return.
+    :return: The actions, the soonest first: ID, action, target ID, due time and payload.
+    """
+
+    return await _backend.get_scheduled_actions(server_id, limit)
+
+
+def iter_scheduled_actions(chunk_size: int = 1000):
+    """
+    This function will iterate over the timed moderation actions of every server, to load
+    them on startup. They are read in chunks using the last ID as the cursor.
+
+    :param chunk_size: The number of actions read per query.
+    :return: An asynchronous iterator of lists of actions: ID, server ID, action, target ID,
+    due time and payload.
+    """
+
+    return _backend.iter_scheduled_actions(chunk_size)
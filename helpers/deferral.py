@@ -0,0 +1,116 @@
+import asyncio
+
+import discord
+from discord.ext.commands import Context
+
+from helpers import metrics
+
+
+class AutoDefer:
+    """
+    Acknowledges the slash commands that are slow to respond. Discord drops an interaction
+    that is not responded to within 3 seconds, so a timer defers it shortly before, counting
+    from when the interaction was created, which includes the time spent waiting for
+    admission. Commands respond through a `DeferringContext`, which settles the deferral
+    first, so the response goes to the follow-up webhook once the interaction is deferred
+    and the two never race to acknowledge it.
+    """
+
+    def __init__(self, after: float = 2.0, ephemeral: list = ()):
+        """
+        :param after: How many seconds after its creation an interaction is deferred,
+        this must leave time for the request to reach Discord before the deadline.
+        :param ephemeral: The commands whose response is only shown to their user,
+        their deferral must be ephemeral too.
+        """
+
+        self.after = after
+        self.ephemeral = frozenset(ephemeral)
+        self._tasks = set()
+
+    def arm(self, context: Context) -> None:
+        """
+        Starts the timer of a command, this is a no-op for prefix commands or if it is running.
+
+        :param context: The context of the command.
+        """
+
+        interaction = context.interaction
+        if interaction is None or getattr(context, "deferral", None) is not None:
+            return
+
+        elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+        context.deferral = asyncio.get_running_loop().call_later(
+            max(0.0, self.after - elapsed), self._fire, context
+        )
+
+    def disarm(self, context: Context) -> None:
+        """
+        Stops the timer of a command, this is a no-op if it is not running.
+
+        :param context: The context of the command.
+        """
+
+        timer = getattr(context, "deferral", None)
+        if timer is not None:
+            context.deferral = None
+            timer.cancel()
+
+    async def settle(self, context: Context) -> None:
+        """
+        Makes sure the deferral won't race with a response the command is about to send:
+        the timer is stopped, and a deferral that is already being sent is waited for.
+
+        :param context: The context of the command.
+        """
+
+        self.disarm(context)
+        deferring = getattr(context, "deferring", None)
+        if deferring is not None:
+            await asyncio.shield(deferring)
+
+    def _fire(self, context: Context) -> None:
+        context.deferral = None
+        if context.interaction.response.is_done():
+            return
+        task = asyncio.create_task(self._defer(context))
+        context.deferring = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _defer(self, context: Context) -> None:
+        ephemeral = context.command is not None and (
+            context.command.qualified_name in self.ephemeral
+            or (context.command.root_parent or context.command).name in self.ephemeral
+        )
+        try:
+            await context.interaction.response.defer(ephemeral=ephemeral)
+        except discord.InteractionResponded:
+            return
+        except discord.NotFound:
+            # The deadline passed before the command even started, the bot was too busy.
+            metrics.increment("deferral.expired")
+            return
+        except discord.HTTPException:
+            # Not deferred, the command responds by itself as if there was no timer.
+            return
+        metrics.increment("deferral.deferred")
+
+
+class DeferringContext(Context):
+    """
+    The context of every command, it waits for the automatic deferral of its interaction
+    before responding, so its response is sent as a follow-up when the interaction was
+    deferred meanwhile.
+    """
+
+    async def send(self, *args, **kwargs) -> discord.Message:
+        await self.bot.deferral.settle(self)
+        return await super().send(*args, **kwargs)
+
+    async def defer(self, *, ephemeral: bool = False) -> None:
+        await self.bot.deferral.settle(self)
+        if self.interaction is not None and self.interaction.response.is_done():
+            # Deferred automatically while the command waited for admission.
+            return
+        await super().defer(ephemeral=ephemeral)
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from helpers import db_manager, metrics
+
+# The server the last run stopped at when it ran out of budget, None if it reached them all.
+_cursor = None
+
+
+async def expire_warnings(
+    batch_size: int = 500,
+    max_batches: int = 20,
+    vacuum_pages: int = 200,
+    logger: Optional[logging.Logger] = None,
+    owns: Optional[Callable[[int], bool]] = None,
+) -> int:
+    """
+    This function will expire the warnings of every server with an expiry policy, in
+    batches that each hold the write lock briefly, yielding to the event loop in between.
+    Servers with more expired warnings than the batch budget are caught up on the next runs,
+    which start after the server the budget ran out at.
+
+    :param batch_size: The maximum number of warnings expired per transaction.
+    :param max_batches: The maximum number of full batches per run, over all servers.
+    :param vacuum_pages: The maximum number of free pages returned to the file system per run.
+    :param logger: The logger to report to.
+    :param owns: Tells if the warnings of a server are expired by this process, for clusters.
+    :return: The number of warnings that expired.
+    """
+
+    global _cursor
+
+    policies = sorted(
+        (
+            policy for policy in await db_manager.get_warn_expiry_policies()
+            if owns is None or owns(int(policy[0]))
+        ),
+        key=lambda policy: int(policy[0]),
+    )
+    # Resume after the server the last run stopped at, every server gets its turn.
+    start = next(
+        (index for index, policy in enumerate(policies) if _cursor is not None
+         and int(policy[0]) > _cursor),
+        0,
+    )
+    _cursor = None
+
+    expired = 0
+    batches = 0
+    for server_id, expire_after, action in policies[start:] + policies[:start]:
+        while batches < max_batches:
+            count = await db_manager.expire_warns(
+                server_id, expire_after, action == "archive", batch_size
+            )
+            expired += count
+            if count < batch_size:
+                break
+            # Only full batches count, servers with nothing to expire don't use up the budget.
+            batches += 1
+            await asyncio.sleep(0)
+        if batches >= max_batches:
+            _cursor = int(server_id)
+            break
+
+    metrics.increment("warns.expired", expired)
+    free_pages = await db_manager.compact(vacuum_pages)
+    if expired and logger is not None:
+        logger.info("Expired %s warnings, %s free pages left", expired, free_pages)
+    return expired
@@ -0,0 +1,112 @@
+import asyncio
+import inspect
+import logging
+import signal
+from typing import Awaitable, Callable, Optional
+
+from discord.ext.commands import Context
+
+
+class Lifecycle:
+    """
+    Coordinates the shutdown of the bot: new commands are refused, the commands in
+    flight get a deadline to finish, then the shutdown hooks flush and persist what
+    they own before the bot closes.
+    """
+
+    def __init__(
+        self,
+        close: Callable[[], Awaitable[None]],
+        drain_timeout: float = 20.0,
+        hook_timeout: float = 5.0,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.close = close
+        self.drain_timeout = drain_timeout
+        self.hook_timeout = hook_timeout
+        self.logger = logger or logging.getLogger("discord_bot")
+        self.accepting = True
+        self.in_flight = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._hooks = []
+        self._shutdown = None
+
+    def add_hook(self, name: str, callback: Callable) -> None:
+        """
+        Registers a function to call on shutdown, once the commands are drained.
+        Hooks run in the order they were added, and may be coroutine functions.
+
+        :param name: The name of the hook, used in the logs.
+        :param callback: The function to call.
+        """
+
+        self._hooks.append((name, callback))
+
+    def begin(self, context: Context) -> None:
+        """
+        Counts a command as in flight, this is a no-op if it is already counted.
+
+        :param context: The context of the command.
+        """
+
+        if getattr(context, "in_flight", False):
+            return
+        context.in_flight = True
+        self.in_flight += 1
+        self._drained.clear()
+
+    def end(self, context: Context) -> None:
+        """
+        Stops counting a command as in flight, this is a no-op if it is not counted.
+
+        :param context: The context of the command.
+        """
+
+        if not getattr(context, "in_flight", False):
+            return
+        context.in_flight = False
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._drained.set()
+
+    def install_signal_handlers(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, self.request_shutdown, "SIGTERM")
+        except NotImplementedError:
+            # Signal handlers are not available on Windows event loops.
+            pass
+
+    def request_shutdown(self, reason: str) -> asyncio.Task:
+        """
+        Starts shutting down in the background, this is a no-op if the shutdown already started.
+
+        :param reason: Why the bot shuts down, used in the logs.
+        :return: The task shutting the bot down.
+        """
+
+        if self._shutdown is None:
+            self._shutdown = asyncio.create_task(self.shutdown(reason))
+        return self._shutdown
+
+    async def shutdown(self, reason: str) -> None:
+        self.accepting = False
+        self.logger.info("Shutting down (%s), waiting for %s commands", reason, self.in_flight)
+        try:
+            await asyncio.wait_for(self._drained.wait(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(
+                "%s commands did not finish within %ss, shutting down anyway",
+                self.in_flight, self.drain_timeout,
+            )
+
+        for name, callback in self._hooks:
+            try:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await asyncio.wait_for(result, self.hook_timeout)
+            except Exception:
+                self.logger.exception("The %s shutdown hook failed", name)
+
+        await self.close()
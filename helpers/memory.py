@@ -0,0 +1,106 @@
+import gc
+import resource
+import sys
+import tracemalloc
+from typing import Optional
+
+from discord.ext import commands
+
+IGNORED_FILES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def process_memory() -> dict:
+    """
+    This function will return the memory used by the process.
+
+    :return: The resident set size, its peak and the Python heap, in bytes, and the GC counts.
+    """
+
+    usage = {"rss": None, "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    try:
+        with open("/proc/self/status", encoding="utf-8") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    usage["rss"] = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        # Not on Linux, only the peak is known.
+        pass
+
+    usage["allocated_blocks"] = sys.getallocatedblocks()
+    usage["traced"] = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    usage["gc_counts"] = gc.get_count()
+    usage["gc_collections"] = tuple(generation["collections"] for generation in gc.get_stats())
+    return usage
+
+
+def cache_sizes(bot: commands.Bot) -> dict:
+    """
+    This function will return the number of entries in the caches of discord.py.
+
+    :param bot: The bot.
+    :return: The number of cached guilds, members, users, messages and view components.
+    """
+
+    state = bot._connection
+    return {
+        "guilds": len(bot.guilds),
+        "members": sum(len(guild.members) for guild in bot.guilds),
+        "users": len(bot.users),
+        "messages": len(bot.cached_messages),
+        "max_messages": state.max_messages,
+        "persistent_views": len(bot.persistent_views),
+        # The view store has no public accessors, it is where the components of views live.
+        "view_items": sum(len(items) for items in state._view_store._views.values()),
+    }
+
+
+class MemoryTracer:
+    """
+    Takes tracemalloc snapshots and compares them, to find where the memory grows.
+    Tracing is only started with the first snapshot, as it slows down every allocation.
+    """
+
+    def __init__(self, frames: int = 10):
+        self.frames = frames
+        self.baseline = None
+        self.taken_at = None
+
+    def snapshot(self) -> tracemalloc.Snapshot:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        return tracemalloc.take_snapshot().filter_traces(IGNORED_FILES)
+
+    def set_baseline(self, taken_at: float) -> None:
+        """
+        Takes the snapshot the next diffs are compared to, starting tracing if needed.
+
+        :param taken_at: The time the snapshot is taken at.
+        """
+
+        self.baseline = self.snapshot()
+        self.taken_at = taken_at
+
+    def diff(self, limit: int = 10, key_type: str = "lineno") -> Optional[list]:
+        """
+        Compares the current allocations to the baseline.
+
+        :param limit: The number of allocation sites to return.
+        :param key_type: How the allocations are grouped, `lineno` or `traceback`.
+        :return: The sites whose allocations grew the most, or None without a baseline.
+        """
+
+        if self.baseline is None:
+            return None
+        statistics = self.snapshot().compare_to(self.baseline, key_type)
+        return [statistic for statistic in statistics if statistic.size_diff > 0][:limit]
+
+    def stop(self) -> None:
+        self.baseline = None
+        self.taken_at = None
+        tracemalloc.stop()
@@ -0,0 +1,39 @@
+from typing import Callable
+
+_counters = {}
+_gauges = {}
+
+
+def increment(name: str, value: int = 1) -> None:
+    """
+    This function will increment a counter.
+
+    :param name: The name of the counter.
+    :param value: The value that should be added to the counter.
+    """
+
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def register_gauge(name: str, callback: Callable[[], float]) -> None:
+    """
+    This function will register a gauge, its value is read when a snapshot is taken.
+
+    :param name: The name of the gauge.
+    :param callback: The function returning the current value of the gauge.
+    """
+
+    _gauges[name] = callback
+
+
+def snapshot() -> dict:
+    """
+    This function will return the current value of every counter and gauge.
+
+    :return: A dictionary mapping the name of every metric to its value.
+    """
+
+    values = dict(_counters)
+    for name, callback in _gauges.items():
+        values[name] = callback()
+    return dict(sorted(values.items()))
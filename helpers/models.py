@@ -0,0 +1,133 @@
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+
+def parse_fields(text: str, fields: frozenset) -> dict:
+    """
+    This function will parse only the given top-level fields of a JSON object.
+    Parsing stops as soon as every field has been found, so large values that
+    come after them (like the locations of the covid payload) are never decoded.
+
+    :param text: The JSON document, which must be an object.
+    :param fields: The names of the fields that should be parsed.
+    :return: A dictionary with the fields that were found.
+    """
+
+    result = {}
+    index = _whitespace.match(text, 0).end()
+    if text[index:index + 1] != "{":
+        raise ValueError("Expected a JSON object.")
+    index += 1
+
+    while len(result) < len(fields):
+        index = _whitespace.match(text, index).end()
+        if text[index:index + 1] == "}":
+            break
+
+        key, index = _decoder.raw_decode(text, index)
+        index = _whitespace.match(text, index).end()
+        if text[index:index + 1] != ":":
+            raise ValueError(f"Expected ':' at position {index}.")
+        index = _whitespace.match(text, index + 1).end()
+
+        # Values we don't need are still decoded to find where they end, but are dropped right away.
+        value, index = _decoder.raw_decode(text, index)
+        if key in fields:
+            result[key] = value
+
+        index = _whitespace.match(text, index).end()
+        if text[index:index + 1] == ",":
+            index += 1
+    return result
+
+
+class Fact:
+    __slots__ = ("text",)
+
+    fields = frozenset(("text",))
+
+    def __init__(self, text: str = None):
+        self.text = text
+
+    @classmethod
+    def from_json(cls, text: str) -> "Fact":
+        data = parse_fields(text, cls.fields)
+        return cls(data.get("text"))
+
+
+class DogPicture:
+    __slots__ = ("url",)
+
+    fields = frozenset(("message",))
+
+    def __init__(self, url: str = None):
+        self.url = url
+
+    @classmethod
+    def from_json(cls, text: str) -> "DogPicture":
+        data = parse_fields(text, cls.fields)
+        return cls(data.get("message"))
+
+
+class BitcoinPrice:
+    __slots__ = ("rate",)
+
+    fields = frozenset(("bpi",))
+
+    def __init__(self, rate: str = None):
+        self.rate = rate
+
+    @classmethod
+    def from_json(cls, text: str) -> "BitcoinPrice":
+        data = parse_fields(text, cls.fields)
+        bpi = data.get("bpi")
+        usd = bpi.get("USD") if isinstance(bpi, dict) else None
+        if not isinstance(usd, dict) or usd.get("rate") is None:
+            raise ValueError("The response has no USD rate.")
+        return cls(usd["rate"])
+
+
+class CovidStatus:
+    __slots__ = (
+        "infected",
+        "recovered",
+        "died",
+        "infected_today",
+        "recovered_today",
+        "died_today",
+    )
+
+    fields = frozenset(
+        ("infected", "recovered", "died", "infectedToday", "recoveredToday", "diedToday")
+    )
+
+    def __init__(
+        self,
+        infected=None,
+        recovered=None,
+        died=None,
+        infected_today=None,
+        recovered_today=None,
+        died_today=None,
+    ):
+        self.infected = infected
+        self.recovered = recovered
+        self.died = died
+        self.infected_today = infected_today
+        self.recovered_today = recovered_today
+        self.died_today = died_today
+
+    @classmethod
+    def from_json(cls, text: str) -> "CovidStatus":
+        data = parse_fields(text, cls.fields)
+        return cls(
+            data.get("infected"),
+            data.get("recovered"),
+            data.get("died"),
+            data.get("infectedToday"),
+            data.get("recoveredToday"),
+            data.get("diedToday"),
+        )
@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+
+from helpers.storage import partitions_directory
+from helpers.storage.partitioned import BUCKETS, bucket_of, load_map, partition_path, save_map
+from helpers.storage.sqlite import SQLiteBackend
+
+ROOT = os.path.realpath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# The tables with the data of the servers, the statistics follow the warnings with their triggers.
+TABLES = (
+    "warns", "warns_archive", "guild_settings", "warn_expiry_policies", "cases", "scheduled_actions",
+)
+
+logger = logging.getLogger("discord_bot.partitions")
+
+
+def plan(assignment: list, partitions: int) -> list:
+    """
+    This function will spread the buckets evenly over a new number of partitions,
+    moving as few buckets as possible.
+
+    :param assignment: The current partition of every bucket.
+    :param partitions: The new number of partitions.
+    :return: The new partition of every bucket.
+    """
+
+    quota = [BUCKETS // partitions + (index < BUCKETS % partitions) for index in range(partitions)]
+    result = [None] * BUCKETS
+    for bucket, partition in enumerate(assignment):
+        if partition < partitions and quota[partition] > 0:
+            result[bucket] = partition
+            quota[partition] -= 1
+    for bucket in range(BUCKETS):
+        if result[bucket] is None:
+            partition = max(range(partitions), key=lambda candidate: quota[candidate])
+            result[bucket] = partition
+            quota[partition] -= 1
+    return result
+
+
+def _columns(connection: sqlite3.Connection, table: str) -> str:
+    columns = [row[1] for row in connection.execute(f"PRAGMA table_info(`{table}`)")]
+    if table in ("cases", "scheduled_actions"):
+        # These IDs are only unique within a file, the target numbers the moved rows.
+        columns.remove("id")
+    return ", ".join(f"`{column}`" for column in columns)
+
+
+def copy_bucket(source: str, target: str, bucket: int) -> int:
+    """
+    This function will copy the rows of the servers of a bucket from a partition to another.
+
+    :param source: The path of the partition the bucket is in.
+    :param target: The path of the partition the bucket moves to.
+    :param bucket: The bucket.
+    :return: The number of rows that were copied.
+    """
+
+    connection = sqlite3.connect(source)
+    connection.create_function("partition_bucket", 1, bucket_of, deterministic=True)
+    try:
+        connection.execute("ATTACH DATABASE ? AS `target`", (target,))
+        copied = 0
+        with connection:
+            for table in TABLES:
+                columns = _columns(connection, table)
+                copied += connection.execute(
+                    f"INSERT INTO `target`.`{table}` ({columns}) "
+                    f"SELECT {columns} FROM `main`.`{table}` "
+                    "WHERE partition_bucket(`server_id`) = ? ORDER BY rowid",
+                    (bucket,),
+                ).rowcount
+        return copied
+    finally:
+        connection.close()
+
+
+def prune(path: str, partition: int, assignment: list) -> int:
+    """
+    This function will delete the rows of the servers that are not assigned to a partition,
+    the copies left behind by a move.
+
+    :param path: The path of the partition.
+    :param partition: The partition.
+    :param assignment: The partition of every bucket.
+    :return: The number of rows that were deleted.
+    """
+
+    connection = sqlite3.connect(path)
+    connection.create_function(
+        "misplaced", 1, lambda server_id: assignment[bucket_of(server_id)] != partition,
+        deterministic=True,
+    )
+    try:
+        deleted = 0
+        with connection:
+            # The cases are append-only for the bot, the trigger is put back in the same transaction.
+            connection.execute("BEGIN")
+            trigger = connection.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'cases_no_delete'"
+            ).fetchone()
+            connection.execute("DROP TRIGGER IF EXISTS `cases_no_delete`")
+            for table in TABLES:
+                deleted += connection.execute(
+                    f"DELETE FROM `{table}` WHERE misplaced(`server_id`)"
+                ).rowcount
+            if trigger is not None:
+                connection.execute(trigger[0])
+        return deleted
+    finally:
+        connection.close()
+
+
+def import_unpartitioned(database_path: str, directory: str, assignment: list) -> int:
+    """
+    This function will move the rows of the servers from the main database to their partitions,
+    the data written before the engine was partitioned. Each partition is filled in a single
+    transaction over both files, so an interrupted import is finished by running it again.
+
+    :param database_path: The path of the main database.
+    :param directory: The directory of the partitions.
+    :param assignment: The partition of every bucket.
+    :return: The number of rows that were moved.
+    """
+
+    connection = sqlite3.connect(database_path, timeout=60, isolation_level=None)
+    connection.create_function(
+        "partition_of", 1, lambda server_id: assignment[bucket_of(server_id)], deterministic=True
+    )
+    try:
+        if not any(
+            connection.execute(f"SELECT 1 FROM `{table}` LIMIT 1").fetchone() for table in TABLES
+        ):
+            return 0
+        moved = 0
+        for partition in sorted(set(assignment)):
+            connection.execute(
+                "ATTACH DATABASE ? AS `target`", (partition_path(directory, partition),)
+            )
+            try:
+                # Clusters starting together wait for each other, the later ones find nothing left.
+                connection.execute("BEGIN IMMEDIATE")
+                trigger = connection.execute(
+                    "SELECT sql FROM `main`.sqlite_master "
+                    "WHERE type = 'trigger' AND name = 'cases_no_delete'"
+                ).fetchone()
+                connection.execute("DROP TRIGGER IF EXISTS `main`.`cases_no_delete`")
+                for table in TABLES:
+                    columns = _columns(connection, table)
+                    moved += connection.execute(
+                        f"INSERT INTO `target`.`{table}` ({columns}) "
+                        f"SELECT {columns} FROM `main`.`{table}` "
+                        "WHERE partition_of(`server_id`) = ? ORDER BY rowid",
+                        (partition,),
+                    ).rowcount
+                    connection.execute(
+                        f"DELETE FROM `main`.`{table}` WHERE partition_of(`server_id`) = ?",
+                        (partition,),
+                    )
+                if trigger is not None:
+                    connection.execute(trigger[0])
+                connection.execute("COMMIT")
+            except BaseException:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise
+            finally:
+                connection.execute("DETACH DATABASE `target`")
+        if moved:
+            logger.info("Moved %s rows of the main database to the partitions", moved)
+        return moved
+    finally:
+        connection.close()
+
+
+async def rebalance(directory: str, schema_path: str, partitions: int) -> int:
+    """
+    This function will move the servers between the partitions so they are spread over
+    a new number of partitions. The bot must not be running. Every step can be repeated,
+    an interrupted rebalance is finished by running it again.
+
+    :param directory: The directory of the partitions.
+    :param schema_path: The path of the SQL schema of the partitions.
+    :param partitions: The new number of partitions.
+    :return: The number of buckets that were moved.
+    """
+
+    assignment = load_map(directory, partitions)
+    new_assignment = plan(assignment, partitions)
+    count = max(max(assignment), max(new_assignment)) + 1
+    for partition in range(count):
+        await SQLiteBackend(partition_path(directory, partition), schema_path).initialize()
+
+    # Copies left by an interrupted rebalance would be copied twice.
+    for partition in range(count):
+        prune(partition_path(directory, partition), partition, assignment)
+
+    moves = [
+        (bucket, source, target)
+        for bucket, (source, target) in enumerate(zip(assignment, new_assignment))
+        if source != target
+    ]
+    for bucket, source, target in moves:
+        copied = copy_bucket(
+            partition_path(directory, source), partition_path(directory, target), bucket
+        )
+        logger.info(
+            "Copied bucket %s from partition %s to %s (%s rows)", bucket, source, target, copied
+        )
+
+    # The servers are read from their new partitions from here on.
+    save_map(directory, new_assignment)
+    for partition in range(count):
+        deleted = prune(partition_path(directory, partition), partition, new_assignment)
+        if deleted:
+            logger.info("Deleted %s moved rows from partition %s", deleted, partition)
+    for partition in range(partitions, count):
+        logger.info(
+            "The partition %s is empty and can be deleted", partition_path(directory, partition)
+        )
+    return len(moves)
+
+
+def describe(directory: str, partitions: int) -> str:
+    assignment = load_map(directory, partitions)
+    lines = []
+    for partition in range(max(assignment) + 1):
+        path = partition_path(directory, partition)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        lines.append(
+            f"partition {partition}: {assignment.count(partition)} buckets, {size / 1024:.0f} KiB"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and rebalance the storage partitions.")
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        help="Move the servers so they are spread over this number of partitions.",
+    )
+    arguments = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[{asctime}] [{levelname:<8}] {name}: {message}",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        style="{",
+    )
+
+    with open(f"{ROOT}/config.json", encoding="utf-8") as file:
+        storage = json.load(file)["storage"]
+    partitions_path = partitions_directory(storage, f"{ROOT}/database/database.database")
+    if arguments.partitions:
+        moved = asyncio.run(
+            rebalance(partitions_path, f"{ROOT}/database/schema.sql", arguments.partitions)
+        )
+        logger.info(
+            "Moved %s buckets, set \"partitions\" to %s in the config", moved, arguments.partitions
+        )
+    print(describe(partitions_path, storage["partitions"]))
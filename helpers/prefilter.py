@@ -0,0 +1,72 @@
+import discord
+
+from helpers import metrics
+from helpers.settings import SettingsStore
+
+
+class MessagePrefilter:
+    """
+    Cheaply rejects the messages that can't be commands, before a context
+    is built for them and their prefix is resolved.
+    """
+
+    def __init__(self, settings: SettingsStore, default_prefix: str):
+        self.settings = settings
+        self.default_prefix = default_prefix
+        self.user_id = None
+        # Few distinct prefixes are in use, so their patterns are built once and shared.
+        self._patterns = {}
+
+    def patterns(self, prefix: str) -> tuple:
+        """
+        Gets the patterns a command message with the given prefix starts with.
+
+        :param prefix: The prefix of the server.
+        :return: The prefix and the two forms of the mention of the bot.
+        """
+
+        patterns = self._patterns.get(prefix)
+        if patterns is None:
+            patterns = (prefix, f"<@{self.user_id}>", f"<@!{self.user_id}>")
+            self._patterns[prefix] = patterns
+        return patterns
+
+    def set_user(self, user_id: int) -> None:
+        """
+        Sets the ID of the bot, which mentions used as a prefix refer to.
+
+        :param user_id: The ID of the bot.
+        """
+
+        if user_id != self.user_id:
+            self.user_id = user_id
+            self._patterns.clear()
+
+    def should_process(self, message: discord.Message) -> bool:
+        """
+        Checks if a message could be a command.
+
+        :param message: The message that was sent.
+        :return: False if the message is certainly not a command.
+        """
+
+        content = message.content
+        if not content:
+            metrics.increment("messages.skipped")
+            return False
+
+        if message.guild is None:
+            prefix = self.default_prefix
+        else:
+            settings = self.settings.peek(message.guild.id)
+            if settings is None:
+                # Let the full path load the settings of the server, the next messages will use them.
+                metrics.increment("messages.processed")
+                return True
+            prefix = settings.prefix
+
+        if content.startswith(self.patterns(prefix)):
+            metrics.increment("messages.processed")
+            return True
+        metrics.increment("messages.skipped")
+        return False
@@ -0,0 +1,144 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+class Profile:
+    """
+    The samples taken by a profiler, keyed by collapsed stack.
+    """
+
+    def __init__(self, samples: Counter, duration: float, interval: float):
+        self.samples = samples
+        self.duration = duration
+        self.interval = interval
+
+    @property
+    def total(self) -> int:
+        return sum(self.samples.values())
+
+    def collapsed(self) -> str:
+        """
+        Formats the samples as collapsed stacks, one `frame;frame;frame count` line per
+        stack, which flamegraph.pl, speedscope and inferno read directly.
+
+        :return: The collapsed stacks.
+        """
+
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def top(self, limit: int = 25) -> str:
+        """
+        Formats the functions in which the most samples were taken.
+
+        :param limit: The number of functions to show.
+        :return: A table of the functions, by their own samples then the samples under them.
+        """
+
+        own = Counter()
+        cumulative = Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(";")[1:]
+            own[frames[-1]] += count
+            for frame in set(frames):
+                cumulative[frame] += count
+
+        total = self.total or 1
+        ranked = sorted(cumulative, key=lambda frame: (own[frame], cumulative[frame]), reverse=True)
+        lines = [
+            f"{self.total} samples in {self.duration:.1f}s, every {self.interval * 1000:g} ms",
+            "",
+            f"{'own':>7} {'total':>7}  function",
+        ]
+        for frame in ranked[:limit]:
+            lines.append(
+                f"{own[frame] / total:7.1%} {cumulative[frame] / total:7.1%}  {frame}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """
+    A statistical profiler: a thread takes the stack of every other thread at a fixed
+    interval, so the profiled code runs unmodified and the overhead stays constant.
+    """
+
+    def __init__(self, interval: float = 0.005, max_duration: float = 300.0):
+        self.interval = interval
+        self.max_duration = max_duration
+        self._labels = {}
+        self._samples = Counter()
+        self._thread = None
+        self._started_at = None
+        self._duration = 0.0
+        self._stopped = threading.Event()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started_at if self._started_at is not None else 0.0
+
+    def start(self) -> None:
+        if self.is_running():
+            raise RuntimeError("The profiler is already running.")
+        self._samples = Counter()
+        # Labels hold on to code objects, don't keep them from a profile to the next.
+        self._labels = {}
+        self._stopped.clear()
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Profile:
+        """
+        Stops sampling, the profiler also stops by itself after its maximum duration.
+
+        :return: The samples taken since the profiler was started.
+        """
+
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        return Profile(self._samples, self._duration, self.interval)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(ROOT):
+                filename = os.path.relpath(filename, ROOT)
+            else:
+                filename = os.path.basename(filename)
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _run(self) -> None:
+        try:
+            self._sample()
+        finally:
+            self._duration = time.monotonic() - self._started_at
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        deadline = self._started_at + self.max_duration
+        while not self._stopped.wait(self.interval):
+            if time.monotonic() > deadline:
+                break
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                stack.reverse()
+                self._samples[";".join(stack)] += 1
@@ -0,0 +1,161 @@
+import time
+from typing import Optional
+
+from discord.ext import commands
+
+from helpers import metrics
+
+BUCKET_TYPES = {
+    "user": commands.BucketType.user,
+    "channel": commands.BucketType.channel,
+    "guild": commands.BucketType.guild,
+}
+
+
+class Rule:
+    """
+    A token bucket refilling `rate` tokens every `per` seconds and holding up to `burst` tokens.
+    """
+
+    __slots__ = ("rate", "per", "burst", "scope", "interval", "tolerance")
+
+    def __init__(self, rate: int, per: float, scope: str = "user", burst: Optional[int] = None):
+        if scope not in BUCKET_TYPES:
+            raise ValueError(f"Unknown rate limit scope '{scope}'.")
+        self.rate = rate
+        self.per = per
+        self.scope = scope
+        self.burst = burst or rate
+        # The bucket is stored as the time at which it will be full again (GCRA),
+        # so every key costs a single float instead of a token count and a timestamp.
+        self.interval = per / rate
+        self.tolerance = self.interval * (self.burst - 1)
+
+    def to_dict(self) -> dict:
+        return {"rate": self.rate, "per": self.per, "scope": self.scope, "burst": self.burst}
+
+
+def parse_rules(config) -> list:
+    """
+    This function will parse the rules of a command from the configuration.
+
+    :param config: A rule, or a list of rules, as dictionaries.
+    :return: The list of rules.
+    """
+
+    if isinstance(config, dict):
+        config = [config]
+    return [Rule(**rule) for rule in config]
+
+
+class RateLimiter:
+    """
+    Rate limits commands with token buckets keyed by user, channel or guild.
+    Every command has default rules, which can be overridden per guild.
+    """
+
+    def __init__(self, defaults: dict, guilds: dict):
+        self._buckets = {}
+        self.configure(defaults, guilds)
+        metrics.register_gauge("ratelimit.buckets", self.__len__)
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for buckets in self._buckets.values())
+
+    def configure(self, defaults: dict, guilds: dict) -> None:
+        """
+        Replaces every rule, the existing buckets are kept.
+
+        :param defaults: The rules of every command, by qualified command name.
+        :param guilds: The rules overriding the defaults, by guild ID then command name.
+        """
+
+        self.defaults = {name: parse_rules(rules) for name, rules in defaults.items()}
+        self.guilds = {
+            int(guild_id): {name: parse_rules(rules) for name, rules in overrides.items()}
+            for guild_id, overrides in guilds.items()
+        }
+
+    def set_rules(self, command: str, rules: list, guild_id: Optional[int] = None) -> None:
+        """
+        Sets the rules of a command, globally or for a single guild.
+
+        :param command: The qualified name of the command.
+        :param rules: The new rules, an empty list removes the rate limit.
+        :param guild_id: The guild the rules apply to, or None for the default rules.
+        """
+
+        if guild_id is None:
+            self.defaults[command] = rules
+        else:
+            self.guilds.setdefault(guild_id, {})[command] = rules
+
+    def rules_for(self, command: str, guild_id: Optional[int]) -> tuple:
+        """
+        Gets the rules of a command in a guild.
+
+        :param command: The qualified name of the command.
+        :param guild_id: The ID of the guild, or None in DMs.
+        :return: The guild the rules are overridden for (None for the defaults) and the rules.
+        """
+
+        overrides = self.guilds.get(guild_id)
+        if overrides is not None and command in overrides:
+            return guild_id, overrides[command]
+        return None, self.defaults.get(command, ())
+
+    def hit(self, context: commands.Context) -> Optional[tuple]:
+        """
+        Takes a token from every bucket of the command for this context.
+
+        :param context: The context of the command.
+        :return: None if the command can run, or the rule that was exceeded and the retry delay.
+        """
+
+        command = context.command.qualified_name
+        guild_id = context.guild.id if context.guild is not None else None
+        override, rules = self.rules_for(command, guild_id)
+        if not rules:
+            return None
+
+        now = time.monotonic()
+        pending = []
+        for index, rule in enumerate(rules):
+            if rule.scope == "user":
+                key = context.author.id
+            elif rule.scope == "channel":
+                key = context.channel.id
+            else:
+                key = guild_id or context.channel.id
+
+            buckets = self._buckets.setdefault((command, override, index), {})
+            full_at = max(buckets.get(key, now), now)
+            if full_at - now > rule.tolerance:
+                metrics.increment("ratelimit.limited")
+                return rule, full_at - now - rule.tolerance
+            pending.append((buckets, key, full_at + rule.interval))
+
+        # Only take the tokens once every bucket allowed the command.
+        for buckets, key, full_at in pending:
+            buckets[key] = full_at
+        return None
+
+    def evict_idle(self) -> int:
+        """
+        Drops the buckets that are full again, they behave exactly like missing ones.
+
+        :return: The number of buckets that were dropped.
+        """
+
+        now = time.monotonic()
+        evicted = 0
+        for name in list(self._buckets):
+            buckets = self._buckets[name]
+            remaining = {key: full_at for key, full_at in buckets.items() if full_at > now}
+            evicted += len(buckets) - len(remaining)
+            if remaining:
+                self._buckets[name] = remaining
+            else:
+                del self._buckets[name]
+        metrics.increment("ratelimit.evicted", evicted)
+        return evicted
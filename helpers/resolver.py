@@ -0,0 +1,161 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import discord
+
+from helpers import metrics
+
+
+class Resolver:
+    """
+    Resolves users and the members of servers without a REST call when possible.
+    The gateway caches of the bot are tried first, then the results of previous fetches,
+    which are kept for a while. Users and members that don't exist are cached too, for a
+    shorter time, so looking up someone who left does not fetch them on every command.
+    Concurrent lookups of the same user or member share a single fetch. Members change
+    more often than users, they are kept for less time and dropped when the gateway
+    reports that they left, were banned or were updated.
+    """
+
+    def __init__(
+        self,
+        bot,
+        ttl: float = 300,
+        member_ttl: float = 30,
+        negative_ttl: float = 30,
+        capacity: int = 10000,
+    ):
+        """
+        :param ttl: How many seconds a fetched user is kept.
+        :param member_ttl: How many seconds a fetched member is kept.
+        :param negative_ttl: How many seconds an unknown user or member is remembered.
+        :param capacity: The number of results kept, the least recently used are dropped.
+        """
+
+        self.bot = bot
+        self.ttl = ttl
+        self.member_ttl = member_ttl
+        self.negative_ttl = negative_ttl
+        self.capacity = capacity
+        # ("user", user ID) or ("member", server ID, user ID) -> (expires at, result or None)
+        self._cache = OrderedDict()
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+        metrics.register_gauge("resolver.cached", lambda: len(self._cache))
+        metrics.register_gauge("resolver.hit_rate", self.hit_rate)
+        bot.add_listener(self._member_changed, "on_member_update")
+        bot.add_listener(self._member_joined, "on_member_join")
+        bot.add_listener(self._member_removed, "on_raw_member_remove")
+        bot.add_listener(self._member_banned, "on_member_ban")
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    async def member(self, guild: discord.Guild, user_id: int) -> Optional[discord.Member]:
+        """
+        Gets the member of a user in a server.
+
+        :param guild: The server the member should be in.
+        :param user_id: The ID of the user.
+        :return: The member, or None if the user is not in the server.
+        """
+
+        member = guild.get_member(user_id)
+        if member is not None:
+            self._hit()
+            return member
+        return await self._resolve(
+            ("member", guild.id, user_id), lambda: guild.fetch_member(user_id)
+        )
+
+    async def user(self, user_id: int) -> Optional[discord.User]:
+        """
+        Gets a user, whether or not they share a server with the bot.
+
+        :param user_id: The ID of the user.
+        :return: The user, or None if there is no user with this ID.
+        """
+
+        user = self.bot.get_user(user_id)
+        if user is not None:
+            self._hit()
+            return user
+        return await self._resolve(("user", user_id), lambda: self.bot.fetch_user(user_id))
+
+    def invalidate(self, guild_id: int, user_id: int) -> None:
+        """
+        Drops the cached member of a user, after they changed, left or were banned.
+        A fetch of the member that is in flight is not cached either.
+
+        :param guild_id: The ID of the server.
+        :param user_id: The ID of the user.
+        """
+
+        key = ("member", guild_id, user_id)
+        self._cache.pop(key, None)
+        self._loading.pop(key, None)
+
+    async def _member_changed(self, before: discord.Member, after: discord.Member) -> None:
+        self.invalidate(after.guild.id, after.id)
+
+    async def _member_joined(self, member: discord.Member) -> None:
+        self.invalidate(member.guild.id, member.id)
+
+    async def _member_removed(self, payload: discord.RawMemberRemoveEvent) -> None:
+        self.invalidate(payload.guild_id, payload.user.id)
+
+    async def _member_banned(self, guild: discord.Guild, user: discord.User) -> None:
+        self.invalidate(guild.id, user.id)
+
+    def _hit(self) -> None:
+        self.hits += 1
+        metrics.increment("resolver.hits")
+
+    async def _resolve(self, key: tuple, fetch: Callable[[], Awaitable]) -> Optional[object]:
+        entry = self._cache.get(key)
+        if entry is not None:
+            expires_at, result = entry
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(key)
+                self._hit()
+                if result is None:
+                    metrics.increment("resolver.negative_hits")
+                return result
+            del self._cache[key]
+
+        self.misses += 1
+        metrics.increment("resolver.misses")
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(self._fetch(key, fetch))
+            self._loading[key] = loading
+            loading.add_done_callback(lambda _: self._forget_load(key, loading))
+        return await asyncio.shield(loading)
+
+    def _forget_load(self, key: tuple, loading: asyncio.Future) -> None:
+        if self._loading.get(key) is loading:
+            del self._loading[key]
+
+    async def _fetch(self, key: tuple, fetch: Callable[[], Awaitable]) -> Optional[object]:
+        metrics.increment("resolver.fetches")
+        try:
+            result = await fetch()
+        except discord.NotFound:
+            result = None
+        # Other errors are not cached, the next lookup tries again.
+
+        if self._loading.get(key) is not asyncio.current_task():
+            # Invalidated while it was fetched, the result may be outdated already.
+            return result
+        if result is None:
+            ttl = self.negative_ttl
+        else:
+            ttl = self.member_ttl if key[0] == "member" else self.ttl
+        self._cache[key] = (time.monotonic() + ttl, result)
+        if len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+        return result
@@ -0,0 +1,302 @@
+import asyncio
+import json
+import logging
+import math
+import time
+from typing import Awaitable, Callable, Optional
+
+from helpers import db_manager, metrics
+
+
+class ScheduledAction:
+    """
+    A moderation action that runs at a given time, like lifting a temporary ban.
+    """
+
+    __slots__ = (
+        "action_id", "server_id", "action", "target_id", "due_at", "payload",
+        "attempts", "level", "slot",
+    )
+
+    def __init__(self, action_id: int, server_id: int, action: str, target_id: int,
+                 due_at: int, payload: dict):
+        self.action_id = action_id
+        self.server_id = server_id
+        self.action = action
+        self.target_id = target_id
+        self.due_at = due_at
+        self.payload = payload
+        self.attempts = 0
+        # Where the action is in the wheel, to remove it without searching.
+        self.level = None
+        self.slot = None
+
+    @property
+    def key(self) -> tuple:
+        # IDs are only unique per server, the partitions of the storage number them separately.
+        return self.server_id, self.action_id
+
+
+class TimingWheel:
+    """
+    A hierarchical timing wheel: each level has a number of slots, and a slot of a level
+    spans a whole turn of the level below. An action is put in the lowest level whose turn
+    includes its deadline, and moves down a level each time the slot it is in comes up,
+    until it is due. Adding and removing an action is O(1), whatever the number of actions.
+    Actions further away than the last level are kept aside until its turn ends.
+    """
+
+    def __init__(self, now: float, tick: float = 1.0, slots: int = 64, levels: int = 4):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.current = self._ticks(now)
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.overflow = {}
+        self.due = {}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _ticks(self, timestamp: float) -> int:
+        return math.ceil(timestamp / self.tick)
+
+    def add(self, action: ScheduledAction) -> None:
+        self.size += 1
+        self._place(action)
+
+    def remove(self, action: ScheduledAction) -> None:
+        if action.level is None:
+            bucket = self.due
+        elif action.level == self.levels:
+            bucket = self.overflow
+        else:
+            bucket = self.wheels[action.level][action.slot]
+        if bucket.pop(action.key, None) is not None:
+            self.size -= 1
+
+    def _place(self, action: ScheduledAction) -> None:
+        deadline = self._ticks(action.due_at)
+        if deadline <= self.current:
+            action.level = action.slot = None
+            self.due[action.key] = action
+            return
+        for level in range(self.levels):
+            span = self.slots ** (level + 1)
+            # The deadline comes before this level wraps around, its slot is ahead of us.
+            if deadline // span == self.current // span:
+                action.level = level
+                action.slot = deadline // self.slots ** level % self.slots
+                self.wheels[level][action.slot][action.key] = action
+                return
+        action.level = self.levels
+        action.slot = None
+        self.overflow[action.key] = action
+
+    def advance(self, now: float) -> list:
+        """
+        Moves the wheel to a time and collects the actions that are due.
+
+        :param now: The current UNIX timestamp.
+        :return: The actions that are due, they are not in the wheel anymore.
+        """
+
+        target = self._ticks(now)
+        while self.current < target:
+            self.current += 1
+            if self.current % self.slots ** self.levels == 0:
+                overflow, self.overflow = self.overflow, {}
+                for action in overflow.values():
+                    self._place(action)
+            # The upper levels first, their actions can land in the slots of the lower ones.
+            for level in range(self.levels - 1, 0, -1):
+                if self.current % self.slots ** level == 0:
+                    slot = self.current // self.slots ** level % self.slots
+                    bucket, self.wheels[level][slot] = self.wheels[level][slot], {}
+                    for action in bucket.values():
+                        self._place(action)
+            bucket = self.wheels[0][self.current % self.slots]
+            self.due.update(bucket)
+            bucket.clear()
+
+        due, self.due = list(self.due.values()), {}
+        self.size -= len(due)
+        return due
+
+
+class Scheduler:
+    """
+    Runs timed moderation actions. The actions are stored in the database so they survive
+    restarts, and kept in a timing wheel in memory so the database is never polled.
+    Due actions are run one at a time by a worker, and retried if they fail.
+    """
+
+    def __init__(
+        self,
+        tick: float = 1.0,
+        slots: int = 64,
+        levels: int = 4,
+        retry_delay: float = 60.0,
+        max_attempts: int = 5,
+        owns: Optional[Callable[[int], bool]] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        """
+        :param owns: Tells if the actions of a server are run by this process, for clusters.
+        """
+
+        self.wheel = TimingWheel(time.time(), tick, slots, levels)
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.owns = owns or (lambda server_id: True)
+        self.logger = logger or logging.getLogger("discord_bot")
+        self.handlers = {}
+        # (server ID, action ID) -> action.
+        self._actions = {}
+        # (server ID, action, target ID) -> action, a target has one pending action of each kind.
+        self._by_target = {}
+        self._queue = None
+        self._tasks = []
+        metrics.register_gauge("scheduler.pending", self.wheel.__len__)
+
+    def register(self, action: str, handler: Callable[[ScheduledAction], Awaitable[None]]) -> None:
+        """
+        Sets the function that runs an action.
+
+        :param action: The name of the action, for example `unban`.
+        :param handler: The coroutine function that runs it, it gets the scheduled action.
+        """
+
+        self.handlers[action] = handler
+
+    def get(self, server_id: int, action_id: int) -> Optional[ScheduledAction]:
+        return self._actions.get((server_id, action_id))
+
+    def pending(self, server_id: int, action: str, target_id: int) -> Optional[ScheduledAction]:
+        return self._by_target.get((server_id, action, target_id))
+
+    async def load(self, chunk_size: int = 1000) -> int:
+        """
+        Reads the pending actions from the database, in chunks.
+
+        :param chunk_size: The number of actions read per query.
+        :return: The number of actions that were loaded.
+        """
+
+        count = 0
+        async for chunk in db_manager.iter_scheduled_actions(chunk_size):
+            for action_id, server_id, action, target_id, due_at, payload in chunk:
+                if not self.owns(int(server_id)):
+                    continue
+                self._add(ScheduledAction(
+                    action_id, int(server_id), action, int(target_id), int(due_at),
+                    json.loads(payload) if payload else {},
+                ))
+                count += 1
+        return count
+
+    def start(self) -> None:
+        """
+        Starts running the actions when they are due, this must run on the loop of the bot.
+        """
+
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._tick()), asyncio.create_task(self._work())]
+
+    def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def schedule(self, server_id: int, action: str, target_id: int, delay: float,
+                       payload: Optional[dict] = None) -> ScheduledAction:
+        """
+        Schedules an action, replacing the pending action of the same kind for the same target.
+
+        :param server_id: The ID of the server the action is taken in.
+        :param action: The name of the action.
+        :param target_id: The ID of the user the action is taken against.
+        :param delay: In how many seconds the action runs.
+        :param payload: What the action needs to run, it must be serializable to JSON.
+        :return: The scheduled action.
+        """
+
+        previous = self.pending(server_id, action, target_id)
+        if previous is not None:
+            await self.cancel(previous)
+        due_at = int(time.time() + delay)
+        payload = payload or {}
+        action_id = await db_manager.add_scheduled_action(
+            server_id, action, target_id, due_at, json.dumps(payload)
+        )
+        scheduled = ScheduledAction(action_id, server_id, action, target_id, due_at, payload)
+        self._add(scheduled)
+        return scheduled
+
+    async def cancel(self, scheduled: ScheduledAction) -> None:
+        self._discard(scheduled)
+        await db_manager.remove_scheduled_action(scheduled.server_id, scheduled.action_id)
+
+    def _add(self, scheduled: ScheduledAction) -> None:
+        self.wheel.add(scheduled)
+        self._actions[scheduled.key] = scheduled
+        self._by_target[(scheduled.server_id, scheduled.action, scheduled.target_id)] = scheduled
+
+    def _discard(self, scheduled: ScheduledAction) -> None:
+        self.wheel.remove(scheduled)
+        self._actions.pop(scheduled.key, None)
+        key = (scheduled.server_id, scheduled.action, scheduled.target_id)
+        if self._by_target.get(key) is scheduled:
+            del self._by_target[key]
+
+    async def _tick(self) -> None:
+        while True:
+            for scheduled in self.wheel.advance(time.time()):
+                self._queue.put_nowait(scheduled)
+            await asyncio.sleep(self.wheel.tick)
+
+    async def _work(self) -> None:
+        while True:
+            scheduled = await self._queue.get()
+            await self._run(scheduled)
+
+    async def _run(self, scheduled: ScheduledAction) -> None:
+        if self._actions.get(scheduled.key) is not scheduled:
+            # Cancelled or replaced while it was waiting for the worker.
+            return
+        handler = self.handlers.get(scheduled.action)
+        if handler is None:
+            self.logger.warning("No handler for the scheduled action '%s'", scheduled.action)
+            self._discard(scheduled)
+            return
+
+        try:
+            await handler(scheduled)
+        except Exception:
+            scheduled.attempts += 1
+            if scheduled.attempts < self.max_attempts:
+                self.logger.exception(
+                    "Scheduled %s of %s failed, retrying in %ss",
+                    scheduled.action, scheduled.target_id, self.retry_delay,
+                )
+                metrics.increment("scheduler.retried")
+                scheduled.due_at = int(time.time() + self.retry_delay)
+                self.wheel.add(scheduled)
+                return
+            self.logger.exception(
+                "Scheduled %s of %s failed %s times, giving up",
+                scheduled.action, scheduled.target_id, scheduled.attempts,
+            )
+            metrics.increment("scheduler.failed")
+        else:
+            metrics.increment("scheduler.ran")
+
+        self._discard(scheduled)
+        try:
+            await db_manager.remove_scheduled_action(scheduled.server_id, scheduled.action_id)
+        except Exception:
+            # It runs again after a restart, the handlers tolerate that.
+            self.logger.exception("Could not delete the scheduled action %s", scheduled.action_id)
@@ -0,0 +1,163 @@
+import asyncio
+from collections import OrderedDict
+from typing import Optional
+
+from helpers import db_manager, metrics
+
+
+class GuildSettings:
+    __slots__ = ("prefix", "disabled_commands", "log_channel_id")
+
+    def __init__(self, prefix: str, disabled_commands: frozenset, log_channel_id: Optional[int]):
+        self.prefix = prefix
+        self.disabled_commands = disabled_commands
+        self.log_channel_id = log_channel_id
+
+
+class SettingsStore:
+    """
+    Caches the settings of the most recently used servers, so resolving the
+    prefix of a message does not hit the database. Servers without settings
+    are cached too, with the default settings.
+    """
+
+    def __init__(self, default_prefix: str, capacity: int = 10000):
+        self.default_prefix = default_prefix
+        self.capacity = capacity
+        self._cache = OrderedDict()
+        self._loading = {}
+        # Bumped on every change of a server's settings, a load that started before
+        # the change must not cache what it read.
+        self._generations = {}
+        self._locks = {}
+        metrics.register_gauge("settings.cached", lambda: len(self._cache))
+
+    def peek(self, guild_id: int) -> Optional[GuildSettings]:
+        """
+        Gets the settings of a server only if they are cached.
+
+        :param guild_id: The ID of the server.
+        :return: The settings, or None if they are not cached.
+        """
+
+        return self._cache.get(guild_id)
+
+    async def get(self, guild_id: int) -> GuildSettings:
+        """
+        Gets the settings of a server, loading them from the database on a cache miss.
+        Concurrent misses for the same server share a single query.
+
+        :param guild_id: The ID of the server.
+        :return: The settings of the server.
+        """
+
+        settings = self._cache.get(guild_id)
+        if settings is not None:
+            self._cache.move_to_end(guild_id)
+            metrics.increment("settings.hits")
+            return settings
+
+        metrics.increment("settings.misses")
+        loading = self._loading.get(guild_id)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(guild_id))
+            self._loading[guild_id] = loading
+            loading.add_done_callback(lambda _: self._forget_load(guild_id, loading))
+        return await asyncio.shield(loading)
+
+    def _forget_load(self, guild_id: int, loading: asyncio.Future) -> None:
+        if self._loading.get(guild_id) is loading:
+            del self._loading[guild_id]
+
+    async def _load(self, guild_id: int) -> GuildSettings:
+        generation = self._generations.get(guild_id, 0)
+        row = await db_manager.get_guild_settings(guild_id)
+        if self._generations.get(guild_id, 0) != generation:
+            # The settings changed while they were read, what was read may be outdated.
+            return self._parse(row)
+        return self._store(guild_id, row)
+
+    def _parse(self, row: Optional[tuple]) -> GuildSettings:
+        if row is None:
+            settings = GuildSettings(self.default_prefix, frozenset(), None)
+        else:
+            prefix, disabled_commands, log_channel_id = row
+            settings = GuildSettings(
+                prefix or self.default_prefix,
+                frozenset(disabled_commands.split()),
+                int(log_channel_id) if log_channel_id else None,
+            )
+        return settings
+
+    def _store(self, guild_id: int, row: Optional[tuple]) -> GuildSettings:
+        settings = self._parse(row)
+        self._cache[guild_id] = settings
+        if len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+        return settings
+
+    def cached_ids(self) -> list:
+        """
+        Gets the servers whose settings are cached, the least recently used first.
+
+        :return: The IDs of the servers.
+        """
+
+        return list(self._cache)
+
+    async def warm(self, guild_ids: list) -> None:
+        """
+        Loads the settings of many servers at once, so the first messages after
+        a restart don't all miss the cache.
+
+        :param guild_ids: The IDs of the servers, the least recently used first.
+        """
+
+        guild_ids = guild_ids[-self.capacity:]
+        rows = {int(row[0]): row[1:] for row in await db_manager.get_guilds_settings(guild_ids)}
+        for guild_id in guild_ids:
+            self._store(guild_id, rows.get(guild_id))
+
+    def invalidate(self, guild_id: int) -> None:
+        """
+        Drops the cached settings of a server, they are reloaded on the next access.
+
+        :param guild_id: The ID of the server.
+        """
+
+        self._cache.pop(guild_id, None)
+        self._generations[guild_id] = self._generations.get(guild_id, 0) + 1
+        # A load in flight may have read the old settings, the next access starts another one.
+        self._loading.pop(guild_id, None)
+
+    async def update(self, guild_id: int, **changes) -> GuildSettings:
+        """
+        Changes the settings of a server and invalidates the cached ones.
+        Changes of the same server are applied one at a time, so none of them is lost.
+
+        :param guild_id: The ID of the server.
+        :param changes: The new value of the settings that should change, or a function
+        computing it from the current value.
+        :return: The new settings of the server.
+        """
+
+        lock = self._locks.get(guild_id)
+        if lock is None:
+            lock = self._locks[guild_id] = asyncio.Lock()
+        async with lock:
+            current = await self.get(guild_id)
+            for name, change in changes.items():
+                if callable(change):
+                    changes[name] = change(getattr(current, name))
+            prefix = changes.get("prefix", current.prefix)
+            disabled_commands = changes.get("disabled_commands", current.disabled_commands)
+            log_channel_id = changes.get("log_channel_id", current.log_channel_id)
+
+            await db_manager.update_guild_settings(
+                guild_id,
+                None if prefix == self.default_prefix else prefix,
+                " ".join(sorted(disabled_commands)),
+                log_channel_id,
+            )
+            self.invalidate(guild_id)
+            return await self.get(guild_id)
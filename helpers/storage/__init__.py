@@ -0,0 +1,192 @@
+import abc
+import os
+import re
+
+
+class StorageBackend(abc.ABC):
+    """
+    The interface of the storage engines. Every method has the signature and returns
+    the same values as the function of the same name in `helpers.db_manager`, which
+    documents them, so the engines can be swapped without touching the callers.
+    IDs are returned as strings, and times as UNIX timestamps in strings, like SQLite does.
+    An engine that misses a method can't be created.
+    """
+
+    async def initialize(self) -> None:
+        """
+        Prepares the storage, this is called once before it is used.
+        """
+
+    @abc.abstractmethod
+    async def get_blacklisted_users(self) -> list:
+        ...
+
+    @abc.abstractmethod
+    async def is_blacklisted(self, user_id: int, server_id: int = None) -> bool:
+        ...
+
+    @abc.abstractmethod
+    async def add_user_to_blacklist(
+        self, user_id: int, server_id: int = None, expires_at: int = None
+    ) -> int:
+        ...
+
+    @abc.abstractmethod
+    async def remove_user_from_blacklist(self, user_id: int, server_id: int = None) -> int:
+        ...
+
+    @abc.abstractmethod
+    async def expire_blacklist(self, now: int) -> int:
+        ...
+
+    @abc.abstractmethod
+    async def add_warn(self, user_id: int, server_id: int, moderator_id: int, reason: str) -> int:
+        ...
+
+    @abc.abstractmethod
+    async def remove_warn(self, warn_id: int, user_id: int, server_id: int) -> int:
+        ...
+
+    @abc.abstractmethod
+    async def get_warnings(self, user_id: int, server_id: int) -> list:
+        ...
+
+    @abc.abstractmethod
+    async def get_warn_leaderboard(self, server_id: int, limit: int = 10) -> list:
+        ...
+
+    @abc.abstractmethod
+    async def get_warn_stats(self, server_id: int, user_id: int = None):
+        ...
+
+    @abc.abstractmethod
+    async def get_guild_settings(self, server_id: int):
+        ...
+
+    @abc.abstractmethod
+    async def get_guilds_settings(self, server_ids: list) -> list:
+        ...
+
+    @abc.abstractmethod
+    async def update_guild_settings(
+        self, server_id: int, prefix, disabled_commands: str, log_channel_id
+    ) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def get_warn_expiry_policies(self) -> list:
+        ...
+
+    @abc.abstractmethod
+    async def get_warn_expiry_policy(self, server_id: int):
+        ...
+
+    @abc.abstractmethod
+    async def set_warn_expiry_policy(
+        self, server_id: int, expire_after, action: str = "delete"
+    ) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def expire_warns(
+        self, server_id: int, expire_after: int, archive: bool, limit: int
+    ) -> int:
+        ...
+
+    @abc.abstractmethod
+    async def compact(self, pages: int) -> int:
+        ...
+
+    @abc.abstractmethod
+    async def add_cases(self, cases: list) -> None:
+        ...
+
+    @abc.abstractmethod
+    def iter_cases(self, server_id: int, chunk_size: int = 1000):
+        ...
+
+    @abc.abstractmethod
+    async def search_warns(
+        self, server_id: int, query: str, user_id: int = None, limit: int = 10, offset: int = 0
+    ) -> tuple:
+        ...
+
+    @abc.abstractmethod
+    async def search_cases(
+        self, server_id: int, query: str, limit: int = 10, offset: int = 0
+    ) -> tuple:
+        ...
+
+    @abc.abstractmethod
+    async def add_scheduled_action(
+        self, server_id: int, action: str, target_id: int, due_at: int, payload: str
+    ) -> int:
+        ...
+
+    @abc.abstractmethod
+    async def remove_scheduled_action(self, server_id: int, action_id: int) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def get_scheduled_actions(self, server_id: int, limit: int = 25) -> list:
+        ...
+
+    @abc.abstractmethod
+    def iter_scheduled_actions(self, chunk_size: int = 1000):
+        ...
+
+
+def search_terms(query: str) -> list:
+    """
+    This function will split a search query into words, the way the full-text index
+    splits the text it indexes. A trailing `*` is kept to search by prefix.
+
+    :param query: The search query.
+    :return: The lowercase words of the query.
+    """
+
+    return [match.group(0) for match in re.finditer(r"\w+\*?", query.lower())]
+
+
+def partitions_directory(config: dict, database_path: str) -> str:
+    """
+    This function will return the directory of the partitioned engine's files, it is
+    relative to the directory of the SQLite database.
+
+    :param config: The "storage" section of the config.
+    :param database_path: The path of the SQLite database.
+    :return: The path of the directory.
+    """
+
+    return os.path.join(os.path.dirname(database_path), config.get("directory", "partitions"))
+
+
+def create_backend(config: dict, database_path: str, schema_path: str = None) -> StorageBackend:
+    """
+    This function will create the storage engine selected in the "storage" section of the config.
+
+    :param config: The "storage" section of the config.
+    :param database_path: The path of the SQLite database.
+    :param schema_path: The path of the SQL schema applied to the SQLite database on startup.
+    :return: The storage engine.
+    """
+
+    engine = config.get("engine", "sqlite")
+    if engine == "sqlite":
+        from helpers.storage.sqlite import SQLiteBackend
+
+        return SQLiteBackend(database_path, schema_path)
+    if engine == "memory":
+        from helpers.storage.memory import MemoryBackend
+
+        return MemoryBackend()
+    if engine == "partitioned":
+        from helpers.storage.partitioned import PartitionedBackend
+
+        return PartitionedBackend(
+            database_path,
+            schema_path,
+            partitions_directory(config, database_path),
+            config.get("partitions", 4),
+        )
+    raise ValueError(f"Unknown storage engine '{engine}'.")
@@ -0,0 +1,313 @@
+import bisect
+import time
+from itertools import count
+
+from helpers.storage import StorageBackend, search_terms
+
+
+def _key(value) -> str:
+    # SQLite stores the IDs in varchar columns, they are compared and returned as strings.
+    return str(value)
+
+
+def _rank(terms: list, text) -> float:
+    """
+    Scores a text against the words of a query, 0 if any word is missing.
+    Like bm25, more occurrences and shorter texts rank higher.
+    """
+
+    words = [word.rstrip("*") for word in search_terms(text or "")]
+    score = 0
+    for term in terms:
+        if term.endswith("*"):
+            occurrences = sum(word.startswith(term[:-1]) for word in words)
+        else:
+            occurrences = words.count(term)
+        if not occurrences:
+            return 0
+        score += occurrences
+    return score / len(words)
+
+
+class ServerWarns:
+    """
+    The warnings of a server, with the indexes the queries need: the warnings of every
+    user in ID order, every warning in creation order and the users sorted by warning count.
+    """
+
+    __slots__ = ("by_user", "by_time", "stats", "leaderboard")
+
+    def __init__(self):
+        # user ID -> [(ID, moderator ID, reason, created at)], sorted by ID.
+        self.by_user = {}
+        # [(created at, user ID, ID)], sorted.
+        self.by_time = []
+        # user ID -> (count, last warned at).
+        self.stats = {}
+        # [(-count, -last warned at, user ID)], sorted.
+        self.leaderboard = []
+
+    def _set_stats(self, user_id: str) -> None:
+        old = self.stats.pop(user_id, None)
+        if old is not None:
+            del self.leaderboard[bisect.bisect_left(self.leaderboard, (-old[0], -old[1], user_id))]
+        warns = self.by_user.get(user_id)
+        if warns:
+            new = (len(warns), max(warn[3] for warn in warns))
+            self.stats[user_id] = new
+            bisect.insort(self.leaderboard, (-new[0], -new[1], user_id))
+
+    def add(self, user_id: str, warn: tuple) -> None:
+        self.by_user.setdefault(user_id, []).append(warn)
+        bisect.insort(self.by_time, (warn[3], user_id, warn[0]))
+        self._set_stats(user_id)
+
+    def remove(self, user_id: str, warn_id: int):
+        warns = self.by_user.get(user_id, [])
+        index = bisect.bisect_left(warns, warn_id, key=lambda warn: warn[0])
+        if index == len(warns) or warns[index][0] != warn_id:
+            return None
+        warn = warns.pop(index)
+        if not warns:
+            del self.by_user[user_id]
+        del self.by_time[bisect.bisect_left(self.by_time, (warn[3], user_id, warn_id))]
+        self._set_stats(user_id)
+        return warn
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Keeps everything in dictionaries and sorted lists, nothing is persisted.
+    It runs the same queries as the SQLite engine at memory speed, for benchmarks and tests.
+    """
+
+    def __init__(self):
+        # (user ID, server ID or None) -> (blacklisted at, expires at or None).
+        self.blacklist = {}
+        # server ID -> ServerWarns.
+        self.warns = {}
+        self.warns_archive = []
+        # server ID -> (prefix, disabled commands, log channel ID).
+        self.guild_settings = {}
+        # server ID -> (expire after, action).
+        self.expiry_policies = {}
+        # server ID -> [(ID, action, actor ID, target ID, reason, created at)], sorted by ID.
+        self.cases = {}
+        self._case_ids = count(1)
+        # ID -> (server ID, action, target ID, due at, payload).
+        self.scheduled_actions = {}
+        self._scheduled_action_ids = count(1)
+
+    async def get_blacklisted_users(self) -> list:
+        return [
+            (user_id, str(created_at), server_id, expires_at)
+            for (user_id, server_id), (created_at, expires_at) in self.blacklist.items()
+        ]
+
+    async def is_blacklisted(self, user_id: int, server_id: int = None) -> bool:
+        scopes = [None] if server_id is None else [None, _key(server_id)]
+        for scope in scopes:
+            entry = self.blacklist.get((_key(user_id), scope))
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                return True
+        return False
+
+    async def add_user_to_blacklist(
+        self, user_id: int, server_id: int = None, expires_at: int = None
+    ) -> int:
+        key = (_key(user_id), _key(server_id) if server_id is not None else None)
+        self.blacklist[key] = (int(time.time()), expires_at)
+        return len(self.blacklist)
+
+    async def remove_user_from_blacklist(self, user_id: int, server_id: int = None) -> int:
+        key = (_key(user_id), _key(server_id) if server_id is not None else None)
+        self.blacklist.pop(key, None)
+        return len(self.blacklist)
+
+    async def expire_blacklist(self, now: int) -> int:
+        expired = [
+            key for key, (_, expires_at) in self.blacklist.items()
+            if expires_at is not None and expires_at <= now
+        ]
+        for key in expired:
+            del self.blacklist[key]
+        return len(expired)
+
+    async def add_warn(self, user_id: int, server_id: int, moderator_id: int, reason: str) -> int:
+        server = self.warns.setdefault(_key(server_id), ServerWarns())
+        warns = server.by_user.get(_key(user_id))
+        warn_id = warns[-1][0] + 1 if warns else 1
+        server.add(_key(user_id), (warn_id, _key(moderator_id), reason, int(time.time())))
+        return warn_id
+
+    async def remove_warn(self, warn_id: int, user_id: int, server_id: int) -> int:
+        server = self.warns.get(_key(server_id))
+        if server is None:
+            return 0
+        server.remove(_key(user_id), warn_id)
+        return server.stats.get(_key(user_id), (0,))[0]
+
+    async def get_warnings(self, user_id: int, server_id: int) -> list:
+        server = self.warns.get(_key(server_id))
+        if server is None:
+            return []
+        return [
+            (_key(user_id), _key(server_id), moderator_id, reason, str(created_at), warn_id)
+            for warn_id, moderator_id, reason, created_at in server.by_user.get(_key(user_id), [])
+        ]
+
+    async def get_warn_leaderboard(self, server_id: int, limit: int = 10) -> list:
+        server = self.warns.get(_key(server_id))
+        if server is None:
+            return []
+        return [
+            (user_id, -negative_count, str(-negative_last))
+            for negative_count, negative_last, user_id in server.leaderboard[:limit]
+        ]
+
+    async def get_warn_stats(self, server_id: int, user_id: int = None):
+        server = self.warns.get(_key(server_id))
+        if server is None or not server.by_time:
+            return None
+        if user_id is None:
+            return len(server.by_time), len(server.stats), str(server.by_time[-1][0])
+        stats = server.stats.get(_key(user_id))
+        return (stats[0], 1, str(stats[1])) if stats is not None else None
+
+    async def get_guild_settings(self, server_id: int):
+        return self.guild_settings.get(_key(server_id))
+
+    async def get_guilds_settings(self, server_ids: list) -> list:
+        return [
+            (_key(server_id), *self.guild_settings[_key(server_id)])
+            for server_id in server_ids
+            if _key(server_id) in self.guild_settings
+        ]
+
+    async def update_guild_settings(
+        self, server_id: int, prefix, disabled_commands: str, log_channel_id
+    ) -> None:
+        self.guild_settings[_key(server_id)] = (
+            prefix,
+            disabled_commands,
+            _key(log_channel_id) if log_channel_id is not None else None,
+        )
+
+    async def get_warn_expiry_policies(self) -> list:
+        return [(server_id, *policy) for server_id, policy in self.expiry_policies.items()]
+
+    async def get_warn_expiry_policy(self, server_id: int):
+        return self.expiry_policies.get(_key(server_id))
+
+    async def set_warn_expiry_policy(
+        self, server_id: int, expire_after, action: str = "delete"
+    ) -> None:
+        if expire_after is None:
+            self.expiry_policies.pop(_key(server_id), None)
+        else:
+            self.expiry_policies[_key(server_id)] = (expire_after, action)
+
+    async def expire_warns(
+        self, server_id: int, expire_after: int, archive: bool, limit: int
+    ) -> int:
+        server = self.warns.get(_key(server_id))
+        if server is None:
+            return 0
+        cutoff = int(time.time()) - expire_after
+        expired = server.by_time[:bisect.bisect_left(server.by_time, (cutoff,))][:limit]
+        for _, user_id, warn_id in expired:
+            warn_id, moderator_id, reason, created_at = server.remove(user_id, warn_id)
+            if archive:
+                self.warns_archive.append(
+                    (warn_id, user_id, _key(server_id), moderator_id, reason, created_at)
+                )
+        return len(expired)
+
+    async def compact(self, pages: int) -> int:
+        return 0
+
+    async def add_cases(self, cases: list) -> None:
+        for server_id, action, actor_id, target_id, reason, created_at in cases:
+            self.cases.setdefault(_key(server_id), []).append((
+                next(self._case_ids),
+                action,
+                _key(actor_id),
+                _key(target_id) if target_id is not None else None,
+                reason,
+                created_at,
+            ))
+
+    async def iter_cases(self, server_id: int, chunk_size: int = 1000):
+        cases = self.cases.get(_key(server_id), [])
+        last_id = 0
+        while True:
+            # Keyset pagination like the SQLite engine, cases added meanwhile are picked up.
+            start = bisect.bisect_right(cases, last_id, key=lambda case: case[0])
+            chunk = cases[start:start + chunk_size]
+            if not chunk:
+                return
+            yield chunk
+            last_id = chunk[-1][0]
+
+    async def search_warns(
+        self, server_id: int, query: str, user_id: int = None, limit: int = 10, offset: int = 0
+    ) -> tuple:
+        terms = search_terms(query)
+        server = self.warns.get(_key(server_id))
+        if not terms or server is None:
+            return 0, []
+        users = [_key(user_id)] if user_id is not None else list(server.by_user)
+        matches = sorted(
+            (-score, user, warn)
+            for user in users
+            for warn in server.by_user.get(user, [])
+            if (score := _rank(terms, warn[2]))
+        )
+        page = matches[offset:offset + limit]
+        return len(matches), [
+            (user, moderator_id, reason, str(created_at), warn_id)
+            for _, user, (warn_id, moderator_id, reason, created_at) in page
+        ]
+
+    async def search_cases(
+        self, server_id: int, query: str, limit: int = 10, offset: int = 0
+    ) -> tuple:
+        terms = search_terms(query)
+        if not terms:
+            return 0, []
+        matches = sorted(
+            ((-score, case) for case in self.cases.get(_key(server_id), [])
+             if (score := _rank(terms, case[4]))),
+            key=lambda match: (match[0], match[1][0]),
+        )
+        return len(matches), [case for _, case in matches[offset:offset + limit]]
+
+    async def add_scheduled_action(
+        self, server_id: int, action: str, target_id: int, due_at: int, payload: str
+    ) -> int:
+        action_id = next(self._scheduled_action_ids)
+        self.scheduled_actions[action_id] = (
+            _key(server_id), action, _key(target_id), due_at, payload
+        )
+        return action_id
+
+    async def remove_scheduled_action(self, server_id: int, action_id: int) -> None:
+        scheduled = self.scheduled_actions.get(action_id)
+        if scheduled is not None and scheduled[0] == _key(server_id):
+            del self.scheduled_actions[action_id]
+
+    async def get_scheduled_actions(self, server_id: int, limit: int = 25) -> list:
+        return sorted(
+            (
+                (action_id, action, target_id, due_at, payload)
+                for action_id, (scheduled_server_id, action, target_id, due_at, payload)
+                in self.scheduled_actions.items()
+                if scheduled_server_id == _key(server_id)
+            ),
+            key=lambda row: row[3],
+        )[:limit]
+
+    async def iter_scheduled_actions(self, chunk_size: int = 1000):
+        rows = [(action_id, *scheduled) for action_id, scheduled in self.scheduled_actions.items()]
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start:start + chunk_size]
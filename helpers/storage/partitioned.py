@@ -0,0 +1,228 @@
+import asyncio
+import json
+import os
+import zlib
+from collections import defaultdict
+
+from helpers.storage import StorageBackend
+from helpers.storage.sqlite import SQLiteBackend
+
+BUCKETS = 64
+MAP_FILE = "partitions.json"
+
+
+def bucket_of(server_id) -> int:
+    """
+    This function will return the bucket of a server. Servers are hashed into a fixed number
+    of buckets, and buckets are assigned to partitions, so partitions can be added by moving
+    whole buckets.
+
+    :param server_id: The ID of the server.
+    :return: The bucket of the server.
+    """
+
+    return zlib.crc32(str(server_id).encode("ascii")) % BUCKETS
+
+
+def partition_path(directory: str, partition: int) -> str:
+    return os.path.join(directory, f"partition-{partition}.database")
+
+
+def load_map(directory: str, partitions: int) -> list:
+    """
+    This function will load which partition every bucket is stored in, creating
+    an even assignment over the given number of partitions if there is none yet.
+
+    :param directory: The directory of the partitions.
+    :param partitions: The number of partitions of a new assignment.
+    :return: The partition of every bucket.
+    """
+
+    path = os.path.join(directory, MAP_FILE)
+    if os.path.isfile(path):
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)["buckets"]
+    assignment = [bucket % partitions for bucket in range(BUCKETS)]
+    save_map(directory, assignment)
+    return assignment
+
+
+def save_map(directory: str, assignment: list) -> None:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, MAP_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump({"buckets": assignment}, file)
+    # The assignment is replaced atomically, it is never seen half written.
+    os.replace(f"{path}.tmp", path)
+
+
+class PartitionedBackend(StorageBackend):
+    """
+    Spreads the data of the servers over several SQLite files, so writes to different
+    partitions don't contend on a single write lock. Each partition has one writer at
+    a time. The blacklist stays in the main database, it is checked for every server.
+    """
+
+    def __init__(self, database_path: str, schema_path: str, directory: str, partitions: int):
+        self.global_backend = SQLiteBackend(database_path, schema_path)
+        self.schema_path = schema_path
+        self.directory = directory
+        self.partitions = partitions
+        self.assignment = []
+        self.backends = []
+        self.writers = []
+
+    async def initialize(self) -> None:
+        self.assignment = load_map(self.directory, self.partitions)
+        count = max(self.assignment) + 1
+        self.backends = [
+            SQLiteBackend(partition_path(self.directory, partition), self.schema_path)
+            for partition in range(count)
+        ]
+        self.writers = [asyncio.Lock() for _ in range(count)]
+        await self.global_backend.initialize()
+        for backend in self.backends:
+            await backend.initialize()
+
+        # The servers' data written while the engine was not partitioned would be hidden.
+        from helpers.partitions import import_unpartitioned
+
+        await asyncio.to_thread(
+            import_unpartitioned, self.global_backend.path, self.directory, self.assignment
+        )
+
+    def partition_of(self, server_id) -> int:
+        return self.assignment[bucket_of(server_id)]
+
+    def _backend(self, server_id) -> SQLiteBackend:
+        return self.backends[self.partition_of(server_id)]
+
+    def _writer(self, server_id) -> asyncio.Lock:
+        return self.writers[self.partition_of(server_id)]
+
+    async def get_blacklisted_users(self) -> list:
+        return await self.global_backend.get_blacklisted_users()
+
+    async def is_blacklisted(self, user_id: int, server_id: int = None) -> bool:
+        return await self.global_backend.is_blacklisted(user_id, server_id)
+
+    async def add_user_to_blacklist(
+        self, user_id: int, server_id: int = None, expires_at: int = None
+    ) -> int:
+        return await self.global_backend.add_user_to_blacklist(user_id, server_id, expires_at)
+
+    async def remove_user_from_blacklist(self, user_id: int, server_id: int = None) -> int:
+        return await self.global_backend.remove_user_from_blacklist(user_id, server_id)
+
+    async def expire_blacklist(self, now: int) -> int:
+        return await self.global_backend.expire_blacklist(now)
+
+    async def add_warn(self, user_id: int, server_id: int, moderator_id: int, reason: str) -> int:
+        async with self._writer(server_id):
+            return await self._backend(server_id).add_warn(user_id, server_id, moderator_id, reason)
+
+    async def remove_warn(self, warn_id: int, user_id: int, server_id: int) -> int:
+        async with self._writer(server_id):
+            return await self._backend(server_id).remove_warn(warn_id, user_id, server_id)
+
+    async def get_warnings(self, user_id: int, server_id: int) -> list:
+        return await self._backend(server_id).get_warnings(user_id, server_id)
+
+    async def get_warn_leaderboard(self, server_id: int, limit: int = 10) -> list:
+        return await self._backend(server_id).get_warn_leaderboard(server_id, limit)
+
+    async def get_warn_stats(self, server_id: int, user_id: int = None):
+        return await self._backend(server_id).get_warn_stats(server_id, user_id)
+
+    async def get_guild_settings(self, server_id: int):
+        return await self._backend(server_id).get_guild_settings(server_id)
+
+    async def get_guilds_settings(self, server_ids: list) -> list:
+        by_partition = defaultdict(list)
+        for server_id in server_ids:
+            by_partition[self.partition_of(server_id)].append(server_id)
+        result = []
+        for partition, ids in by_partition.items():
+            result.extend(await self.backends[partition].get_guilds_settings(ids))
+        return result
+
+    async def update_guild_settings(
+        self, server_id: int, prefix, disabled_commands: str, log_channel_id
+    ) -> None:
+        async with self._writer(server_id):
+            await self._backend(server_id).update_guild_settings(
+                server_id, prefix, disabled_commands, log_channel_id
+            )
+
+    async def get_warn_expiry_policies(self) -> list:
+        result = []
+        for backend in self.backends:
+            result.extend(await backend.get_warn_expiry_policies())
+        return result
+
+    async def get_warn_expiry_policy(self, server_id: int):
+        return await self._backend(server_id).get_warn_expiry_policy(server_id)
+
+    async def set_warn_expiry_policy(
+        self, server_id: int, expire_after, action: str = "delete"
+    ) -> None:
+        async with self._writer(server_id):
+            await self._backend(server_id).set_warn_expiry_policy(server_id, expire_after, action)
+
+    async def expire_warns(
+        self, server_id: int, expire_after: int, archive: bool, limit: int
+    ) -> int:
+        async with self._writer(server_id):
+            return await self._backend(server_id).expire_warns(
+                server_id, expire_after, archive, limit
+            )
+
+    async def compact(self, pages: int) -> int:
+        free_pages = await self.global_backend.compact(pages)
+        for backend, writer in zip(self.backends, self.writers):
+            async with writer:
+                free_pages += await backend.compact(pages)
+        return free_pages
+
+    async def add_cases(self, cases: list) -> None:
+        by_partition = defaultdict(list)
+        for case in cases:
+            by_partition[self.partition_of(case[0])].append(case)
+        for partition, batch in by_partition.items():
+            async with self.writers[partition]:
+                await self.backends[partition].add_cases(batch)
+
+    def iter_cases(self, server_id: int, chunk_size: int = 1000):
+        return self._backend(server_id).iter_cases(server_id, chunk_size)
+
+    async def search_warns(
+        self, server_id: int, query: str, user_id: int = None, limit: int = 10, offset: int = 0
+    ) -> tuple:
+        return await self._backend(server_id).search_warns(
+            server_id, query, user_id, limit, offset
+        )
+
+    async def search_cases(
+        self, server_id: int, query: str, limit: int = 10, offset: int = 0
+    ) -> tuple:
+        return await self._backend(server_id).search_cases(server_id, query, limit, offset)
+
+    async def add_scheduled_action(
+        self, server_id: int, action: str, target_id: int, due_at: int, payload: str
+    ) -> int:
+        async with self._writer(server_id):
+            return await self._backend(server_id).add_scheduled_action(
+                server_id, action, target_id, due_at, payload
+            )
+
+    async def remove_scheduled_action(self, server_id: int, action_id: int) -> None:
+        async with self._writer(server_id):
+            await self._backend(server_id).remove_scheduled_action(server_id, action_id)
+
+    async def get_scheduled_actions(self, server_id: int, limit: int = 25) -> list:
+        return await self._backend(server_id).get_scheduled_actions(server_id, limit)
+
+    async def iter_scheduled_actions(self, chunk_size: int = 1000):
+        for backend in self.backends:
+            async for chunk in backend.iter_scheduled_actions(chunk_size):
+                yield chunk
@@ -0,0 +1,481 @@
+import aiosqlite
+
+from helpers.storage import StorageBackend, search_terms
+
+
+def match_expression(query: str, **columns) -> str:
+    """
+    This function will turn a search query into an FTS5 expression. Every word must match,
+    a word ending with `*` matches as a prefix, and the rest of the FTS5 syntax is escaped.
+
+    :param query: The search query.
+    :param columns: The values the indexed columns must have, for example the server ID.
+    :return: The expression, or an empty string if the query has no words.
+    """
+
+    terms = search_terms(query)
+    if not terms:
+        return ""
+    phrases = [
+        f'"{term.rstrip("*")}"*' if term.endswith("*") else f'"{term}"' for term in terms
+    ]
+    filters = [
+        f'{column}:"{value}"' for column, value in columns.items() if value is not None
+    ]
+    return " AND ".join(filters + [f"({' '.join(phrases)})"])
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Stores everything in a single SQLite database, every operation opens its own connection.
+    """
+
+    def __init__(self, path: str, schema_path: str = None):
+        self.path = path
+        self.schema_path = schema_path
+
+    async def initialize(self) -> None:
+        if self.schema_path is None:
+            return
+        async with aiosqlite.connect(self.path) as database:
+            async with database.execute("PRAGMA table_info(blacklist)") as cursor:
+                columns = {row[1] for row in await cursor.fetchall()}
+            if columns and "server_id" not in columns:
+                # The blacklist could not be scoped to a server or expire before.
+                await database.execute(
+                    "ALTER TABLE blacklist ADD COLUMN server_id varchar(20) DEFAULT NULL"
+                )
+                await database.execute(
+                    "ALTER TABLE blacklist ADD COLUMN expires_at int(11) DEFAULT NULL"
+                )
+            with open(self.schema_path, encoding="utf-8") as sqlite_file:
+                await database.executescript(sqlite_file.read())
+            await database.commit()
+
+            async with database.execute("PRAGMA auto_vacuum") as cursor:
+                auto_vacuum = (await cursor.fetchone())[0]
+            if auto_vacuum != 2:
+                # Existing databases have to be rebuilt once to free pages incrementally.
+                await database.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                await database.execute("VACUUM")
+                # VACUUM may renumber the rows of the warnings, the index refers to them by rowid.
+                await database.execute("INSERT INTO warns_fts(warns_fts) VALUES ('rebuild')")
+                await database.commit()
+
+    async def get_blacklisted_users(self) -> list:
+        async with aiosqlite.connect(self.path) as database:
+            async with database.execute(
+                "SELECT user_id, strftime('%s', created_at), server_id, expires_at FROM blacklist"
+            ) as cursor:
+                result = await cursor.fetchall()
+                return result
+
+    async def is_blacklisted(self, user_id: int, server_id: int = None) -> bool:
+        async with aiosqlite.connect(self.path) as database:
+            async with database.execute(
+                "SELECT * FROM blacklist WHERE user_id=? AND (server_id IS NULL OR server_id=?) \
+                    AND (expires_at IS NULL OR expires_at > strftime('%s', 'now'))",
+                (
+                    user_id,
+                    server_id,
+                ),
+            ) as cursor:
+                result = await cursor.fetchone()
+                return result is not None
+
+    async def add_user_to_blacklist(
+        self, user_id: int, server_id: int = None, expires_at: int = None
+    ) -> int:
+        async with aiosqlite.connect(self.path) as database:
+            await database.execute(
+                "DELETE FROM blacklist WHERE user_id=? AND server_id IS ?", (user_id, server_id)
+            )
+            await database.execute(
+                "INSERT INTO blacklist(user_id, server_id, expires_at) VALUES (?, ?, ?)",
+                (
+                    user_id,
+                    server_id,
+                    expires_at,
+                ),
+            )
+            await database.commit()
+            rows = await database.execute("SELECT COUNT(*) FROM blacklist")
+            async with rows as cursor:
+                result = await cursor.fetchone()
+                return result[0] if result is not None else 0
+
+    async def remove_user_from_blacklist(self, user_id: int, server_id: int = None) -> int:
+        async with aiosqlite.connect(self.path) as database:
+            await database.execute(
+                "DELETE FROM blacklist WHERE user_id=? AND server_id IS ?", (user_id, server_id)
+            )
+            await database.commit()
+            rows = await database.execute("SELECT COUNT(*) FROM blacklist")
+            async with rows as cursor:
+                result = await cursor.fetchone()
+                return result[0] if result is not None else 0
+
+    async def expire_blacklist(self, now: int) -> int:
+        async with aiosqlite.connect(self.path) as database:
+            cursor = await database.execute(
+                "DELETE FROM blacklist WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            )
+            await database.commit()
+            return cursor.rowcount
+
+    async def add_warn(self, user_id: int, server_id: int, moderator_id: int, reason: str) -> int:
+        async with aiosqlite.connect(self.path) as database:
+            rows = await database.execute(
+                "SELECT id FROM warns WHERE user_id=? AND server_id=? ORDER BY id DESC LIMIT 1",
+                (
+                    user_id,
+                    server_id,
+                ),
+            )
+            async with rows as cursor:
+                result = await cursor.fetchone()
+                warn_id = result[0] + 1 if result is not None else 1
+                await database.execute(
+                    "INSERT INTO warns(id, user_id, server_id, moderator_id, reason) \
+                    VALUES (?, ?, ?, ?, ?)",
+                    (
+                        warn_id,
+                        user_id,
+                        server_id,
+                        moderator_id,
+                        reason,
+                    ),
+                )
+                await database.commit()
+                return warn_id
+
+    async def remove_warn(self, warn_id: int, user_id: int, server_id: int) -> int:
+        async with aiosqlite.connect(self.path) as database:
+            await database.execute(
+                "DELETE FROM warns WHERE id=? AND user_id=? AND server_id=?",
+                (
+                    warn_id,
+                    user_id,
+                    server_id,
+                ),
+            )
+            await database.commit()
+            rows = await database.execute(
+                "SELECT warn_count FROM warn_stats WHERE user_id=? AND server_id=?",
+                (
+                    user_id,
+                    server_id,
+                ),
+            )
+            async with rows as cursor:
+                result = await cursor.fetchone()
+                return result[0] if result is not None else 0
+
+    async def get_warnings(self, user_id: int, server_id: int) -> list:
+        async with aiosqlite.connect(self.path) as database:
+            rows = await database.execute(
+                "SELECT user_id, server_id, moderator_id, reason, strftime('%s', created_at), \
+                    id FROM warns WHERE user_id=? AND server_id=?",
+                (
+                    user_id,
+                    server_id,
+                ),
+            )
+            async with rows as cursor:
+                result = await cursor.fetchall()
+                result_list = []
+                for row in result:
+                    result_list.append(row)
+                return result_list
+
+    async def get_warn_leaderboard(self, server_id: int, limit: int = 10) -> list:
+        async with aiosqlite.connect(self.path) as database:
+            rows = await database.execute(
+                "SELECT user_id, warn_count, strftime('%s', last_warned_at) FROM warn_stats \
+                    WHERE server_id=? ORDER BY warn_count DESC, last_warned_at DESC LIMIT ?",
+                (
+                    server_id,
+                    limit,
+                ),
+            )
+            async with rows as cursor:
+                return await cursor.fetchall()
+
+    async def get_warn_stats(self, server_id: int, user_id: int = None):
+        async with aiosqlite.connect(self.path) as database:
+            if user_id is None:
+                rows = await database.execute(
+                    "SELECT warn_count, warned_users, strftime('%s', last_warned_at) \
+                        FROM warn_guild_stats WHERE server_id=?",
+                    (server_id,),
+                )
+            else:
+                rows = await database.execute(
+                    "SELECT warn_count, 1, strftime('%s', last_warned_at) FROM warn_stats \
+                        WHERE server_id=? AND user_id=?",
+                    (
+                        server_id,
+                        user_id,
+                    ),
+                )
+            async with rows as cursor:
+                return await cursor.fetchone()
+
+    async def get_guild_settings(self, server_id: int):
+        async with aiosqlite.connect(self.path) as database:
+            rows = await database.execute(
+                "SELECT prefix, disabled_commands, log_channel_id FROM guild_settings \
+                    WHERE server_id=?",
+                (server_id,),
+            )
+            async with rows as cursor:
+                return await cursor.fetchone()
+
+    async def get_guilds_settings(self, server_ids: list) -> list:
+        result = []
+        async with aiosqlite.connect(self.path) as database:
+            # SQLite limits the number of parameters of a query.
+            for start in range(0, len(server_ids), 500):
+                chunk = server_ids[start:start + 500]
+                rows = await database.execute(
+                    f"SELECT server_id, prefix, disabled_commands, log_channel_id \
+                        FROM guild_settings WHERE server_id IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+                async with rows as cursor:
+                    result.extend(await cursor.fetchall())
+        return result
+
+    async def update_guild_settings(
+        self, server_id: int, prefix, disabled_commands: str, log_channel_id
+    ) -> None:
+        async with aiosqlite.connect(self.path) as database:
+            await database.execute(
+                "INSERT INTO guild_settings(server_id, prefix, disabled_commands, log_channel_id) \
+                    VALUES (?, ?, ?, ?) ON CONFLICT(server_id) DO UPDATE SET \
+                    prefix=excluded.prefix, disabled_commands=excluded.disabled_commands, \
+                    log_channel_id=excluded.log_channel_id, updated_at=CURRENT_TIMESTAMP",
+                (
+                    server_id,
+                    prefix,
+                    disabled_commands,
+                    log_channel_id,
+                ),
+            )
+            await database.commit()
+
+    async def get_warn_expiry_policies(self) -> list:
+        async with aiosqlite.connect(self.path) as database:
+            rows = await database.execute(
+                "SELECT server_id, expire_after, action FROM warn_expiry_policies"
+            )
+            async with rows as cursor:
+                return await cursor.fetchall()
+
+    async def get_warn_expiry_policy(self, server_id: int):
+        async with aiosqlite.connect(self.path) as database:
+            rows = await database.execute(
+                "SELECT expire_after, action FROM warn_expiry_policies WHERE server_id=?",
+                (server_id,),
+            )
+            async with rows as cursor:
+                return await cursor.fetchone()
+
+    async def set_warn_expiry_policy(
+        self, server_id: int, expire_after, action: str = "delete"
+    ) -> None:
+        async with aiosqlite.connect(self.path) as database:
+            if expire_after is None:
+                await database.execute(
+                    "DELETE FROM warn_expiry_policies WHERE server_id=?", (server_id,)
+                )
+            else:
+                await database.execute(
+                    "INSERT INTO warn_expiry_policies(server_id, expire_after, action) \
+                        VALUES (?, ?, ?) ON CONFLICT(server_id) DO UPDATE SET \
+                        expire_after=excluded.expire_after, action=excluded.action, \
+                        updated_at=CURRENT_TIMESTAMP",
+                    (
+                        server_id,
+                        expire_after,
+                        action,
+                    ),
+                )
+            await database.commit()
+
+    async def expire_warns(
+        self, server_id: int, expire_after: int, archive: bool, limit: int
+    ) -> int:
+        async with aiosqlite.connect(self.path) as database:
+            rows = await database.execute(
+                "SELECT rowid FROM warns WHERE server_id=? AND created_at < datetime('now', ?) \
+                    ORDER BY created_at LIMIT ?",
+                (
+                    server_id,
+                    f"-{expire_after} seconds",
+                    limit,
+                ),
+            )
+            async with rows as cursor:
+                rowids = [row[0] for row in await cursor.fetchall()]
+            if not rowids:
+                return 0
+
+            placeholders = ", ".join("?" * len(rowids))
+            if archive:
+                await database.execute(
+                    f"INSERT INTO warns_archive(id, user_id, server_id, moderator_id, reason, \
+                        created_at) SELECT id, user_id, server_id, moderator_id, reason, \
+                        created_at FROM warns WHERE rowid IN ({placeholders})",
+                    rowids,
+                )
+            await database.execute(f"DELETE FROM warns WHERE rowid IN ({placeholders})", rowids)
+            await database.commit()
+            return len(rowids)
+
+    async def compact(self, pages: int) -> int:
+        async with aiosqlite.connect(self.path) as database:
+            # The pragma frees one page per step, and execute() only takes the first step.
+            await database.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+            rows = await database.execute("PRAGMA freelist_count")
+            async with rows as cursor:
+                result = await cursor.fetchone()
+                return result[0] if result is not None else 0
+
+    async def add_cases(self, cases: list) -> None:
+        async with aiosqlite.connect(self.path) as database:
+            await database.executemany(
+                "INSERT INTO cases(server_id, action, actor_id, target_id, reason, created_at) \
+                    VALUES (?, ?, ?, ?, ?, ?)",
+                cases,
+            )
+            await database.commit()
+
+    async def iter_cases(self, server_id: int, chunk_size: int = 1000):
+        last_id = 0
+        async with aiosqlite.connect(self.path) as database:
+            while True:
+                rows = await database.execute(
+                    "SELECT id, action, actor_id, target_id, reason, created_at FROM cases \
+                        WHERE server_id=? AND id > ? ORDER BY id LIMIT ?",
+                    (
+                        server_id,
+                        last_id,
+                        chunk_size,
+                    ),
+                )
+                async with rows as cursor:
+                    chunk = await cursor.fetchall()
+                if not chunk:
+                    return
+                yield chunk
+                last_id = chunk[-1][0]
+
+    async def search_warns(
+        self, server_id: int, query: str, user_id: int = None, limit: int = 10, offset: int = 0
+    ) -> tuple:
+        expression = match_expression(query, server_id=server_id, user_id=user_id)
+        if not expression:
+            return 0, []
+        async with aiosqlite.connect(self.path) as database:
+            rows = await database.execute(
+                "SELECT COUNT(*) FROM warns_fts WHERE warns_fts MATCH ?", (expression,)
+            )
+            async with rows as cursor:
+                total = (await cursor.fetchone())[0]
+            # Only the reason counts towards the rank, the other columns are filters.
+            rows = await database.execute(
+                "SELECT warns.user_id, warns.moderator_id, warns.reason, \
+                    strftime('%s', warns.created_at), warns.id FROM warns_fts \
+                    JOIN warns ON warns.rowid = warns_fts.rowid WHERE warns_fts MATCH ? \
+                    ORDER BY bm25(warns_fts, 1.0, 0.0, 0.0) LIMIT ? OFFSET ?",
+                (
+                    expression,
+                    limit,
+                    offset,
+                ),
+            )
+            async with rows as cursor:
+                return total, await cursor.fetchall()
+
+    async def search_cases(
+        self, server_id: int, query: str, limit: int = 10, offset: int = 0
+    ) -> tuple:
+        expression = match_expression(query, server_id=server_id)
+        if not expression:
+            return 0, []
+        async with aiosqlite.connect(self.path) as database:
+            rows = await database.execute(
+                "SELECT COUNT(*) FROM cases_fts WHERE cases_fts MATCH ?", (expression,)
+            )
+            async with rows as cursor:
+                total = (await cursor.fetchone())[0]
+            rows = await database.execute(
+                "SELECT cases.id, cases.action, cases.actor_id, cases.target_id, cases.reason, \
+                    cases.created_at FROM cases_fts JOIN cases ON cases.id = cases_fts.rowid \
+                    WHERE cases_fts MATCH ? ORDER BY bm25(cases_fts, 1.0, 0.0, 0.0) \
+                    LIMIT ? OFFSET ?",
+                (
+                    expression,
+                    limit,
+                    offset,
+                ),
+            )
+            async with rows as cursor:
+                return total, await cursor.fetchall()
+
+    async def add_scheduled_action(
+        self, server_id: int, action: str, target_id: int, due_at: int, payload: str
+    ) -> int:
+        async with aiosqlite.connect(self.path) as database:
+            cursor = await database.execute(
+                "INSERT INTO scheduled_actions(server_id, action, target_id, due_at, payload) \
+                    VALUES (?, ?, ?, ?, ?)",
+                (
+                    server_id,
+                    action,
+                    target_id,
+                    due_at,
+                    payload,
+                ),
+            )
+            await database.commit()
+            return cursor.lastrowid
+
+    async def remove_scheduled_action(self, server_id: int, action_id: int) -> None:
+        async with aiosqlite.connect(self.path) as database:
+            await database.execute(
+                "DELETE FROM scheduled_actions WHERE id=? AND server_id=?", (action_id, server_id)
+            )
+            await database.commit()
+
+    async def get_scheduled_actions(self, server_id: int, limit: int = 25) -> list:
+        async with aiosqlite.connect(self.path) as database:
+            async with database.execute(
+                "SELECT id, action, target_id, due_at, payload FROM scheduled_actions \
+                    WHERE server_id=? ORDER BY due_at LIMIT ?",
+                (
+                    server_id,
+                    limit,
+                ),
+            ) as cursor:
+                return await cursor.fetchall()
+
+    async def iter_scheduled_actions(self, chunk_size: int = 1000):
+        last_id = 0
+        async with aiosqlite.connect(self.path) as database:
+            while True:
+                rows = await database.execute(
+                    "SELECT id, server_id, action, target_id, due_at, payload \
+                        FROM scheduled_actions WHERE id > ? ORDER BY id LIMIT ?",
+                    (
+                        last_id,
+                        chunk_size,
+                    ),
+                )
+                async with rows as cursor:
+                    chunk = await cursor.fetchall()
+                if not chunk:
+                    return
+                yield chunk
+                last_id = chunk[-1][0]
@@ -0,0 +1,59 @@
+import re
+
+from discord.ext import commands
+
+UNITS = {
+    "s": 1,
+    "m": 60,
+    "h": 60 * 60,
+    "d": 24 * 60 * 60,
+    "w": 7 * 24 * 60 * 60,
+}
+
+DURATION = re.compile(r"(\d+)\s*([smhdw])", re.IGNORECASE)
+
+
+def parse_duration(text: str) -> int:
+    """
+    This function will parse a duration like `30m`, `12h` or `1w2d`.
+
+    :param text: The duration, numbers followed by `s`, `m`, `h`, `d` or `w`.
+    :return: The duration in seconds.
+    :raises ValueError: If the text is not a duration.
+    """
+
+    text = text.strip()
+    if not re.fullmatch(rf"(?:{DURATION.pattern}\s*)+", text, re.IGNORECASE):
+        raise ValueError(f"'{text}' is not a duration, use for example 30m, 12h or 1w2d.")
+    seconds = sum(int(amount) * UNITS[unit.lower()] for amount, unit in DURATION.findall(text))
+    if seconds <= 0:
+        raise ValueError("The duration must be longer than 0 seconds.")
+    return seconds
+
+
+def format_duration(seconds: int) -> str:
+    """
+    This function will format a duration the way `parse_duration` parses it.
+
+    :param seconds: The duration in seconds.
+    :return: The duration, for example `1w2d`.
+    """
+
+    parts = []
+    for unit, size in sorted(UNITS.items(), key=lambda item: -item[1]):
+        amount, seconds = divmod(seconds, size)
+        if amount:
+            parts.append(f"{amount}{unit}")
+    return "".join(parts) or "0s"
+
+
+class Duration(commands.Converter):
+    """
+    Converts a command argument like `12h` to a number of seconds.
+    """
+
+    async def convert(self, context: commands.Context, argument: str) -> int:
+        try:
+            return parse_duration(argument)
+        except ValueError as error:
+            raise commands.BadArgument(str(error)) from error
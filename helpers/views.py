@@ -0,0 +1,191 @@
+import sys
+import time
+from typing import Awaitable, Callable, Optional
+
+import discord
+
+from exceptions import TooManyViews
+from helpers import metrics
+
+
+class ViewRegistry:
+    """
+    Keeps track of the interactive views that are still waiting for input,
+    and caps how many of them a single user and the whole bot can have open.
+    """
+
+    def __init__(self, timeout: float = 120.0, max_per_user: int = 3, max_total: int = 5000):
+        self.timeout = timeout
+        self.max_per_user = max_per_user
+        self.max_total = max_total
+        self._views = {}
+        self._per_user = {}
+        metrics.register_gauge("views.live", self.__len__)
+        metrics.register_gauge("views.memory_bytes", self.memory_usage)
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def register(self, view: "RegisteredView") -> None:
+        """
+        Starts tracking a view.
+
+        :param view: The view that should be tracked.
+        """
+
+        if len(self._views) >= self.max_total:
+            self.cleanup()
+        if len(self._views) >= self.max_total:
+            metrics.increment("views.rejected")
+            raise TooManyViews("The bot is busy, please try again in a moment!")
+        if self._per_user.get(view.user_id, 0) >= self.max_per_user:
+            metrics.increment("views.rejected")
+            raise TooManyViews(
+                f"You already have {self.max_per_user} open menus, close one of them first!"
+            )
+
+        view.registered_at = time.monotonic()
+        self._views[id(view)] = view
+        self._per_user[view.user_id] = self._per_user.get(view.user_id, 0) + 1
+
+    def unregister(self, view: "RegisteredView") -> None:
+        """
+        Stops tracking a view, this is a no-op if the view is not tracked.
+
+        :param view: The view that should not be tracked anymore.
+        """
+
+        if self._views.pop(id(view), None) is None:
+            return
+
+        count = self._per_user[view.user_id] - 1
+        if count:
+            self._per_user[view.user_id] = count
+        else:
+            del self._per_user[view.user_id]
+
+    def cleanup(self) -> int:
+        """
+        Stops tracking the views that are finished, and those that were never
+        sent and are older than the timeout.
+
+        :return: The number of views that were removed.
+        """
+
+        deadline = time.monotonic() - self.timeout
+        finished = [
+            view
+            for view in self._views.values()
+            if view.is_finished() or view.registered_at < deadline and view.message is None
+        ]
+        for view in finished:
+            self.unregister(view)
+        metrics.increment("views.cleaned_up", len(finished))
+        return len(finished)
+
+    def memory_usage(self) -> int:
+        """
+        Approximates the memory used by the tracked views and their items.
+
+        :return: The approximate size in bytes.
+        """
+
+        total = 0
+        for view in self._views.values():
+            total += sys.getsizeof(view) + sys.getsizeof(view.__dict__)
+            for item in view.children:
+                total += sys.getsizeof(item) + sys.getsizeof(item.__dict__)
+        return total
+
+
+class RegisteredView(discord.ui.View):
+    """
+    A view that only answers to the user who opened it, and is tracked by
+    the view registry of the bot until it is stopped or times out.
+    """
+
+    not_owner_message = "This is not your game!"
+    expired_message = "This game has expired."
+
+    def __init__(self, registry: ViewRegistry, user_id: int, timeout: Optional[float] = None):
+        super().__init__(timeout=timeout or registry.timeout)
+        self.registry = registry
+        self.user_id = user_id
+        self.message: Optional[discord.Message] = None
+        registry.register(self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.user_id:
+            await interaction.response.send_message(
+                self.not_owner_message, ephemeral=True
+            )
+            return False
+        return True
+
+    def stop(self) -> None:
+        self.registry.unregister(self)
+        super().stop()
+
+    async def on_timeout(self) -> None:
+        self.registry.unregister(self)
+        if self.message is not None:
+            try:
+                await self.message.edit(content=self.expired_message, view=None)
+            except discord.HTTPException:
+                pass
+
+
+class PaginatedView(RegisteredView):
+    """
+    Pages through results that are read one page at a time, like search results.
+    Only the current page is kept in memory, the next one is read when asked for.
+    """
+
+    not_owner_message = "These are not your results!"
+    expired_message = None
+
+    def __init__(
+        self,
+        registry: ViewRegistry,
+        user_id: int,
+        fetch: Callable[[int, int], Awaitable[tuple]],
+        render: Callable[[list, int, int, int], discord.Embed],
+        page_size: int = 10,
+    ):
+        """
+        :param registry: The view registry of the bot.
+        :param user_id: The ID of the user who can turn the pages.
+        :param fetch: Reads a page from its limit and offset, returns the total and the rows.
+        :param render: Makes the embed of the rows of a page, the page, the pages and the total.
+        :param page_size: The number of rows per page.
+        """
+
+        super().__init__(registry, user_id)
+        self.fetch = fetch
+        self.render = render
+        self.page_size = page_size
+        self.page = 0
+        self.pages = 0
+
+    async def load(self) -> discord.Embed:
+        """
+        Reads the current page and updates the buttons.
+
+        :return: The embed of the page.
+        """
+
+        total, rows = await self.fetch(self.page_size, self.page * self.page_size)
+        self.pages = max(1, -(-total // self.page_size))
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.pages - 1
+        return self.render(rows, self.page, self.pages, total)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.blurple)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(0, self.page - 1)
+        await interaction.response.edit_message(embed=await self.load(), view=self)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.blurple)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await interaction.response.edit_message(embed=await self.load(), view=self)
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from helpers import metrics
+
+ROOT = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+class Stall:
+    __slots__ = ("lag", "site", "stack", "at")
+
+    def __init__(self, lag: float, site: str, stack: Optional[str], at: float):
+        self.lag = lag
+        self.site = site
+        self.stack = stack
+        self.at = at
+
+
+def describe_frame(frame: traceback.FrameSummary) -> str:
+    if frame.filename.startswith(ROOT):
+        filename = os.path.relpath(frame.filename, ROOT)
+    else:
+        filename = os.path.basename(frame.filename)
+    return f"{filename}:{frame.lineno} in {frame.name}"
+
+
+def blocking_site(stack: traceback.StackSummary) -> str:
+    """
+    This function will name the code that blocked the event loop: the innermost frame
+    of the bot itself, followed by the innermost frame if it is elsewhere (a library call).
+
+    :param stack: The stack of the event loop thread, outermost frame first.
+    :return: A short description of the blocking site.
+    """
+
+    innermost = stack[-1]
+    own = None
+    for frame in reversed(stack):
+        if frame.filename.startswith(ROOT) and "site-packages" not in frame.filename:
+            own = frame
+            break
+
+    if own is None:
+        return describe_frame(innermost)
+    if own is innermost:
+        return describe_frame(own)
+    return f"{describe_frame(own)} -> {describe_frame(innermost)}"
+
+
+class LoopWatchdog:
+    """
+    Measures the lag of the event loop with a heartbeat task. A helper thread checks
+    the heartbeat, and when it is late captures the stack of the event loop thread
+    while it is still blocked, so the blocking call can be named.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, history: int = 256,
+                 logger: Optional[logging.Logger] = None):
+        self.interval = interval
+        self.threshold = threshold
+        self.logger = logger or logging.getLogger("discord_bot")
+        self.stalls = deque(maxlen=history)
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._beat_at = None
+        self._captured = None
+        self._thread_id = None
+        self._task = None
+        self._stopped = threading.Event()
+        metrics.register_gauge("loop.lag", lambda: self.lag)
+        metrics.register_gauge("loop.max_lag", lambda: self.max_lag)
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """
+        Starts the heartbeat and the helper thread, this must be called from the event loop.
+        """
+
+        self._thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._beat_at = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.lag = max(time.monotonic() - self._beat_at - self.interval, 0.0)
+            self.max_lag = max(self.max_lag, self.lag)
+            if self.lag >= self.threshold:
+                self._record(self.lag)
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval / 2):
+            beat_at = self._beat_at
+            if beat_at is None or (self._captured is not None and self._captured[0] == beat_at):
+                continue
+            if time.monotonic() - beat_at - self.interval < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            try:
+                self._captured = (beat_at, traceback.extract_stack(frame))
+            finally:
+                del frame
+
+    def _record(self, lag: float) -> None:
+        captured = self._captured
+        if captured is not None and captured[0] == self._beat_at:
+            site = blocking_site(captured[1])
+            stack = "".join(captured[1].format())
+        else:
+            # The loop got unblocked before the helper thread looked at it.
+            site, stack = "unknown", None
+
+        self.stalls.append(Stall(lag, site, stack, time.time()))
+        metrics.increment("loop.stalls")
+        if stack is None:
+            self.logger.warning("The event loop was blocked for %.3fs", lag)
+        else:
+            self.logger.warning("The event loop was blocked for %.3fs at %s\n%s", lag, site, stack)
+
+    def report(self, limit: int = 10) -> list:
+        """
+        Aggregates the recent stalls by blocking site.
+
+        :param limit: The maximum number of sites to return.
+        :return: A list of (site, count, worst lag, total lag), the worst sites first.
+        """
+
+        sites = {}
+        for stall in self.stalls:
+            count, worst, total = sites.get(stall.site, (0, 0.0, 0.0))
+            sites[stall.site] = (count + 1, max(worst, stall.lag), total + stall.lag)
+        ranked = sorted(sites.items(), key=lambda item: (item[1][1], item[1][2]), reverse=True)
+        return [(site, *values) for site, values in ranked[:limit]]
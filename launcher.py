@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+
+import aiohttp
+
+from helpers.cluster import cluster_environment, shard_ranges
+
+ROOT = os.path.realpath(os.path.dirname(__file__))
+
+logger = logging.getLogger("discord_bot.launcher")
+
+
+async def recommended_shard_count(token: str) -> int:
+    """
+    This function will ask Discord how many shards the bot should use.
+
+    :param token: The token of the bot.
+    :return: The recommended number of shards.
+    """
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot",
+            headers={"Authorization": f"Bot {token}"},
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+            return data["shards"]
+
+
+class ClusterLauncher:
+    """
+    Spawns one worker process per cluster, collects their health reports
+    and coordinates their shutdown.
+    """
+
+    def __init__(
+        self,
+        shard_count: int,
+        clusters: int,
+        command: list,
+        health_interval: float = 15.0,
+        shutdown_timeout: float = 30.0,
+    ):
+        self.shard_count = shard_count
+        self.ranges = shard_ranges(shard_count, clusters)
+        self.command = command
+        self.health_interval = health_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.processes = {}
+        self.writers = {}
+        self.health = {}
+        self.address = None
+        self._server = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_worker, "127.0.0.1", 0)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        self.address = f"{host}:{port}"
+        for cluster_id in range(len(self.ranges)):
+            await self._spawn(cluster_id)
+
+    async def _spawn(self, cluster_id: int) -> None:
+        env = dict(os.environ)
+        env.update(
+            cluster_environment(
+                cluster_id, self.ranges[cluster_id], self.shard_count, self.address
+            )
+        )
+        # Workers get their own session, so a Ctrl+C only reaches the launcher
+        # which then shuts the clusters down in a coordinated way.
+        process = await asyncio.create_subprocess_exec(
+            *self.command, cwd=ROOT, env=env, start_new_session=True
+        )
+        self.processes[cluster_id] = process
+        logger.info(
+            "Started cluster %s (PID %s) with shards %s",
+            cluster_id,
+            process.pid,
+            self.ranges[cluster_id],
+        )
+
+    async def _handle_worker(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        cluster_id = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    report = json.loads(line)
+                except ValueError:
+                    report = None
+                if not isinstance(report, dict) or "cluster_id" not in report:
+                    logger.warning("Skipped a malformed report from a worker")
+                    continue
+                cluster_id = report["cluster_id"]
+                self.writers[cluster_id] = writer
+                if report.get("type") == "broadcast":
+                    self._relay(cluster_id, report)
+                    continue
+                report["received_at"] = time.monotonic()
+                self.health[cluster_id] = report
+
+        finally:
+            if cluster_id is not None and self.writers.get(cluster_id) is writer:
+                del self.writers[cluster_id]
+            writer.close()
+
+    def _relay(self, sender: int, message: dict) -> None:
+        """
+        Forwards a message a worker broadcast to every other worker.
+
+        :param sender: The ID of the cluster that sent the message.
+        :param message: The message.
+        """
+
+        line = json.dumps(message).encode("utf-8") + b"\n"
+        for cluster_id, writer in list(self.writers.items()):
+            if cluster_id != sender and not writer.is_closing():
+                writer.write(line)
+
+    def report(self) -> None:
+        """
+        Logs the health of every cluster and warns about stale or dead ones.
+        """
+
+        now = time.monotonic()
+        for cluster_id, process in self.processes.items():
+            health = self.health.get(cluster_id)
+            if process.returncode is not None:
+                logger.error(
+                    "Cluster %s exited with code %s", cluster_id, process.returncode
+                )
+            elif health is None:
+                logger.info("Cluster %s is starting up", cluster_id)
+            elif now - health["received_at"] > self.health_interval * 3:
+                logger.warning(
+                    "Cluster %s has not reported for %.0f seconds",
+                    cluster_id,
+                    now - health["received_at"],
+                )
+            else:
+                latencies = list(health.get("shards", {}).values())
+                logger.info(
+                    "Cluster %s: %s, %s guilds, %s/%s shards, average latency %sms",
+                    cluster_id,
+                    "ready" if health.get("ready") else "not ready",
+                    health.get("guilds", 0),
+                    len(latencies),
+                    len(self.ranges[cluster_id]),
+                    round(sum(latencies) / len(latencies) * 1000) if latencies else "-",
+                )
+
+    async def monitor(self) -> None:
+        """
+        Reports the health of the clusters and restarts the ones that crashed,
+        until a shutdown is requested.
+        """
+
+        while not self._stopping:
+            await asyncio.sleep(self.health_interval)
+            if self._stopping:
+                return
+            self.report()
+            for cluster_id, process in list(self.processes.items()):
+                if process.returncode is not None and not self._stopping:
+                    self.health.pop(cluster_id, None)
+                    await self._spawn(cluster_id)
+
+    async def shutdown(self) -> None:
+        """
+        Asks every cluster to shut down, and terminates the ones that
+        did not exit before the shutdown timeout.
+        """
+
+        if self._stopping:
+            return
+        self._stopping = True
+        logger.info("Shutting down %s clusters...", len(self.processes))
+
+        for writer in list(self.writers.values()):
+            try:
+                writer.write(json.dumps({"type": "shutdown"}).encode("utf-8") + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+        for cluster_id, process in self.processes.items():
+            # Workers that are not connected yet still get the request as a signal.
+            if cluster_id not in self.writers and process.returncode is None:
+                process.terminate()
+
+        waiters = [process.wait() for process in self.processes.values()]
+        try:
+            await asyncio.wait_for(asyncio.gather(*waiters), self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            for cluster_id, process in self.processes.items():
+                if process.returncode is None:
+                    logger.warning("Cluster %s did not exit in time, killing it", cluster_id)
+                    process.kill()
+            await asyncio.gather(*(process.wait() for process in self.processes.values()))
+
+        self._server.close()
+        await self._server.wait_closed()
+        logger.info("All clusters have been shut down.")
+
+
+async def main(arguments: argparse.Namespace) -> None:
+    with open(f"{ROOT}/config.json", encoding="utf-8") as file:
+        config = json.load(file)
+    sharding = config["sharding"]
+
+    shard_count = arguments.shards or sharding["shard_count"]
+    if shard_count is None:
+        if arguments.fake_gateway:
+            shard_count = sharding["clusters"]
+        else:
+            shard_count = await recommended_shard_count(config["token"])
+    clusters = arguments.clusters or sharding["clusters"]
+
+    if arguments.fake_gateway:
+        command = [sys.executable, "-m", "helpers.cluster"]
+    else:
+        command = [sys.executable, f"{ROOT}/bot.py"]
+
+    launcher = ClusterLauncher(
+        shard_count,
+        clusters,
+        command,
+        health_interval=arguments.health_interval or sharding["health_interval"],
+        shutdown_timeout=sharding["shutdown_timeout"],
+    )
+    await launcher.start()
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    monitor = asyncio.create_task(launcher.monitor())
+    await stop.wait()
+    monitor.cancel()
+    await launcher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the bot as multiple shard clusters.")
+    parser.add_argument("--shards", type=int, help="Total number of shards.")
+    parser.add_argument("--clusters", type=int, help="Number of worker processes.")
+    parser.add_argument("--health-interval", type=float, help="Seconds between health reports.")
+    parser.add_argument(
+        "--fake-gateway",
+        action="store_true",
+        help="Run workers against a fake gateway, for local testing.",
+    )
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[{asctime}] [{levelname:<8}] {name}: {message}",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        style="{",
+    )
+    asyncio.run(main(parser.parse_args()))
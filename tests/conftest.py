@@ -0,0 +1,29 @@
+import asyncio
+import os
+
+import pytest
+
+from helpers.storage.memory import MemoryBackend
+from helpers.storage.partitioned import PartitionedBackend
+from helpers.storage.sqlite import SQLiteBackend
+
+SCHEMA_PATH = f"{os.path.realpath(os.path.dirname(__file__))}/../database/schema.sql"
+
+
+@pytest.fixture(params=["sqlite", "memory", "partitioned"])
+def backend(request, tmp_path):
+    """
+    Every storage engine, initialized and empty. The tests run against each of them,
+    so the engines can be swapped without the callers noticing.
+    """
+
+    if request.param == "sqlite":
+        engine = SQLiteBackend(str(tmp_path / "database.database"), SCHEMA_PATH)
+    elif request.param == "partitioned":
+        engine = PartitionedBackend(
+            str(tmp_path / "database.database"), SCHEMA_PATH, str(tmp_path / "partitions"), 4
+        )
+    else:
+        engine = MemoryBackend()
+    asyncio.run(engine.initialize())
+    return engine
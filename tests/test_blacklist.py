@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+import pytest
+
+from helpers import db_manager
+from helpers.blacklist import Blacklist
+from helpers.storage.memory import MemoryBackend
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    backend = MemoryBackend()
+    monkeypatch.setattr(db_manager, "_backend", backend)
+    return backend
+
+
+def test_global_and_server_entries_expiring_together(storage):
+    expires_at = int(time.time()) + 1
+
+    async def scenario():
+        await storage.add_user_to_blacklist(1, None, expires_at)
+        await storage.add_user_to_blacklist(1, 42, expires_at)
+        blacklist = Blacklist()
+        await blacklist.load()
+        assert blacklist.is_blacklisted(1) and blacklist.has_entry(1, 42)
+
+        await blacklist.add(2, None, 60)
+        await blacklist.add(2, 42, 60)
+        blacklist.start()
+        await asyncio.sleep(expires_at - time.time() + 0.1)
+        blacklist.stop()
+        return blacklist
+
+    blacklist = asyncio.run(scenario())
+    assert not blacklist.is_blacklisted(1, 42)
+    assert blacklist.is_blacklisted(2) and blacklist.has_entry(2, 42)
+    assert len(blacklist) == 2
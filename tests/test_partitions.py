@@ -0,0 +1,54 @@
+import asyncio
+import os
+import sqlite3
+import time
+
+from helpers.partitions import TABLES
+from helpers.storage.partitioned import PartitionedBackend
+from helpers.storage.sqlite import SQLiteBackend
+
+SCHEMA_PATH = f"{os.path.realpath(os.path.dirname(__file__))}/../database/schema.sql"
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_unpartitioned_data_is_imported(tmp_path):
+    database_path = str(tmp_path / "database.database")
+    before = SQLiteBackend(database_path, SCHEMA_PATH)
+    run(before.initialize())
+    now = int(time.time())
+    servers = range(10, 20)
+    for server_id in servers:
+        run(before.add_warn(1, server_id, 100, "spam"))
+        run(before.update_guild_settings(server_id, "?", "dog", None))
+        run(before.set_warn_expiry_policy(server_id, 3600, "archive"))
+        run(before.add_cases([(server_id, "ban", 100, 1, "raid", now)]))
+        run(before.add_scheduled_action(server_id, "unban", 1, now + 60, "{}"))
+    run(before.add_user_to_blacklist(1, 10))
+
+    def partitioned():
+        engine = PartitionedBackend(database_path, SCHEMA_PATH, str(tmp_path / "partitions"), 4)
+        run(engine.initialize())
+        return engine
+
+    partitioned()
+    # Starting again does not import the rows twice.
+    engine = partitioned()
+    for server_id in servers:
+        assert [warn[3] for warn in run(engine.get_warnings(1, server_id))] == ["spam"]
+        assert run(engine.get_warn_stats(server_id))[:2] == (1, 1)
+        assert run(engine.search_warns(server_id, "spam"))[0] == 1
+        assert run(engine.get_guild_settings(server_id)) == ("?", "dog", None)
+        assert run(engine.get_warn_expiry_policy(server_id)) == (3600, "archive")
+        assert run(engine.search_cases(server_id, "raid"))[0] == 1
+        assert len(run(engine.get_scheduled_actions(server_id))) == 1
+    assert run(engine.is_blacklisted(1, 10))
+
+    connection = sqlite3.connect(database_path)
+    try:
+        for table in TABLES + ("warn_stats", "warn_guild_stats"):
+            assert connection.execute(f"SELECT COUNT(*) FROM `{table}`").fetchone() == (0,)
+    finally:
+        connection.close()
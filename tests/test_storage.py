@@ -0,0 +1,198 @@
+import asyncio
+import time
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def collect(iterator) -> list:
+    async def chunks():
+        return [chunk async for chunk in iterator]
+
+    return run(chunks())
+
+
+def test_blacklist_scopes(backend):
+    assert run(backend.add_user_to_blacklist(1)) == 1
+    assert run(backend.add_user_to_blacklist(2, 10)) == 2
+
+    assert run(backend.is_blacklisted(1))
+    assert run(backend.is_blacklisted(1, 10))
+    assert not run(backend.is_blacklisted(2))
+    assert run(backend.is_blacklisted(2, 10))
+    assert not run(backend.is_blacklisted(2, 11))
+
+    rows = sorted(run(backend.get_blacklisted_users()))
+    assert [(user_id, server_id, expires_at) for user_id, _, server_id, expires_at in rows] == [
+        ("1", None, None),
+        ("2", "10", None),
+    ]
+    assert abs(int(rows[0][1]) - time.time()) < 5
+
+    assert run(backend.remove_user_from_blacklist(2)) == 2
+    assert run(backend.remove_user_from_blacklist(2, 10)) == 1
+    assert not run(backend.is_blacklisted(2, 10))
+
+
+def test_blacklist_entry_is_replaced_and_expires(backend):
+    now = int(time.time())
+    run(backend.add_user_to_blacklist(1, 10, now + 3600))
+    assert run(backend.add_user_to_blacklist(1, 10, now - 1)) == 1
+    assert not run(backend.is_blacklisted(1, 10))
+
+    run(backend.add_user_to_blacklist(2, None, now + 3600))
+    assert run(backend.is_blacklisted(2))
+    assert run(backend.expire_blacklist(now)) == 1
+    assert run(backend.expire_blacklist(now + 3600)) == 1
+    assert run(backend.get_blacklisted_users()) == []
+
+
+def test_warns(backend):
+    assert run(backend.add_warn(1, 10, 100, "spam")) == 1
+    assert run(backend.add_warn(1, 10, 100, "more spam")) == 2
+    assert run(backend.add_warn(2, 10, 100, "rude")) == 1
+    assert run(backend.add_warn(1, 11, 100, "elsewhere")) == 1
+
+    warnings = run(backend.get_warnings(1, 10))
+    assert [warn[:4] + warn[5:] for warn in warnings] == [
+        ("1", "10", "100", "spam", 1),
+        ("1", "10", "100", "more spam", 2),
+    ]
+    assert abs(int(warnings[0][4]) - time.time()) < 5
+
+    leaderboard = run(backend.get_warn_leaderboard(10))
+    assert [(user_id, count) for user_id, count, _ in leaderboard] == [("1", 2), ("2", 1)]
+    assert run(backend.get_warn_stats(10))[:2] == (3, 2)
+    assert run(backend.get_warn_stats(10, 2))[:2] == (1, 1)
+    assert run(backend.get_warn_stats(12)) is None
+
+    assert run(backend.remove_warn(1, 1, 10)) == 1
+    assert [warn[5] for warn in run(backend.get_warnings(1, 10))] == [2]
+    assert run(backend.remove_warn(2, 1, 10)) == 0
+    assert run(backend.get_warnings(1, 10)) == []
+    assert [row[0] for row in run(backend.get_warn_leaderboard(10))] == ["2"]
+
+
+def test_guild_settings(backend):
+    assert run(backend.get_guild_settings(10)) is None
+    run(backend.update_guild_settings(10, "?", "dog bitcoin", 1234))
+    run(backend.update_guild_settings(11, None, "", None))
+    run(backend.update_guild_settings(10, "!", "dog", 1234))
+
+    assert run(backend.get_guild_settings(10)) == ("!", "dog", "1234")
+    assert run(backend.get_guild_settings(11)) == (None, "", None)
+    assert sorted(run(backend.get_guilds_settings([10, 11, 12]))) == [
+        ("10", "!", "dog", "1234"),
+        ("11", None, "", None),
+    ]
+
+
+def test_warn_expiry(backend):
+    run(backend.set_warn_expiry_policy(10, 86400, "archive"))
+    run(backend.set_warn_expiry_policy(11, 3600))
+    assert run(backend.get_warn_expiry_policy(10)) == (86400, "archive")
+    assert sorted(run(backend.get_warn_expiry_policies())) == [
+        ("10", 86400, "archive"),
+        ("11", 3600, "delete"),
+    ]
+    run(backend.set_warn_expiry_policy(11, None))
+    assert run(backend.get_warn_expiry_policy(11)) is None
+
+    for user_id in range(5):
+        run(backend.add_warn(user_id, 10, 100, "spam"))
+    # Nothing is old enough yet.
+    assert run(backend.expire_warns(10, 3600, True, 10)) == 0
+    # Times have a resolution of a second, wait for the warnings to be older than 0 seconds.
+    time.sleep(1.1)
+    assert run(backend.expire_warns(10, 0, True, 3)) == 3
+    assert run(backend.expire_warns(10, 0, True, 3)) == 2
+    assert run(backend.get_warn_stats(10)) is None
+    assert run(backend.compact(10)) >= 0
+
+
+def test_cases(backend):
+    now = int(time.time())
+    run(backend.add_cases([
+        (10, "ban", 100, 1, "spam", now),
+        (11, "kick", 100, 2, None, now),
+        (10, "purge", 100, None, "5 messages in #general", now + 1),
+    ]))
+    run(backend.add_cases([(10, "warn", 101, 3, "rude", now + 2)]))
+
+    chunks = collect(backend.iter_cases(10, chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    cases = [case for chunk in chunks for case in chunk]
+    ids = [int(case[0]) for case in cases]
+    assert ids == sorted(ids) and len(set(ids)) == 3
+    assert [case[1:] for case in cases] == [
+        ("ban", "100", "1", "spam", now),
+        ("purge", "100", None, "5 messages in #general", now + 1),
+        ("warn", "101", "3", "rude", now + 2),
+    ]
+    assert collect(backend.iter_cases(12)) == []
+
+
+def test_search_warns(backend):
+    run(backend.add_warn(1, 10, 100, "spamming links in general"))
+    run(backend.add_warn(2, 10, 100, "spam"))
+    run(backend.add_warn(2, 10, 100, "being rude"))
+    run(backend.add_warn(3, 11, 100, "spam"))
+
+    total, rows = run(backend.search_warns(10, "SPAM"))
+    assert total == 1
+    assert [(row[0], row[2], row[4]) for row in rows] == [("2", "spam", 1)]
+
+    total, rows = run(backend.search_warns(10, "spam*"))
+    assert total == 2
+    # The shorter reason matches better.
+    assert [row[2] for row in rows] == ["spam", "spamming links in general"]
+
+    total, rows = run(backend.search_warns(10, "spam*", user_id=1))
+    assert total == 1 and rows[0][0] == "1"
+    total, rows = run(backend.search_warns(10, "spam*", limit=1, offset=1))
+    assert total == 2 and [row[2] for row in rows] == ["spamming links in general"]
+    assert run(backend.search_warns(10, "links rude")) == (0, [])
+    assert run(backend.search_warns(10, "!!")) == (0, [])
+
+
+def test_search_cases(backend):
+    now = int(time.time())
+    run(backend.add_cases([
+        (10, "ban", 100, 1, "raid with alt accounts", now),
+        (10, "kick", 100, 2, "alt", now),
+        (10, "purge", 100, None, None, now),
+        (11, "ban", 100, 3, "alt", now),
+    ]))
+
+    total, rows = run(backend.search_cases(10, "alt"))
+    assert total == 2
+    assert [row[4] for row in rows] == ["alt", "raid with alt accounts"]
+    assert run(backend.search_cases(10, "alt raid", limit=5))[0] == 1
+    assert run(backend.search_cases(12, "alt")) == (0, [])
+
+
+def test_scheduled_actions(backend):
+    now = int(time.time())
+    late = run(backend.add_scheduled_action(10, "unban", 1, now + 600, "{}"))
+    soon = run(backend.add_scheduled_action(10, "nick", 2, now + 60, '{"nick": "old"}'))
+    other = run(backend.add_scheduled_action(11, "unban", 3, now + 30, "{}"))
+
+    assert [tuple(row) for row in run(backend.get_scheduled_actions(10))] == [
+        (soon, "nick", "2", now + 60, '{"nick": "old"}'),
+        (late, "unban", "1", now + 600, "{}"),
+    ]
+    assert len(run(backend.get_scheduled_actions(10, limit=1))) == 1
+
+    # The ID of an action only identifies it within its server.
+    run(backend.remove_scheduled_action(10, other))
+    assert len(run(backend.get_scheduled_actions(11))) == 1
+    run(backend.remove_scheduled_action(10, late))
+    assert [row[0] for row in run(backend.get_scheduled_actions(10))] == [soon]
+
+    chunks = collect(backend.iter_scheduled_actions(chunk_size=1))
+    assert [len(chunk) for chunk in chunks] == [1, 1]
+    assert sorted(tuple(row[1:4]) for chunk in chunks for row in chunk) == [
+        ("10", "nick", "2"),
+        ("11", "unban", "3"),
+    ]